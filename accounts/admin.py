@@ -1,12 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from hospital.admin import PerformanceAdminMixin
+
 from .forms import HospitalUserChangeForm, HospitalUserCreationForm
 from .models import User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(PerformanceAdminMixin, UserAdmin):
     add_form = HospitalUserCreationForm
     form = HospitalUserChangeForm
     model = User
@@ -26,3 +28,7 @@ class CustomUserAdmin(UserAdmin):
     list_display = ("username", "display_name", "role", "is_active", "is_staff")
     list_filter = ("role", "is_active", "is_staff")
     search_fields = ("username", "first_name", "last_name", "email")
+    # 帳號有唯一索引；病患帳號另以病歷號、身分證號、電話與姓名的索引查詢比對。
+    exact_search_fields = ("username",)
+    patient_search_field = "patient_profile"
+    ordering = ("-pk",)
@@ -0,0 +1,29 @@
+"""登入後每個請求載入使用者時，一併取回病患與醫師資料。"""
+
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+UserModel = get_user_model()
+
+# 各儀表板與表單都會讀取 ``user.patient_profile`` / ``user.doctor_profile``；
+# 反向一對一關聯以 select_related 取回後，沒有對應資料的角色也不會再多查一次。
+PROFILE_RELATIONS = ("patient_profile", "doctor_profile", "doctor_profile__department")
+
+
+class ProfileModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related(*PROFILE_RELATIONS).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await UserModel._default_manager.select_related(*PROFILE_RELATIONS).aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware as BaseAuthenticationMiddleware
+
+
+LEGACY_BACKEND = "django.contrib.auth.backends.ModelBackend"
+PROFILE_BACKEND = "accounts.backends.ProfileModelBackend"
+
+
+class AuthenticationMiddleware(BaseAuthenticationMiddleware):
+    """沿用 Django 的延遲載入 ``request.user``，並將改版前登入的 session 轉到 ``ProfileModelBackend``。
+
+    ``request.user`` 第一次被讀取時才以單一查詢連同病患／醫師資料載入；
+    舊 session 記錄的 ``ModelBackend`` 已不在 ``AUTHENTICATION_BACKENDS`` 中，
+    若不轉換，部署後所有使用者都會被登出。
+    """
+
+    def process_request(self, request):
+        # 沒有 session cookie 的匿名請求不讀取 session，避免多一次查詢。
+        if request.session.session_key and request.session.get(BACKEND_SESSION_KEY) == LEGACY_BACKEND:
+            request.session[BACKEND_SESSION_KEY] = PROFILE_BACKEND
+        super().process_request(request)
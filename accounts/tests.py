@@ -1,3 +1,48 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import datetime
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.middleware import LEGACY_BACKEND, PROFILE_BACKEND
+from accounts.models import User
+from patients.models import Patient
+
+
+class ProfileAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="A123456789", password="pw", first_name="小明", last_name="王")
+        cls.patient = Patient.objects.create(
+            user=cls.user,
+            national_id="A123456789",
+            birth_date=datetime.date(1990, 1, 1),
+            phone="0912345678",
+        )
+
+    def test_profile_loaded_with_user(self):
+        self.client.login(username="A123456789", password="pw")
+        response = self.client.get(reverse("accounts:profile"))
+        user = response.wsgi_request.user
+        with self.assertNumQueries(0):
+            self.assertEqual(user.patient_profile.pk, self.patient.pk)
+            self.assertFalse(hasattr(user, "doctor_profile"))
+
+    def test_legacy_session_backend_is_upgraded(self):
+        self.client.force_login(self.user, backend=PROFILE_BACKEND)
+        session = self.client.session
+        session[BACKEND_SESSION_KEY] = LEGACY_BACKEND
+        session.save()
+        response = self.client.get(reverse("accounts:profile"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], PROFILE_BACKEND)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_cached_db_session_skips_session_query(self):
+        self.client.login(username="A123456789", password="pw")
+        url = reverse("accounts:profile")
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
@@ -5,3 +5,6 @@ class AdministrationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "administration"
     verbose_name = "後台管理"
+
+    def ready(self):
+        from . import signals  # noqa: F401
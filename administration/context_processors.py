@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+from .services import visible_announcements
+
+
+def announcements(request):
+    """提供 ``site_announcements`` 給所有範本；傳入函式而非結果，未使用的頁面不會讀取快取。"""
+
+    return {"site_announcements": visible_announcements}
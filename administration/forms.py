@@ -7,7 +7,10 @@ from django.db.models import Q
 from django.utils import timezone
 
 from clinics.models import Department
+from patients.importer import FORMATS
+from registrations import reference
 from registrations.models import Doctor, DoctorSchedule
+from registrations.reference import ReferenceChoiceField
 
 from .models import Announcement
 
@@ -46,9 +49,10 @@ class DoctorCreateForm(forms.Form):
     last_name = forms.CharField(label="姓氏", max_length=30)
     email = forms.EmailField(label="電子郵件", required=False)
     phone_number = forms.CharField(label="聯絡電話", max_length=20, required=False)
-    department = forms.ModelChoiceField(
+    department = ReferenceChoiceField(
         label="科別",
-        queryset=Department.objects.filter(is_active=True).order_by("name"),
+        queryset=Department.objects.filter(is_active=True),
+        choices=lambda: reference.department_choices(active_only=True),
     )
     license_number = forms.CharField(label="醫師證書號", max_length=30)
     title = forms.CharField(label="職稱", max_length=50, required=False)
@@ -115,6 +119,11 @@ class DoctorUpdateForm(forms.ModelForm):
     last_name = forms.CharField(label="姓氏", max_length=30)
     email = forms.EmailField(label="電子郵件", required=False)
     phone_number = forms.CharField(label="聯絡電話", max_length=20, required=False)
+    department = ReferenceChoiceField(
+        label="科別",
+        queryset=Department.objects.all(),
+        choices=reference.department_choices,
+    )
 
     class Meta:
         model = Doctor
@@ -134,7 +143,6 @@ class DoctorUpdateForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         user = self.instance.user
-        self.fields["department"].queryset = Department.objects.order_by("name")
         self.initial.update(
             {
                 "username": user.username,
@@ -191,16 +199,20 @@ class DoctorScheduleForm(forms.ModelForm):
             "date": forms.DateInput(attrs={"type": "date"}),
         }
 
+    doctor = ReferenceChoiceField(
+        label="醫師",
+        queryset=Doctor.objects.filter(is_active=True),
+        choices=lambda: reference.doctor_choices(active_only=True),
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        base_queryset = Doctor.objects.select_related("user", "department").order_by(
-            "department__name", "user__last_name"
-        )
         if self.instance.pk:
-            base_queryset = base_queryset.filter(Q(is_active=True) | Q(pk=self.instance.doctor_id))
-        else:
-            base_queryset = base_queryset.filter(is_active=True)
-        self.fields["doctor"].queryset = base_queryset
+            current_doctor_id = self.instance.doctor_id
+            self.fields["doctor"].queryset = Doctor.objects.filter(Q(is_active=True) | Q(pk=current_doctor_id))
+            self.fields["doctor"].load_choices = lambda: reference.doctor_choices(
+                active_only=True, include=[current_doctor_id]
+            )
         self.fields["quota"].widget.attrs.setdefault("min", 1)
 
     def _ensure_unique_schedule(self, doctor, date, session):
@@ -237,17 +249,17 @@ class AppointmentReportFilterForm(forms.Form):
         required=False,
         widget=forms.DateInput(attrs={"type": "date"}),
     )
-    department = forms.ModelChoiceField(
+    department = ReferenceChoiceField(
         label="科別",
         required=False,
-        queryset=Department.objects.order_by("name"),
+        queryset=Department.objects.all(),
+        choices=reference.department_choices,
     )
-    doctor = forms.ModelChoiceField(
+    doctor = ReferenceChoiceField(
         label="醫師",
         required=False,
-        queryset=Doctor.objects.select_related("user", "department").order_by(
-            "department__name", "user__last_name"
-        ),
+        queryset=Doctor.objects.all(),
+        choices=reference.doctor_choices,
     )
 
     def __init__(self, *args, **kwargs):
@@ -257,12 +269,9 @@ class AppointmentReportFilterForm(forms.Form):
             department_value = self.data.get("department")
         else:
             department_value = self.initial.get("department")
-        doctor_queryset = Doctor.objects.select_related("user", "department").order_by(
-            "department__name", "user__last_name"
-        )
         if department_value:
-            doctor_queryset = doctor_queryset.filter(department_id=department_value)
-        self.fields["doctor"].queryset = doctor_queryset
+            self.fields["doctor"].queryset = Doctor.objects.filter(department_id=department_value)
+            self.fields["doctor"].load_choices = lambda: reference.doctor_choices(department_id=department_value)
 
     def clean(self):
         cleaned = super().clean()
@@ -319,3 +328,18 @@ class AnnouncementForm(forms.ModelForm):
         if publish_at and expire_at and expire_at <= publish_at:
             raise forms.ValidationError("結束時間需晚於發布時間。")
         return cleaned
+
+
+class PatientImportForm(forms.Form):
+    file = forms.FileField(
+        label="匯入檔案",
+        help_text=(
+            "CSV 或 JSONL，欄位：national_id, first_name, last_name, birth_date, phone_number, password；"
+            "選填 email, address, emergency_contact。"
+        ),
+    )
+    format = forms.ChoiceField(
+        label="檔案格式",
+        required=False,
+        choices=[("", "依副檔名判斷"), *((fmt, fmt.upper()) for fmt in FORMATS)],
+    )
@@ -4,6 +4,10 @@ from django.conf import settings
 from django.db import models
 
 
+# 公告異動時遞增的快取版本命名空間（見 ``hospital.cache``）。
+ANNOUNCEMENT_CACHE_NAMESPACE = "announcements"
+
+
 class Announcement(models.Model):
     title = models.CharField("標題", max_length=200)
     content = models.TextField("內容")
@@ -0,0 +1,121 @@
+"""目前顯示中的系統公告，快取到下一個上架或下架時間點為止。
+
+公告以「啟用、已到發布時間、尚未過期」三個條件決定是否顯示，結果只會在兩種情況改變：
+公告被新增、修改或刪除（``administration.signals`` 遞增版本號），或時間走到某則公告的
+``publish_at`` / ``expire_at``。快取內容記錄下一個時間點，時間一到就重新載入，
+兩者之間每次讀取都不需查詢資料庫。
+"""
+
+from __future__ import annotations
+
+import datetime
+import math
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from hospital.cache import bump_version, get_version, pending_bump, record
+
+from .models import ANNOUNCEMENT_CACHE_NAMESPACE, Announcement
+
+
+# 沒有任何即將上架或下架的公告時，仍定期重新載入以防版本號遺失。
+MAX_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class AnnouncementEntry:
+    pk: int
+    title: str
+    content: str
+    publish_at: datetime.datetime
+    expire_at: datetime.datetime | None
+
+
+@dataclass(frozen=True)
+class AnnouncementSnapshot:
+    version: int
+    entries: tuple[AnnouncementEntry, ...]
+    loaded_at: datetime.datetime
+    valid_until: datetime.datetime | None
+
+    def is_valid(self, now: datetime.datetime) -> bool:
+        return self.valid_until is None or now < self.valid_until
+
+    def seconds_remaining(self, now: datetime.datetime) -> int:
+        if self.valid_until is None:
+            return MAX_CACHE_TIMEOUT
+        return max(min(math.ceil((self.valid_until - now).total_seconds()), MAX_CACHE_TIMEOUT), 1)
+
+    @property
+    def token(self) -> str:
+        """內容的識別字串，供頁面 ETag 使用；版本與顯示中的公告相同即代表內容相同。"""
+
+        return f"{self.version}:{'-'.join(str(entry.pk) for entry in self.entries)}"
+
+
+def _load(version: int, now: datetime.datetime) -> AnnouncementSnapshot:
+    # 一次取回顯示中與尚未上架的公告，顯示與否及下一個時間點在 Python 端計算。
+    rows = (
+        Announcement.objects.filter(is_active=True)
+        .filter(Q(expire_at__isnull=True) | Q(expire_at__gte=now))
+        .order_by("-publish_at", "-pk")
+        .values_list("pk", "title", "content", "publish_at", "expire_at")
+    )
+    entries: list[AnnouncementEntry] = []
+    boundaries: list[datetime.datetime] = []
+    for pk, title, content, publish_at, expire_at in rows:
+        if publish_at > now:
+            boundaries.append(publish_at)
+            continue
+        entries.append(
+            AnnouncementEntry(pk=pk, title=title, content=content, publish_at=publish_at, expire_at=expire_at)
+        )
+        if expire_at is not None:
+            # 到期時間當下仍顯示（``expire_at >= now``），之後才下架。
+            boundaries.append(expire_at + datetime.timedelta(microseconds=1))
+    return AnnouncementSnapshot(
+        version=version,
+        entries=tuple(entries),
+        loaded_at=now,
+        valid_until=min(boundaries, default=None),
+    )
+
+
+# 行程內記住最近一次的結果；整個物件一次替換，多執行緒讀取不需加鎖。
+_memo: AnnouncementSnapshot | None = None
+
+
+def snapshot() -> AnnouncementSnapshot:
+    global _memo
+    now = timezone.now()
+    version = get_version(ANNOUNCEMENT_CACHE_NAMESPACE)
+    pending = pending_bump(ANNOUNCEMENT_CACHE_NAMESPACE)
+    if pending is not None:
+        # 公告異動尚未提交，只在這個交易內沿用，不寫入共用快取。
+        current = pending.memo.get("visible")
+        if current is None or not current.is_valid(now):
+            current = pending.memo["visible"] = _load(version, now)
+        return current
+    if _memo is not None and _memo.version == version and _memo.is_valid(now):
+        record(ANNOUNCEMENT_CACHE_NAMESPACE, hit=True)
+        return _memo
+    key = f"{ANNOUNCEMENT_CACHE_NAMESPACE}:{version}:visible"
+    current = cache.get(key)
+    hit = current is not None and current.is_valid(now)
+    record(ANNOUNCEMENT_CACHE_NAMESPACE, hit=hit)
+    if not hit:
+        current = _load(version, now)
+        cache.set(key, current, current.seconds_remaining(now))
+    _memo = current
+    return current
+
+
+def invalidate() -> None:
+    bump_version(ANNOUNCEMENT_CACHE_NAMESPACE)
+
+
+def visible_announcements() -> tuple[AnnouncementEntry, ...]:
+    return snapshot().entries
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import services
+from .models import Announcement
+
+
+@receiver([post_save, post_delete], sender=Announcement, dispatch_uid="administration.announcement_cache")
+def invalidate_announcements(sender, raw=False, **kwargs):
+    if not raw:
+        services.invalidate()
@@ -1,3 +1,194 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import datetime
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from administration import services
+from administration.models import Announcement
+from patients.models import Patient
+from registrations.models import DoctorSchedule
+from system.testing import QueryBudgetTestCase
+
+
+class AdminPageBudgetTests(QueryBudgetTestCase):
+    """管理後台頁面在大量資料下的查詢數與回應時間上限。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin_user = User.objects.create_user(username="perf-admin", password="admin-pass", role=User.Role.ADMIN)
+        cls.announcement = Announcement.objects.create(
+            title="門診異動",
+            content="本週六停診。",
+            publish_at=timezone.now(),
+            created_by=cls.admin_user,
+        )
+        cls.schedule = DoctorSchedule.objects.filter(doctor=cls.doctor).order_by("date").first()
+        cls.empty_schedule = DoctorSchedule.objects.create(
+            doctor=cls.doctor,
+            date=timezone.localdate() + datetime.timedelta(days=60),
+            session=DoctorSchedule.Session.MORNING,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_dashboard(self):
+        self.assertGetWithinBudget(reverse("administration:dashboard"), max_queries=2)
+
+    def test_doctor_pages(self):
+        self.assertGetWithinBudget(reverse("administration:doctors"), max_queries=4)
+        self.assertGetWithinBudget(reverse("administration:doctors-add"), max_queries=3)
+        self.assertGetWithinBudget(reverse("administration:doctors-edit", args=[self.doctor.pk]), max_queries=5)
+
+    def test_doctor_toggle(self):
+        self.assertPostWithinBudget(reverse("administration:doctors-toggle", args=[self.doctor.pk]), max_queries=7)
+
+    def test_schedule_list(self):
+        self.assertGetWithinBudget(reverse("administration:schedules"), max_queries=6)
+
+    def test_schedule_forms(self):
+        self.assertGetWithinBudget(reverse("administration:schedules-add"), max_queries=3)
+        self.assertGetWithinBudget(reverse("administration:schedules-edit", args=[self.schedule.pk]), max_queries=4)
+
+    def test_schedule_status_and_delete(self):
+        self.assertPostWithinBudget(
+            reverse("administration:schedules-status", args=[self.schedule.pk]),
+            {"status": DoctorSchedule.Status.PAUSED},
+            max_queries=5,
+        )
+        self.assertPostWithinBudget(
+            reverse("administration:schedules-delete", args=[self.empty_schedule.pk]),
+            max_queries=10,
+        )
+
+    def test_department_pages(self):
+        self.assertGetWithinBudget(reverse("administration:departments"), max_queries=3)
+        self.assertGetWithinBudget(reverse("administration:departments-add"), max_queries=2)
+        self.assertGetWithinBudget(
+            reverse("administration:departments-edit", args=[self.department.pk]),
+            max_queries=3,
+        )
+
+    def test_department_toggle(self):
+        self.assertPostWithinBudget(
+            reverse("administration:departments-toggle", args=[self.department.pk]),
+            max_queries=5,
+        )
+
+    def test_report(self):
+        self.assertGetWithinBudget(reverse("administration:reports"), max_queries=4)
+        url = f"{reverse('administration:reports')}?start_date={timezone.localdate()}"
+        self.assertGetWithinBudget(url, max_queries=7, max_seconds=2.0)
+
+    def test_announcement_pages(self):
+        # 第一次分頁會查詢資料表的統計資訊並快取，之後只剩精確計數。
+        self.assertGetWithinBudget(reverse("administration:announcements"), max_queries=5)
+        self.assertGetWithinBudget(reverse("administration:announcements"), max_queries=4)
+        self.assertGetWithinBudget(reverse("administration:announcements-add"), max_queries=2)
+        self.assertGetWithinBudget(
+            reverse("administration:announcements-edit", args=[self.announcement.pk]),
+            max_queries=3,
+        )
+
+    def test_announcement_toggle_and_delete(self):
+        etag = self.client.get(reverse("home")).headers["ETag"]
+        self.assertPostWithinBudget(
+            reverse("administration:announcements-toggle", args=[self.announcement.pk]),
+            max_queries=5,
+        )
+        self.assertPostWithinBudget(
+            reverse("administration:announcements-delete", args=[self.announcement.pk]),
+            max_queries=5,
+        )
+        # 公告異動後首頁的 ETag 必須改變，瀏覽器不會再拿到舊頁面的 304。
+        self.assertEqual(self.client.get(reverse("home"), headers={"if-none-match": etag}).status_code, 200)
+
+    @override_settings(PATIENT_IMPORT_MAX_ROWS=2)
+    def test_patient_import(self):
+        self.assertGetWithinBudget(reverse("administration:patients-import"), max_queries=2)
+        upload = SimpleUploadedFile(
+            "partner.csv",
+            "national_id,first_name,last_name,birth_date,phone_number,password\n"
+            "A123456789,小明,王,1990-01-02,0912000001,first-pass\n".encode(),
+        )
+        response = self.assertPostWithinBudget(
+            reverse("administration:patients-import"),
+            {"file": upload},
+            max_queries=12,
+            status=200,
+        )
+        self.assertContains(response, "新增病患：1")
+        self.assertTrue(Patient.objects.filter(national_id="A123456789").exists())
+
+        # 超過網頁匯入上限的檔案整份退回，不寫入任何資料。
+        too_large = SimpleUploadedFile(
+            "partner.csv",
+            (
+                "national_id,first_name,last_name,birth_date,phone_number,password\n"
+                "B123456789,小華,林,1991-02-03,0912000002,pass-1\n"
+                "F131104093,美麗,陳,1985-05-06,0912000003,pass-2\n"
+                "C123456789,大同,張,1980-01-01,0912000004,pass-3\n"
+            ).encode(),
+        )
+        response = self.client.post(reverse("administration:patients-import"), {"file": too_large})
+        self.assertContains(response, "網頁匯入最多 2 筆，")
+        self.assertFalse(Patient.objects.filter(national_id="B123456789").exists())
+
+
+class VisibleAnnouncementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        cls.current = Announcement.objects.create(
+            title="停車場施工",
+            content="請改由後門進出。",
+            publish_at=cls.now - datetime.timedelta(days=1),
+            expire_at=cls.now + datetime.timedelta(hours=2),
+        )
+        cls.upcoming = Announcement.objects.create(
+            title="疫苗接種",
+            content="下週開放預約。",
+            publish_at=cls.now + datetime.timedelta(hours=1),
+        )
+        Announcement.objects.create(
+            title="已下架",
+            content="-",
+            publish_at=cls.now - datetime.timedelta(days=1),
+            is_active=False,
+        )
+
+    def setUp(self):
+        # 其他測試可能以模擬時間留下快取，重新開始。
+        services.invalidate()
+
+    def _at(self, moment):
+        return mock.patch("administration.services.timezone.now", return_value=moment)
+
+    def test_cached_until_next_boundary(self):
+        with self._at(self.now):
+            self.assertEqual([entry.pk for entry in services.visible_announcements()], [self.current.pk])
+            with self.assertNumQueries(0):
+                services.visible_announcements()
+            self.assertEqual(services.snapshot().valid_until, self.upcoming.publish_at)
+
+        with self._at(self.upcoming.publish_at):
+            with self.assertNumQueries(1):
+                visible = services.visible_announcements()
+        self.assertEqual([entry.pk for entry in visible], [self.upcoming.pk, self.current.pk])
+
+        with self._at(self.current.expire_at + datetime.timedelta(seconds=1)):
+            self.assertEqual([entry.pk for entry in services.visible_announcements()], [self.upcoming.pk])
+
+    def test_save_invalidates_and_banner_renders(self):
+        self.assertContains(self.client.get(reverse("home")), "停車場施工")
+        self.current.is_active = False
+        self.current.save()
+        response = self.client.get(reverse("clinics:departments"))
+        self.assertNotContains(response, "停車場施工")
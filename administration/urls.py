@@ -5,6 +5,7 @@ from .views import (
     AdminDashboardView,
     AnnouncementListView,
     AppointmentReportView,
+    AvailabilityCalendarView,
     AnnouncementCreateView,
     AnnouncementUpdateView,
     AnnouncementToggleActiveView,
@@ -22,6 +23,7 @@ from .views import (
     DoctorScheduleListView,
     DoctorScheduleStatusUpdateView,
     DoctorScheduleUpdateView,
+    PatientImportView,
 )
 
 app_name = "administration"
@@ -41,6 +43,7 @@ urlpatterns = [
         DoctorScheduleListView.as_view(),
         name="schedules",
     ),
+    path("schedules/calendar/", AvailabilityCalendarView.as_view(), name="schedules-calendar"),
     path("schedules/add/", DoctorScheduleCreateView.as_view(), name="schedules-add"),
     path("schedules/<int:pk>/edit/", DoctorScheduleUpdateView.as_view(), name="schedules-edit"),
     path("schedules/<int:pk>/delete/", DoctorScheduleDeleteView.as_view(), name="schedules-delete"),
@@ -61,6 +64,7 @@ urlpatterns = [
         DepartmentToggleActiveView.as_view(),
         name="departments-toggle",
     ),
+    path("patients/import/", PatientImportView.as_view(), name="patients-import"),
     path(
         "reports/",
         AppointmentReportView.as_view(),
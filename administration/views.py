@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import csv
+from itertools import islice
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
@@ -16,6 +18,10 @@ from django.utils import timezone
 from django.utils.dateparse import parse_date
 
 from clinics.models import Department
+from hospital.pagination import PaginationMixin
+from patients.importer import PatientImporter, detect_format, open_upload, read_rows
+from registrations import availability, reference
+from registrations.forms import AvailabilityCalendarForm
 from registrations.models import Appointment, Doctor, DoctorSchedule
 
 from .forms import (
@@ -25,6 +31,7 @@ from .forms import (
     DoctorUpdateForm,
     AppointmentReportFilterForm,
     AnnouncementForm,
+    PatientImportForm,
 )
 from .models import Announcement
 
@@ -44,7 +51,7 @@ class AdminDashboardView(AdminRoleRequiredMixin, LoginRequiredMixin, TemplateVie
         return context
 
 
-class AnnouncementListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListView):
+class AnnouncementListView(AdminRoleRequiredMixin, LoginRequiredMixin, PaginationMixin, ListView):
     template_name = "administration/announcements.html"
     model = Announcement
     context_object_name = "announcements"
@@ -80,14 +87,11 @@ class AnnouncementListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListView)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        query_params = self.request.GET.copy()
-        query_params.pop("page", None)
         context.update(
             {
                 "active_section": "announcements",
                 "search_query": self.request.GET.get("q", "").strip(),
                 "status_filter": self.request.GET.get("status", "all"),
-                "query_string": query_params.urlencode(),
             }
         )
         return context
@@ -283,7 +287,7 @@ class DoctorListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListView):
                 "search_query": self.request.GET.get("q", "").strip(),
                 "status_filter": self.request.GET.get("status", "all"),
                 "department_filter": self.request.GET.get("department", ""),
-                "departments": Department.objects.order_by("name"),
+                "departments": reference.departments(),
             }
         )
         return context
@@ -354,7 +358,31 @@ class DoctorToggleActiveView(AdminRoleRequiredMixin, LoginRequiredMixin, View):
         return redirect("administration:doctors")
 
 
-class DoctorScheduleListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListView):
+class AvailabilityCalendarView(AdminRoleRequiredMixin, LoginRequiredMixin, TemplateView):
+    """科別名額月曆，資料與病患端相同，來自 ``availability.month_calendar`` 的整月彙總。"""
+
+    template_name = "administration/schedules/calendar.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = AvailabilityCalendarForm(self.request.GET or None)
+        context.update(
+            {
+                "active_section": "schedules",
+                "form": form,
+                "calendar": None,
+                "calendar_links": "admin",
+                "today": timezone.localdate(),
+            }
+        )
+        if form.is_valid():
+            context["calendar"] = availability.month_calendar(
+                form.cleaned_data["department"].pk, form.cleaned_data["month"]
+            )
+        return context
+
+
+class DoctorScheduleListView(AdminRoleRequiredMixin, LoginRequiredMixin, PaginationMixin, ListView):
     template_name = "administration/schedules/list.html"
     model = DoctorSchedule
     context_object_name = "schedules"
@@ -365,12 +393,8 @@ class DoctorScheduleListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListVie
             super()
             .get_queryset()
             .select_related("doctor__user", "doctor__department")
-            .annotate(
-                active_appointments_count=Count(
-                    "appointments",
-                    filter=~Q(appointments__status=Appointment.Status.CANCELLED),
-                )
-            )
+            # 子查詢不需 GROUP BY，分頁計數時會被略過，只有當頁的班表才計算掛號數。
+            .with_active_counts_subquery()
             .order_by("date", "session", "doctor__department__name", "doctor__user__last_name")
         )
         start_param = self.request.GET.get("start", "").strip()
@@ -401,10 +425,8 @@ class DoctorScheduleListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListVie
         context.update(
             {
                 "active_section": "schedules",
-                "departments": Department.objects.order_by("name"),
-                "doctors": Doctor.objects.select_related("user").order_by(
-                    "department__name", "user__last_name"
-                ),
+                "departments": reference.departments(),
+                "doctors": reference.doctors(),
                 "status_filter": self.request.GET.get("status", "all"),
                 "department_filter": self.request.GET.get("department", ""),
                 "doctor_filter": self.request.GET.get("doctor", ""),
@@ -413,9 +435,6 @@ class DoctorScheduleListView(AdminRoleRequiredMixin, LoginRequiredMixin, ListVie
                 "status_choices": DoctorSchedule.Status.choices,
             }
         )
-        query_params = self.request.GET.copy()
-        query_params.pop("page", None)
-        context["query_string"] = query_params.urlencode()
         return context
 
 
@@ -662,3 +681,47 @@ class AppointmentReportView(AdminRoleRequiredMixin, LoginRequiredMixin, Template
             )
 
         return response
+
+
+class PatientImportView(AdminRoleRequiredMixin, LoginRequiredMixin, TemplateView):
+    template_name = "administration/patients/import.html"
+    form_class = PatientImportForm
+    max_listed_errors = 50
+
+    def post(self, request, *args, **kwargs):
+        form = self.form_class(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.render_to_response(self.get_context_data(form=form))
+        upload = form.cleaned_data["file"]
+        fmt = form.cleaned_data["format"] or detect_format(upload.name)
+        # 在請求中逐筆雜湊密碼，不啟動行程池；超過上限的檔案整份退回，請改用 import_patients 指令。
+        max_rows = settings.PATIENT_IMPORT_MAX_ROWS
+        rows = list(islice(read_rows(open_upload(upload), fmt), max_rows + 1))
+        if len(rows) > max_rows:
+            form.add_error(
+                "file",
+                f"網頁匯入最多 {max_rows} 筆，較大的檔案請改用 manage.py import_patients 指令。",
+            )
+            return self.render_to_response(self.get_context_data(form=form))
+        result = PatientImporter(workers=1).run(rows)
+        if result.created:
+            messages.success(request, f"已匯入 {result.created} 位病患。")
+        if result.duplicates or result.errors:
+            messages.warning(
+                request,
+                f"略過重複 {result.duplicates} 筆、格式錯誤 {result.error_count} 筆。",
+            )
+        return self.render_to_response(
+            self.get_context_data(
+                form=self.form_class(),
+                result=result,
+                listed_errors=result.errors[: self.max_listed_errors],
+            )
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.setdefault("form", self.form_class())
+        context["active_section"] = "patients"
+        context["max_rows"] = settings.PATIENT_IMPORT_MAX_ROWS
+        return context
@@ -1,3 +1,42 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+from unittest import mock
+
+from django.urls import reverse
+
+from clinics.views import DepartmentListView
+from system.testing import QueryBudgetTestCase
+
+
+class ClinicPageBudgetTests(QueryBudgetTestCase):
+    def test_department_list(self):
+        self.assertGetWithinBudget(reverse("clinics:departments"), max_queries=1, max_seconds=0.5)
+        # 參考資料快取暖機後不再查詢資料庫
+        self.assertGetWithinBudget(reverse("clinics:departments"), max_queries=0, max_seconds=0.5)
+
+    def test_conditional_get_and_invalidation(self):
+        url = reverse("clinics:departments")
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        self.assertIn("Last-Modified", response.headers)
+        self.assertIn("public", response.headers["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(revalidated.status_code, 304)
+
+        self.department.name = "新科別名稱"
+        self.department.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertContains(response, "新科別名稱")
+
+    def test_unused_query_params_share_cache_entry(self):
+        url = reverse("clinics:departments")
+        etag = self.client.get(f"{url}?x=1").headers["ETag"]
+        # 未讀取的參數不進入快取鍵，換一個值仍命中整頁快取，不會重新渲染。
+        with mock.patch.object(DepartmentListView, "get_context_data", side_effect=AssertionError):
+            response = self.client.get(f"{url}?x=2&utm_source=mail")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["ETag"], etag)
@@ -2,12 +2,14 @@ from __future__ import annotations
 
 from django.views.generic import ListView
 
-from .models import Department
+from hospital.views import CachedPageMixin
+from registrations import reference
 
 
-class DepartmentListView(ListView):
+class DepartmentListView(CachedPageMixin, ListView):
     template_name = "clinics/departments.html"
     context_object_name = "departments"
+    cache_namespaces = (reference.NAMESPACE,)
 
     def get_queryset(self):  # pragma: no cover
-        return Department.objects.filter(is_active=True)
+        return reference.departments(active_only=True)
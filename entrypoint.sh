@@ -9,6 +9,9 @@ if [ "${DJANGO_DB_SQLITE_PATH:-}" != "" ]; then
 fi
 
 python manage.py migrate --noinput
+if [ "${DJANGO_CACHE_BACKEND:-}" = "sqlite" ]; then
+    python manage.py createcachetable --database cache
+fi
 python manage.py collectstatic --noinput
 
 exec "$@"
@@ -0,0 +1,180 @@
+"""gunicorn 設定：依容器可用的 CPU 與記憶體決定 worker 與執行緒數，並預先載入 Django。
+
+gunicorn 會自動讀取工作目錄下的 ``gunicorn.conf.py``。所有數值都可用環境變數覆寫：
+
+- ``GUNICORN_WORKERS`` / ``GUNICORN_THREADS``：直接指定 worker 與執行緒數。
+- ``GUNICORN_WORKER_MEMORY_MB``：估算每個 worker 佔用的記憶體，用來決定 worker 上限（預設 150）。
+- ``GUNICORN_MAX_WORKERS``：自動計算的 worker 數上限（預設 8）；資料庫為 SQLite 時寫入只能依序進行，
+  worker 再多也無法提高吞吐量。
+- ``GUNICORN_WORKER_CLASS``：``sync``、``gthread`` 或 ``uvicorn_worker.UvicornWorker``（ASGI）。
+- ``GUNICORN_MAX_REQUESTS`` / ``GUNICORN_MAX_REQUESTS_JITTER``：處理指定請求數後重啟 worker。
+- ``GUNICORN_PRELOAD``：設為 ``0`` 可關閉預先載入（例如需要 ``--reload`` 時）。
+- ``GUNICORN_WARMUP``：設為 ``0`` 可關閉開機預熱（見 ``hospital.warmup``）。
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from hospital import workerstats
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _available_cpus() -> int:
+    """容器可用的 CPU 數：CPU affinity 與 cgroup 配額（``cpu.max`` / ``cpu.cfs_quota_us``）取較小者。"""
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - macOS 沒有 sched_getaffinity
+        cpus = os.cpu_count() or 1
+    quota = period = None
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+    except (OSError, ValueError):
+        try:
+            quota = Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text().strip()
+            period = Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text().strip()
+        except OSError:
+            pass
+    # 沒有配額時 v2 為 "max"、v1 為 -1
+    if quota and period and quota.isdigit() and period.isdigit() and int(period) > 0:
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(cpus, 1)
+
+
+def _available_memory_mb() -> int | None:
+    """容器的 cgroup 記憶體上限；沒有限制時回傳 ``None``，不以主機總記憶體估算。"""
+
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            raw = Path(path).read_text().strip()
+        except OSError:
+            continue
+        # cgroup v1 沒有限制時回傳接近 2^63 的數值
+        if raw.isdigit() and int(raw) < 1 << 60:
+            return int(raw) // (1024 * 1024)
+    return None
+
+
+def _default_workers(cpus: int, memory_mb: int | None, worker_memory_mb: int, max_workers: int) -> int:
+    workers = min(cpus * 2 + 1, max_workers)
+    if memory_mb:
+        # 保留四分之一給 master 與作業系統
+        workers = min(workers, memory_mb * 3 // 4 // worker_memory_mb)
+    return max(workers, 1)
+
+
+cpus = _available_cpus()
+memory_mb = _available_memory_mb()
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = _env_int(
+    "GUNICORN_WORKERS",
+    _default_workers(
+        cpus,
+        memory_mb,
+        _env_int("GUNICORN_WORKER_MEMORY_MB", 150),
+        _env_int("GUNICORN_MAX_WORKERS", 8),
+    ),
+)
+# 執行緒共用 worker 的記憶體；等待資料庫或網路時由其他執行緒接手。ASGI worker 不使用此設定。
+threads = _env_int("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1)
+timeout = _env_int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# 在 master 載入 Django 後再 fork，設定、URL resolver 與範本只載入一次，worker 以 copy-on-write 共用。
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+warmup = os.environ.get("GUNICORN_WARMUP", "1") == "1"
+# 定期重啟 worker 以回收記憶體碎片；加上隨機抖動，避免所有 worker 同時重啟。
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+_stats_lock = threading.Lock()
+
+
+def on_starting(server):
+    # 上次執行留下的統計檔（pid 可能被重複使用）
+    workerstats.clear()
+
+
+def _warm_up(log, label: str, **stages) -> None:
+    from hospital import warmup as warmup_stages
+
+    timings = warmup_stages.run(**stages)
+    log.info(
+        "%s 預熱完成：%s",
+        label,
+        "、".join(f"{name} {count} 項 {seconds * 1000:.0f} ms" for name, (seconds, count) in timings.items()),
+    )
+
+
+def when_ready(server):
+    if preload_app and warmup:
+        # 預先載入時在 master 編譯路由、範本與翻譯，fork 後所有 worker 共用。
+        _warm_up(server.log, "master", databases=False)
+    server.log.info(
+        "gunicorn：%s 個 %s worker × %s 執行緒（CPU %s、記憶體 %s MB），preload=%s",
+        workers,
+        worker_class,
+        threads,
+        cpus,
+        memory_mb or "未知",
+        preload_app,
+    )
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # master 預先載入時若開過資料庫連線，子行程不可沿用同一條連線。
+        from django.db import connections
+
+        connections.close_all()
+    worker.hospital_stats = workerstats.WorkerStats(pid=worker.pid, booted_at=time.time())
+    worker.hospital_stats.write(force=True)
+
+
+def post_worker_init(worker):
+    if warmup:
+        # Django 的資料庫連線屬於各執行緒：gthread 的請求在 ``worker.tpool`` 中處理，連線要在池內開啟；
+        # sync worker 在主執行緒處理請求；ASGI worker 由 asgiref 另開執行緒存取資料庫，無法預先開啟。
+        pool = getattr(worker, "tpool", None)
+        _warm_up(
+            worker.log,
+            f"worker {worker.pid}",
+            shared=not preload_app,
+            databases=pool is not None or worker_class == "sync",
+            pool=pool,
+            pool_size=threads,
+        )
+
+
+def pre_request(worker, req):
+    # gthread worker 會在多個執行緒同時處理請求，開始時間記在各自的 req 上。
+    req.hospital_started = time.perf_counter()
+
+
+def post_request(worker, req, environ, resp):
+    # ASGI worker 不會呼叫此 hook，只會留下開機時的紀錄。
+    stats = getattr(worker, "hospital_stats", None)
+    if stats is None:
+        return
+    with _stats_lock:
+        stats.record(time.perf_counter() - req.hospital_started, resp.status_code or 0)
+        stats.write()
+
+
+def child_exit(server, worker):
+    workerstats.remove(worker.pid)
@@ -0,0 +1,68 @@
+"""大型資料表的後台設定。
+
+病患、使用者、掛號與事件紀錄都可能達到數百萬筆，Django 後台預設的做法
+（精確計數、``icontains`` 搜尋、列出所有外鍵選項）在這個量級下每頁都要數十秒。
+"""
+
+from __future__ import annotations
+
+from django.contrib import admin
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.db.models import Q
+
+from patients.lookup import search_patients
+
+from .pagination import EstimatedCountPaginator
+
+
+def _prefix_lookup(field: str) -> str:
+    if field.startswith("="):
+        return f"{field[1:]}__iexact"
+    return f"{field.lstrip('^@')}__istartswith"
+
+
+class PerformanceAdminMixin:
+    """以估計筆數分頁，不顯示篩選前的總筆數，並改用索引查詢搜尋病患。
+
+    - ``patient_search_field``：指向病患的欄位路徑（例如 ``"patient"``、``"appointment__patient"``），
+      設定後搜尋框以 ``patients.lookup.search_patients`` 的索引查詢找出病患，再以主鍵篩選。
+    - ``exact_search_fields``：額外以等值條件比對的欄位，例如有唯一索引的帳號。
+
+    原本宣告的 ``search_fields`` 仍會比對，但改為前綴比對（``istartswith``，``=`` 開頭的欄位為
+    ``iexact``），不再對每個欄位做全表 ``icontains``；醫師、職員帳號與家屬姓名依然搜得到。
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    patient_search_field: str | None = None
+    exact_search_fields: tuple[str, ...] = ()
+    search_limit = 100
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if isinstance(self.list_select_related, (list, tuple)) and self.list_select_related:
+            # 外鍵自動完成同樣以 ``__str__`` 顯示選項，沿用列表頁的 select_related。
+            queryset = queryset.select_related(*self.list_select_related)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term or (self.patient_search_field is None and not self.exact_search_fields):
+            return super().get_search_results(request, queryset, search_term)
+        condition = Q()
+        may_have_duplicates = False
+        for field in self.get_search_fields(request):
+            lookup = _prefix_lookup(field)
+            condition |= Q(**{lookup: term})
+            may_have_duplicates |= lookup_spawns_duplicates(self.opts, lookup)
+        for field in self.exact_search_fields:
+            condition |= Q(**{field: term})
+        if self.patient_search_field is not None:
+            patient_ids = [match.patient.pk for match in search_patients(term, limit=self.search_limit)]
+            condition |= Q(**{f"{self.patient_search_field}__in": patient_ids})
+        return queryset.filter(condition), may_have_duplicates
+
+
+class PerformanceModelAdmin(PerformanceAdminMixin, admin.ModelAdmin):
+    pass
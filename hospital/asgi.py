@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hospital.settings.prod")
+# 非同步 view 的查詢在執行緒池中進行，持久連線會隨執行緒累積而無法回收，ASGI 模式預設每個請求結束即關閉。
+os.environ.setdefault("DJANGO_DB_CONN_MAX_AGE", "0")
 
 application = get_asgi_application()
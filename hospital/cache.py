@@ -0,0 +1,149 @@
+"""快取共用工具：以版本號讓整組快取一次失效，並統計各類快取的命中率。
+
+資料異動時只需遞增命名空間的版本號，舊版本的快取鍵自然不再被讀取，
+不必逐一找出並刪除。版本號存放在預設快取，多個行程共用時需設定共享的快取後端
+（見 settings 的 ``DJANGO_CACHE_BACKEND``）。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(namespace: str) -> str:
+    return f"version:{namespace}"
+
+
+def _modified_key(namespace: str) -> str:
+    return f"modified:{namespace}"
+
+
+def get_version(namespace: str) -> int:
+    # 以目前時間作為初始版本，快取被清空後重新建立的版本號不會與行程內記住的舊版本重複。
+    return cache.get_or_set(_version_key(namespace), time.time_ns, timeout=None)
+
+
+def get_last_modified(namespace: str) -> int:
+    """命名空間最後一次異動的 Unix 時間（秒），供 ``Last-Modified`` 標頭使用。"""
+
+    return cache.get_or_set(_modified_key(namespace), lambda: int(time.time()), timeout=None)
+
+
+def _incr_version(namespace: str) -> None:
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+    cache.set(_modified_key(namespace), int(time.time()), timeout=None)
+
+
+class _CommitBump:
+    """交易提交後遞增版本號的 ``on_commit`` 回呼，提交前兼作只屬於這個交易的暫存。"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.done = False
+        self.memo: dict = {}
+
+    def __call__(self) -> None:
+        self.done = True
+        _incr_version(self.namespace)
+
+
+def bump_version(namespace: str) -> None:
+    """讓 ``namespace`` 底下的快取失效。
+
+    立即遞增一次，讓同一交易後續的讀取不會拿到舊快取；交易提交後再遞增一次，
+    避免其他行程在提交前以舊資料重建快取並寫入新版本號底下。
+    提交前同一交易的讀取不可寫入共用快取（見 ``pending_bump``）。
+    """
+
+    _incr_version(namespace)
+    transaction.on_commit(_CommitBump(namespace))
+
+
+def pending_bump(namespace: str) -> _CommitBump | None:
+    """目前交易遞增過 ``namespace`` 且尚未提交時，回傳最近一次的回呼，否則回傳 ``None``。
+
+    此時讀到的是未提交的資料，交易若回復，寫入共用快取的內容會以已生效的版本號留到逾時；
+    讀取端應改存在回傳物件的 ``memo``。交易回復時 Django 會捨棄尚未執行的回呼，不需另外清除。
+    """
+
+    for _, callback, _ in reversed(transaction.get_connection().run_on_commit):
+        if isinstance(callback, _CommitBump) and callback.namespace == namespace and not callback.done:
+            return callback
+    return None
+
+
+def versioned_key(namespace: str, *parts: object) -> str:
+    return ":".join([namespace, str(get_version(namespace)), *map(str, parts)])
+
+
+# 命中統計先累積在行程內，定期以 ``incr`` 合併到共用快取，避免每次讀取都多一次快取往返。
+_STATS_NAMES_KEY = "stats:names"
+_stats: Counter[tuple[str, str]] = Counter()
+_stats_lock = threading.Lock()
+_stats_flushed_at = time.monotonic()
+
+
+def _stats_key(name: str, kind: str) -> str:
+    return f"stats:{name}:{kind}"
+
+
+def record(name: str, hit: bool) -> None:
+    """記錄一次 ``name`` 快取的命中或未命中。"""
+
+    global _stats_flushed_at
+    with _stats_lock:
+        _stats[(name, "hits" if hit else "misses")] += 1
+        due = time.monotonic() - _stats_flushed_at >= settings.CACHE_STATS_FLUSH_SECONDS
+        if due:
+            _stats_flushed_at = time.monotonic()
+    if due:
+        flush_stats()
+
+
+def flush_stats() -> None:
+    global _stats
+    with _stats_lock:
+        pending, _stats = _stats, Counter()
+    if not pending:
+        return
+    for (name, kind), count in pending.items():
+        key = _stats_key(name, kind)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.set(key, count, timeout=None)
+    names = set(cache.get(_STATS_NAMES_KEY) or ())
+    new_names = {name for name, _ in pending} - names
+    if new_names:
+        cache.set(_STATS_NAMES_KEY, sorted(names | new_names), timeout=None)
+
+
+def read_stats() -> dict[str, tuple[int, int]]:
+    """各類快取累計的 ``(命中, 未命中)`` 次數；尚未合併的行程內計數不包含在內。"""
+
+    names = cache.get(_STATS_NAMES_KEY) or []
+    keys = [_stats_key(name, kind) for name in names for kind in ("hits", "misses")]
+    values = cache.get_many(keys)
+    return {
+        name: (values.get(_stats_key(name, "hits"), 0), values.get(_stats_key(name, "misses"), 0))
+        for name in names
+    }
+
+
+def reset_stats() -> None:
+    names = cache.get(_STATS_NAMES_KEY) or []
+    cache.delete_many([_stats_key(name, kind) for name in names for kind in ("hits", "misses")])
+    cache.delete(_STATS_NAMES_KEY)
+    with _stats_lock:
+        _stats.clear()
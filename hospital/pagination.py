@@ -0,0 +1,257 @@
+"""大型資料表的分頁：避免每次翻頁都對整張表執行 ``COUNT(*)``。
+
+- ``EstimatedCountPaginator``：未篩選時改用資料庫統計資訊的估計筆數（PostgreSQL 的
+  ``pg_class.reltuples``、SQLite 執行 ``ANALYZE`` 後的 ``sqlite_stat1``）；有篩選條件時
+  只精確計算到 ``max_count`` 筆，超過的部分依 ``count_cache_timeout`` 改用快取的筆數或直接截斷。
+- ``KeysetPaginator``：以排序欄位的值（游標）取下一頁或上一頁，完全不計數，
+  翻到多深都只是一次有 ``LIMIT`` 的索引查詢。
+- ``PaginationMixin``：給 ``ListView`` 使用，以 ``pagination_mode`` 選擇上述兩種分頁方式。
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Model, Q, QuerySet
+from django.utils.functional import cached_property
+
+
+COUNT_CACHE_PREFIX = "paginator-count"
+# 統計資訊只在 ANALYZE 後更新，估計值快取一段時間即可
+ESTIMATE_CACHE_TIMEOUT = 10 * 60
+
+
+def estimate_row_count(model: type[Model], using: str = "default") -> int | None:
+    """回傳資料庫統計的估計筆數；不支援或尚未收集統計時回傳 ``None``。"""
+
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        elif connection.vendor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # stat 欄位的第一個數字為資料表（或索引）的列數
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s ORDER BY idx IS NOT NULL LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    try:
+        estimate = int(str(row[0]).split()[0])
+    except ValueError:
+        return None
+    # PostgreSQL 從未 ANALYZE 的資料表回傳 -1
+    return estimate if estimate >= 0 else None
+
+
+def cached_estimate(model: type[Model], using: str = "default") -> int | None:
+    key = f"{COUNT_CACHE_PREFIX}:estimate:{using}:{model._meta.db_table}"
+    estimate = cache.get(key)
+    if estimate is None:
+        estimate = estimate_row_count(model, using)
+        # 以 -1 記住「沒有統計資訊」，避免每次都重新查詢
+        cache.set(key, -1 if estimate is None else estimate, ESTIMATE_CACHE_TIMEOUT)
+    return estimate if estimate is None or estimate >= 0 else None
+
+
+def _count_cache_key(queryset: QuerySet) -> str:
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f"{queryset.db}:{sql}:{params!r}".encode()).hexdigest()
+    return f"{COUNT_CACHE_PREFIX}:{digest}"
+
+
+class EstimatedCountPaginator(Paginator):
+    """以估計筆數、快取筆數或有上限的計數分頁。
+
+    估計值小於 ``max_count`` 時資料量不大，直接精確計算；
+    篩選後的結果先只計算到 ``max_count`` 筆。若達到上限：
+    設定 ``count_cache_timeout`` 時精確計數一次並快取該秒數，否則停在上限不再往後翻頁。
+    """
+
+    max_count = 10_000
+    count_cache_timeout: int | None = None
+
+    def __init__(self, *args, count_cache_timeout: int | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count_cache_timeout is not None:
+            self.count_cache_timeout = count_cache_timeout
+        # 筆數是否來自估計或快取，頁面可據此顯示「約」
+        self.is_estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            return super().count
+        if not queryset.query.has_filters():
+            estimate = cached_estimate(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.max_count:
+                self.is_estimated = True
+                return estimate
+        # 只選主鍵並清除排序，子查詢形式的計數不會帶上附加欄位與排序的成本。
+        bounded = queryset.order_by().values("pk")[: self.max_count].count()
+        if bounded < self.max_count or not self.count_cache_timeout:
+            return bounded
+        key = _count_cache_key(queryset)
+        total = cache.get(key)
+        if total is None:
+            total = queryset.count()
+            cache.set(key, total, self.count_cache_timeout)
+        else:
+            self.is_estimated = True
+        return total
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    per_page: int
+    has_next: bool
+    has_previous: bool
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    paginator: KeysetPaginator | None = field(default=None, repr=False)
+
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """以 ``ordering`` 欄位的值為游標的分頁，不計算總筆數。
+
+    ``ordering`` 需能唯一決定順序（最後一個欄位通常是 ``pk``），且欄位不可為 NULL；
+    游標經過簽章，使用者無法竄改成任意的查詢條件。
+    """
+
+    salt = "hospital.pagination.keyset"
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: tuple[str, ...] = ("-pk",)):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    @staticmethod
+    def _field(term: str) -> tuple[str, bool]:
+        return term.lstrip("-"), term.startswith("-")
+
+    def _after(self, values: list, *, forward: bool) -> Q:
+        """排序在 ``values`` 之後（``forward=False`` 時為之前）的資料列條件。"""
+
+        condition = Q()
+        for index, term in enumerate(self.ordering):
+            name, descending = self._field(term)
+            lookup = "lt" if descending == forward else "gt"
+            clause = Q(**{f"{name}__{lookup}": values[index]})
+            for previous_term, value in zip(self.ordering[:index], values):
+                clause &= Q(**{self._field(previous_term)[0]: value})
+            condition |= clause
+        return condition
+
+    def _values(self, obj) -> list:
+        values = []
+        for term in self.ordering:
+            value = obj
+            for part in self._field(term)[0].split("__"):
+                value = getattr(value, part)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    def _encode(self, obj, direction: str) -> str:
+        return signing.dumps({"v": self._values(obj), "d": direction}, salt=self.salt, compress=True)
+
+    def _decode(self, cursor: str | None) -> tuple[list | None, str]:
+        if not cursor:
+            return None, "next"
+        try:
+            data = signing.loads(cursor, salt=self.salt)
+            values, direction = data["v"], data["d"]
+        except (signing.BadSignature, KeyError, TypeError):
+            return None, "next"
+        if len(values) != len(self.ordering) or direction not in {"next", "previous"}:
+            return None, "next"
+        return values, direction
+
+    def page(self, cursor: str | None = None) -> KeysetPage:
+        values, direction = self._decode(cursor)
+        forward = direction == "next"
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, forward=forward))
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(*(term[1:] if term.startswith("-") else f"-{term}" for term in self.ordering))
+        # 多取一筆判斷該方向是否還有資料
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if forward:
+            has_next, has_previous = has_more, values is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        page = KeysetPage(
+            object_list=rows,
+            per_page=self.per_page,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            paginator=self,
+        )
+        if page.has_next:
+            page.next_cursor = self._encode(rows[-1], "next")
+        if page.has_previous:
+            page.previous_cursor = self._encode(rows[0], "previous")
+        return page
+
+
+class PaginationMixin:
+    """``ListView`` 用的分頁設定。
+
+    - ``pagination_mode = "count"``：頁碼分頁，筆數以 ``EstimatedCountPaginator`` 估計或快取。
+    - ``pagination_mode = "keyset"``：只有上一頁／下一頁，依 ``keyset_ordering`` 以游標翻頁，不計數。
+
+    範本可使用 ``includes/pagination.html``，``pagination_query_string`` 為去除分頁參數後的查詢字串。
+    """
+
+    paginator_class = EstimatedCountPaginator
+    pagination_mode = "count"
+    keyset_ordering: tuple[str, ...] = ("-pk",)
+    cursor_kwarg = "cursor"
+    count_cache_timeout: int | None = 300
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if issubclass(self.paginator_class, EstimatedCountPaginator):
+            kwargs.setdefault("count_cache_timeout", self.count_cache_timeout)
+        return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.pagination_mode != "keyset":
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query_params = self.request.GET.copy()
+        query_params.pop(self.page_kwarg, None)
+        query_params.pop(self.cursor_kwarg, None)
+        context["pagination_query_string"] = query_params.urlencode()
+        context["pagination_mode"] = self.pagination_mode
+        context["cursor_kwarg"] = self.cursor_kwarg
+        return context
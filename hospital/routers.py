@@ -0,0 +1,21 @@
+"""資料庫路由：``DJANGO_CACHE_BACKEND=sqlite`` 時把快取表放到獨立的 ``cache`` 資料庫。"""
+
+from __future__ import annotations
+
+# DatabaseCache 內部以 app_label 為 ``django_cache`` 的虛擬模型代表快取表
+CACHE_APP_LABEL = "django_cache"
+CACHE_DATABASE = "cache"
+
+
+class CacheRouter:
+    def db_for_read(self, model, **hints):
+        return CACHE_DATABASE if model._meta.app_label == CACHE_APP_LABEL else None
+
+    def db_for_write(self, model, **hints):
+        return CACHE_DATABASE if model._meta.app_label == CACHE_APP_LABEL else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == CACHE_APP_LABEL:
+            return db == CACHE_DATABASE
+        # 快取資料庫只放快取表，其餘 app 的資料表不建立在這裡。
+        return None if db != CACHE_DATABASE else False
@@ -7,7 +7,9 @@ development, staging, and production. Environment-specific overrides live in
 
 from __future__ import annotations
 
+import importlib.util
 import os
+import warnings
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -47,7 +49,7 @@ MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -64,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'administration.context_processors.announcements',
             ],
         },
     },
@@ -92,6 +95,72 @@ if _sqlite_path:
 DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DJANGO_DB_CONN_MAX_AGE", 600))
 
 
+# Cache
+# 依 DJANGO_CACHE_BACKEND 選擇快取設定：
+#   locmem    每個行程各自的記憶體快取（開發預設）
+#   sqlite    獨立的 SQLite 檔案，同一台主機的多個 worker 共用，不需另外架設服務（Docker 單機部署）
+#   file      檔案快取，同樣可跨行程共用
+#   redis     需安裝 redis 套件，DJANGO_CACHE_LOCATION 例如 redis://127.0.0.1:6379/1
+#   memcached 需安裝 pymemcache，DJANGO_CACHE_LOCATION 例如 127.0.0.1:11211
+# redis / memcached 的用戶端套件未安裝時退回 sqlite，避免整個服務無法啟動。
+
+_NETWORK_CACHE_CLIENTS = {"redis": "redis", "memcached": "pymemcache"}
+
+
+def _cache_profile(backend: str, location: str) -> tuple[dict, dict | None]:
+    """回傳 ``(CACHES["default"], 快取專用資料庫設定或 None)``。"""
+
+    client = _NETWORK_CACHE_CLIENTS.get(backend)
+    if client and importlib.util.find_spec(client) is None:
+        warnings.warn(f"DJANGO_CACHE_BACKEND={backend} 但未安裝 {client}，改用 sqlite 快取", RuntimeWarning)
+        backend, location = "sqlite", ""
+
+    if backend == "locmem":
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": location or "hospital"}, None
+    if backend == "file":
+        return {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": location or str(Path(DATABASES["default"]["NAME"]).parent / "cache"),
+        }, None
+    if backend == "sqlite":
+        # 快取表放在獨立的 SQLite 檔案，寫入快取不會與主資料庫爭搶寫入鎖。
+        database = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": location or Path(DATABASES["default"]["NAME"]).parent / "cache.sqlite3",
+            "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+            "OPTIONS": {
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+                "transaction_mode": "IMMEDIATE",
+            },
+        }
+        return {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "hospital_cache",
+            "OPTIONS": {"MAX_ENTRIES": 50_000},
+        }, database
+    if backend == "redis":
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": location or "redis://127.0.0.1:6379/1",
+        }, None
+    if backend == "memcached":
+        return {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": location or "127.0.0.1:11211",
+        }, None
+    raise ValueError(f"未知的 DJANGO_CACHE_BACKEND：{backend}")
+
+
+CACHE_BACKEND = os.environ.get("DJANGO_CACHE_BACKEND", "locmem")
+_default_cache, _cache_database = _cache_profile(CACHE_BACKEND, os.environ.get("DJANGO_CACHE_LOCATION", ""))
+CACHES = {"default": {**_default_cache, "KEY_PREFIX": "hospital", "TIMEOUT": 300}}
+if _cache_database is not None:
+    DATABASES["cache"] = _cache_database
+    DATABASE_ROUTERS = ["hospital.routers.CacheRouter"]
+
+# 快取命中統計（``hospital.cache.record``）由各行程累積，每隔幾秒合併寫入共用快取一次
+CACHE_STATS_FLUSH_SECONDS = float(os.environ.get("DJANGO_CACHE_STATS_FLUSH_SECONDS", 10))
+
 # Password validation — 為了允許簡易密碼，關閉預設驗證規則
 AUTH_PASSWORD_VALIDATORS: list[dict[str, str]] = []
 
@@ -129,6 +198,31 @@ LOCALE_PATHS = [BASE_DIR / "locale"]
 CSRF_TRUSTED_ORIGINS = [origin for origin in os.environ.get("DJANGO_CSRF_TRUSTED_ORIGINS", "").split(",") if origin]
 
 AUTH_USER_MODEL = "accounts.User"
+AUTHENTICATION_BACKENDS = ["accounts.backends.ProfileModelBackend"]
+
+# Session 儲存方式（DJANGO_SESSION_ENGINE）：
+#   db             每個請求讀取一次 django_session
+#   cached_db      先讀快取，未命中才查資料庫；寫入時同時更新兩者
+#   cache          只存在快取，快取清空時所有人都會被登出
+#   signed_cookies 內容簽章後存放在瀏覽器 cookie，伺服器端不需查詢
+# 未設定時，有跨行程共用的快取才使用 cached_db；locmem 各 worker 的快取彼此不同步，
+# 登出或權限異動後其他 worker 仍會讀到舊的 session，因此維持 db。
+_SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_ENGINE = _SESSION_ENGINES[
+    os.environ.get("DJANGO_SESSION_ENGINE", "db" if CACHE_BACKEND == "locmem" else "cached_db")
+]
+
+# 新病歷號是否附加 Luhn 檢查碼（MRN + 8 碼序號 + 1 碼檢查碼）
+PATIENT_MRN_CHECK_DIGIT = os.environ.get("DJANGO_PATIENT_MRN_CHECK_DIGIT", "0") == "1"
+
+# 網頁上傳病患匯入的筆數上限：密碼在請求中逐筆雜湊（每筆約 0.5 秒），需在 gunicorn timeout 內完成；
+# 更大的檔案請改用 manage.py import_patients 指令。
+PATIENT_IMPORT_MAX_ROWS = int(os.environ.get("DJANGO_PATIENT_IMPORT_MAX_ROWS", "50"))
 
 LOGIN_URL = "accounts:login"
 LOGIN_REDIRECT_URL = "patients:dashboard"
@@ -18,7 +18,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
-from django.views.generic import TemplateView
+
+from .views import HomeView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -35,7 +36,7 @@ urlpatterns = [
     ),
     path(
         "",
-        TemplateView.as_view(template_name="core/home.html"),
+        HomeView.as_view(),
         name="home",
     ),
 ]
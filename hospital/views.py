@@ -0,0 +1,141 @@
+"""跨 app 共用的頁面元件。"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import get_language
+from django.views.generic import TemplateView
+
+from administration import services as announcements
+
+from .cache import get_last_modified, get_version, record
+
+
+class AsyncUserMixin:
+    """讓非同步 view 沿用既有的同步權限 mixin；須放在所有 mixin 的最前面。
+
+    ``request.user`` 預設延遲載入，在事件迴圈中第一次讀取會觸發同步查詢而失敗。
+    這裡先以 ``request.auser()`` 非同步載入並換成實際物件，之後 ``LoginRequiredMixin``、
+    ``UserPassesTestMixin`` 與範本中的 ``user`` 都不會再查詢資料庫。
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+
+class CachedPageMixin:
+    """內容只隨參考資料版本與登入身分變動的頁面：提供 ``ETag`` / ``Last-Modified`` 與整頁快取。
+
+    - ETag 由網址路徑、``cache_query_params`` 列出的查詢參數、``cache_namespaces`` 的版本號與使用者身分組成，資料異動由 signal 遞增版本即失效；
+      瀏覽器帶回相同 ETag 時直接回應 304，不必渲染範本。
+    - 匿名使用者看到的頁面人人相同，渲染結果整頁存入快取；登入使用者的頁面含姓名與 CSRF token，
+      只做條件式請求，並標示 ``private``。
+    - 範本可用 ``page_version`` 作為 ``{% cache fragment_cache_timeout ... page_version %}`` 片段的鍵，
+      讓登入使用者也能略過查詢；版本號一變舊片段就不再被讀取，逾時可以設得較長。
+    - 其他查詢參數不影響頁面內容，也不進入快取鍵，任意加上 ``?x=N`` 不會產生新的快取項目。
+    - 有待顯示的訊息時不使用快取，避免訊息被吃掉或顯示給其他人。
+    - 每頁都會顯示公告橫幅，ETag 與快取時間一併考慮目前的公告內容與下一次上下架時間。
+    """
+
+    cache_namespaces: tuple[str, ...] = ()
+    # view 實際讀取的 GET 參數，例如分頁的 ``"page"``
+    cache_query_params: tuple[str, ...] = ()
+    page_cache_timeout = 60
+    fragment_cache_timeout = 60 * 60
+
+    def get_cache_namespaces(self) -> tuple[str, ...]:
+        return self.cache_namespaces
+
+    def get_cache_path(self, request) -> str:
+        """快取鍵使用的網址：路徑加上 ``cache_query_params`` 中有出現的參數，依名稱排序。"""
+
+        params = [
+            f"{name}={value}" for name in sorted(self.cache_query_params) for value in request.GET.getlist(name)
+        ]
+        return f"{request.path}?{'&'.join(params)}" if params else request.path
+
+    def get_page_version(self) -> str:
+        return ".".join(str(get_version(namespace)) for namespace in self.get_cache_namespaces())
+
+    def dispatch(self, request, *args, **kwargs):
+        self.page_version = self.get_page_version()
+        banner = announcements.snapshot()
+        if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        anonymous = not request.user.is_authenticated
+        if anonymous:
+            identity = "anonymous"
+        else:
+            # 登入頁面內嵌的 CSRF token 由 cookie 中的密鑰產生，密鑰更換後舊頁面不能再沿用。
+            get_token(request)
+            identity = f"{request.user.pk}:{request.META['CSRF_COOKIE']}"
+        digest = hashlib.md5(
+            f"{self.get_cache_path(request)}|{self.page_version}|{banner.token}|{identity}|{get_language()}".encode()
+        ).hexdigest()
+        etag = quote_etag(digest)
+        # 登入頁面隨身分變動，只靠 ETag 判斷；Last-Modified 只提供給匿名頁面。
+        # 公告依時間上下架時不會遞增版本號，改以重新載入的時間作為異動時間。
+        last_modified = (
+            max(
+                [
+                    int(banner.loaded_at.timestamp()),
+                    *(get_last_modified(namespace) for namespace in self.get_cache_namespaces()),
+                ]
+            )
+            if anonymous
+            else None
+        )
+        timeout = min(self.page_cache_timeout, banner.seconds_remaining(timezone.now()))
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        record("conditional", hit=response is not None)
+        if response is None:
+            page_key = f"page:{digest}"
+            content = cache.get(page_key) if anonymous else None
+            if anonymous:
+                record("page", hit=content is not None)
+            if content is not None:
+                response = HttpResponse(content)
+            else:
+                response = super().dispatch(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if hasattr(response, "render"):
+                    response.render()
+                if anonymous:
+                    cache.set(page_key, response.content, timeout)
+
+        response.headers["ETag"] = etag
+        if last_modified is not None:
+            response.headers["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Cookie",))
+        if anonymous:
+            patch_cache_control(response, public=True, max_age=timeout)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["page_version"] = self.page_version
+        context["fragment_cache_timeout"] = self.fragment_cache_timeout
+        return context
+
+
+class HomeView(CachedPageMixin, TemplateView):
+    # 首頁只隨公告變動，由 CachedPageMixin 本身處理。
+    template_name = "core/home.html"
@@ -0,0 +1,125 @@
+"""worker 開機時預先完成第一個請求才會做的初始化，避免部署或重啟後的延遲尖峰。
+
+- URL：編譯所有路由的正規表示式並建立反查表。
+- 範本：編譯 ``TEMPLATES["DIRS"]`` 底下的所有範本，存入 cached loader。
+- 翻譯：載入 ``LANGUAGE_CODE`` 的翻譯檔。
+- 資料庫：開啟每個資料庫別名的連線。
+
+前三項與連線無關，gunicorn 預先載入時在 master 執行一次，由 worker 以 copy-on-write 共用；
+資料庫連線不能跨 fork 共用，必須在各 worker 內開啟（見 ``gunicorn.conf.py``）。
+Django 的連線屬於各執行緒，gthread worker 的請求在執行緒池中處理，連線要在池內每個執行緒開啟（``pool``）。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Executor
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import translation
+
+
+TEMPLATE_SUFFIXES = (".html", ".txt")
+POOL_WAIT_SECONDS = 5
+
+
+def _walk_patterns(patterns) -> int:
+    count = 0
+    for pattern in patterns:
+        pattern.pattern.regex  # 第一次讀取時才編譯
+        if isinstance(pattern, URLResolver):
+            count += _walk_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            count += 1
+    return count
+
+
+def resolve_urls() -> int:
+    resolver = get_resolver()
+    count = _walk_patterns(resolver.url_patterns)
+    with translation.override(settings.LANGUAGE_CODE):
+        resolver.reverse_dict  # 依語言建立反查表
+    return count
+
+
+def compile_templates() -> int:
+    count = 0
+    for engine in engines.all():
+        for directory in map(Path, engine.dirs):
+            for path in directory.rglob("*"):
+                if path.suffix in TEMPLATE_SUFFIXES:
+                    engine.get_template(path.relative_to(directory).as_posix())
+                    count += 1
+    return count
+
+
+def load_locales() -> int:
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("")
+    return 1
+
+
+def open_connections() -> int:
+    """在目前的執行緒開啟每個資料庫別名的連線。"""
+
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return len(connections.all())
+
+
+def open_pool_connections(pool: Executor, size: int) -> int:
+    """在執行緒池的每個執行緒各開啟連線，回傳完成預熱的執行緒數。
+
+    ``size`` 個工作先在 ``Barrier`` 會合再開啟連線，彼此占住執行緒，確保落在不同的執行緒上。
+    """
+
+    barrier = threading.Barrier(size)
+
+    def open_in_thread() -> int:
+        try:
+            barrier.wait(timeout=POOL_WAIT_SECONDS)
+        except threading.BrokenBarrierError:
+            # 執行緒池比 ``size`` 小時仍在目前的執行緒開啟，只是部分執行緒沒有預熱到。
+            pass
+        open_connections()
+        return threading.get_ident()
+
+    futures = [pool.submit(open_in_thread) for _ in range(size)]
+    return len({future.result() for future in futures})
+
+
+SHARED_STAGES: dict[str, Callable[[], int]] = {
+    "urls": resolve_urls,
+    "templates": compile_templates,
+    "locale": load_locales,
+}
+
+
+def run(
+    *,
+    shared: bool = True,
+    databases: bool = True,
+    pool: Executor | None = None,
+    pool_size: int = 1,
+) -> dict[str, tuple[float, int]]:
+    """依序執行各階段，回傳 ``{階段: (秒數, 處理數量)}``。
+
+    ``pool`` 為處理請求的執行緒池時，資料庫連線改在池內的 ``pool_size`` 個執行緒開啟。
+    """
+
+    stages = dict(SHARED_STAGES if shared else {})
+    if databases:
+        stages["databases"] = open_connections if pool is None else partial(open_pool_connections, pool, pool_size)
+    timings: dict[str, tuple[float, int]] = {}
+    for name, stage in stages.items():
+        started = time.perf_counter()
+        count = stage()
+        timings[name] = (time.perf_counter() - started, count)
+    return timings
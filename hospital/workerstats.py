@@ -0,0 +1,76 @@
+"""gunicorn worker 的執行統計：每個 worker 定期將自己的狀態寫成一個 JSON 檔。
+
+由 ``gunicorn.conf.py`` 的 hook 寫入，``manage.py worker_stats`` 讀取。
+不依賴 Django，master 行程載入設定檔時即可使用。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import resource
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+
+STATS_DIR = Path(os.environ.get("GUNICORN_STATS_DIR", Path(tempfile.gettempdir()) / "hospital-gunicorn"))
+# 兩次寫檔的最短間隔，避免每個請求都寫入磁碟
+WRITE_INTERVAL = 5.0
+
+
+@dataclass
+class WorkerStats:
+    pid: int
+    booted_at: float
+    requests: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_request_seconds: float = 0.0
+    max_rss_mb: float = 0.0
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def path(self) -> Path:
+        return STATS_DIR / f"{self.pid}.json"
+
+    def record(self, seconds: float, status: int) -> None:
+        self.requests += 1
+        self.errors += status >= 500
+        self.busy_seconds += seconds
+        self.max_request_seconds = max(self.max_request_seconds, seconds)
+
+    def write(self, force: bool = False) -> None:
+        now = time.time()
+        if not force and now - self.updated_at < WRITE_INTERVAL:
+            return
+        self.updated_at = now
+        # Linux 的 ru_maxrss 單位為 KB
+        self.max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        STATS_DIR.mkdir(parents=True, exist_ok=True)
+        # 先寫暫存檔再改名，讀取端不會讀到寫了一半的內容。
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(asdict(self)))
+        temporary.replace(self.path)
+
+
+def remove(pid: int) -> None:
+    (STATS_DIR / f"{pid}.json").unlink(missing_ok=True)
+
+
+def clear() -> None:
+    for path in STATS_DIR.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+def read_all() -> list[WorkerStats]:
+    if not STATS_DIR.is_dir():
+        return []
+    workers = []
+    for path in sorted(STATS_DIR.glob("*.json")):
+        try:
+            workers.append(WorkerStats(**json.loads(path.read_text())))
+        except (OSError, ValueError, TypeError):
+            continue
+    return workers
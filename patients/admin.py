@@ -1,17 +1,27 @@
 from django.contrib import admin
 
+from hospital.admin import PerformanceModelAdmin
+
 from .models import FamilyMember, Patient
 
 
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(PerformanceModelAdmin):
     list_display = ("medical_record_number", "user", "national_id", "phone", "created_at")
+    list_select_related = ("user",)
     search_fields = ("medical_record_number", "user__username", "user__last_name", "user__first_name")
+    patient_search_field = "pk"
     list_filter = ("created_at",)
+    autocomplete_fields = ("user",)
+    ordering = ("-pk",)
 
 
 @admin.register(FamilyMember)
-class FamilyMemberAdmin(admin.ModelAdmin):
+class FamilyMemberAdmin(PerformanceModelAdmin):
     list_display = ("full_name", "relationship", "patient")
+    list_select_related = ("patient__user",)
     search_fields = ("full_name", "patient__medical_record_number")
+    patient_search_field = "patient"
     list_filter = ("relationship",)
+    autocomplete_fields = ("patient",)
+    ordering = ("-pk",)
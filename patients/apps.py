@@ -5,3 +5,6 @@ class PatientsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "patients"
     verbose_name = "病患管理"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,274 @@
+"""病患大量匯入：讀取 CSV / JSONL，整批驗證、查重、雜湊密碼後以 ``bulk_create`` 寫入。
+
+每個批次只需兩次查重查詢、一次病歷號配號與兩次批次寫入；
+PBKDF2 密碼雜湊是主要成本。``import_patients`` 指令可交給行程池平行處理，
+網頁上傳在請求中逐筆雜湊，因此限制筆數（見 ``PATIENT_IMPORT_MAX_ROWS``）。
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from .models import Patient, extract_phone_digits, normalize_identifier
+from .search import get_search_backend
+
+
+FORMATS = ("csv", "jsonl")
+
+REQUIRED_FIELDS = ("national_id", "first_name", "last_name", "birth_date", "phone_number", "password")
+OPTIONAL_FIELDS = ("email", "address", "emergency_contact")
+
+# 身分證字號首字母對應的兩位數代碼
+_LETTER_CODES = dict(zip("ABCDEFGHJKLMNPQRSTUVXYWZIO", range(10, 36)))
+_LETTER_SUMS = {letter: code // 10 + (code % 10) * 9 for letter, code in _LETTER_CODES.items()}
+_DIGIT_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 1, 1)
+# 第二碼：1/2 為本國人性別碼，8/9 為新式居留證
+_SECOND_DIGITS = frozenset("1289")
+
+
+def validate_national_ids(national_ids: list[str]) -> list[bool]:
+    """一次驗證整批身分證字號的格式與檢查碼，回傳與輸入等長的結果。"""
+
+    letter_sums = _LETTER_SUMS
+    weights = _DIGIT_WEIGHTS
+    return [
+        len(value) == 10
+        and value[0] in letter_sums
+        and value[1] in _SECOND_DIGITS
+        and value[1:].isdigit()
+        and (letter_sums[value[0]] + sum(int(char) * weight for char, weight in zip(value[1:], weights))) % 10 == 0
+        for value in national_ids
+    ]
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    duplicates: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def error_count(self) -> int:
+        return len(self.errors)
+
+
+def read_rows(stream: Iterable[str], fmt: str) -> Iterator[tuple[int, dict]]:
+    """依格式逐列讀取，回傳 ``(行號, 欄位)``；不會一次載入整個檔案。"""
+
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, {}
+                continue
+            yield line_number, row if isinstance(row, dict) else {}
+    else:
+        raise ValueError(f"不支援的格式：{fmt}")
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def open_upload(uploaded_file) -> io.TextIOWrapper:
+    """將上傳檔案包成文字串流；``utf-8-sig`` 可處理 Excel 匯出的 BOM。"""
+
+    return io.TextIOWrapper(uploaded_file.file, encoding="utf-8-sig", newline="")
+
+
+def _clean_row(row: dict) -> tuple[dict | None, str]:
+    cleaned = {name: str(row.get(name) or "").strip() for name in (*REQUIRED_FIELDS, *OPTIONAL_FIELDS)}
+    missing = [name for name in REQUIRED_FIELDS if not cleaned[name]]
+    if missing:
+        return None, f"缺少欄位：{', '.join(missing)}"
+    cleaned["national_id"] = normalize_identifier(cleaned["national_id"])
+    try:
+        birth_date = parse_date(cleaned["birth_date"])
+    except ValueError:
+        birth_date = None
+    if birth_date is None:
+        return None, f"生日格式錯誤：{cleaned['birth_date']}"
+    cleaned["birth_date"] = birth_date
+    return cleaned, ""
+
+
+def _hash_passwords(passwords: list[str], executor: Executor | None) -> list[str]:
+    if executor is None or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    return list(executor.map(make_password, passwords, chunksize=max(len(passwords) // 32, 1)))
+
+
+@contextmanager
+def _password_executor(workers: int | None):
+    """``workers`` 為 ``None`` 時使用全部 CPU 核心；只應在 ``import_patients`` 指令中啟用行程池。"""
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield None
+        return
+    # 以 fork 啟動的子行程只做雜湊、不碰資料庫，結束時也不會關閉父行程繼承來的連線。
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        yield executor
+
+
+class PatientImporter:
+    """將一批病患資料寫入資料庫。
+
+    - 身分證字號以整批方式驗證格式與檢查碼。
+    - 每個批次以一次 ``IN`` 查詢分別比對既有帳號與病患，檔案內重複的列只保留第一筆。
+    - 初始密碼為必填，``workers`` 大於 1 時以行程池雜湊；帳號與病患以 ``bulk_create`` 寫入，病歷號整批配發，並同步寫入搜尋索引。
+    - 寫入時若因同時註冊違反唯一限制，重新查重後將衝突的列計為重複，其餘列重試。
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 500,
+        workers: int | None = 1,
+        progress: Callable[[ImportResult], None] | None = None,
+    ):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.progress = progress
+
+    def run(self, rows: Iterable[tuple[int, dict]]) -> ImportResult:
+        result = ImportResult()
+        seen: set[str] = set()
+        with _password_executor(self.workers) as executor:
+            batch: list[tuple[int, dict]] = []
+            for line_number, row in rows:
+                batch.append((line_number, row))
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch, seen, executor, result)
+                    batch = []
+            if batch:
+                self._import_batch(batch, seen, executor, result)
+        return result
+
+    def _import_batch(
+        self,
+        batch: list[tuple[int, dict]],
+        seen: set[str],
+        executor: Executor | None,
+        result: ImportResult,
+    ) -> None:
+        errors: list[tuple[int, str]] = []
+        candidates: list[tuple[int, dict]] = []
+        for line_number, row in batch:
+            cleaned, error = _clean_row(row)
+            if cleaned is None:
+                errors.append((line_number, error))
+            else:
+                candidates.append((line_number, cleaned))
+
+        validity = validate_national_ids([cleaned["national_id"] for _, cleaned in candidates])
+        valid: list[tuple[int, dict]] = []
+        for (line_number, cleaned), is_valid in zip(candidates, validity):
+            if is_valid:
+                valid.append((line_number, cleaned))
+            else:
+                errors.append((line_number, f"身分證字號不正確：{cleaned['national_id']}"))
+        result.errors.extend(sorted(errors))
+
+        existing = self._existing_ids([cleaned["national_id"] for _, cleaned in valid])
+        accepted: list[dict] = []
+        for _, cleaned in valid:
+            national_id = cleaned["national_id"]
+            if national_id in existing or national_id in seen:
+                result.duplicates += 1
+                continue
+            seen.add(national_id)
+            accepted.append(cleaned)
+
+        if accepted:
+            hashes = _hash_passwords([cleaned["password"] for cleaned in accepted], executor)
+            rows = list(zip(accepted, hashes))
+            while rows:
+                try:
+                    self._write(rows)
+                    break
+                except IntegrityError:
+                    # 查重後到寫入前可能有人以相同身分證字號註冊：
+                    # 重新查重，衝突的列計為重複，其餘列重試寫入。
+                    conflicts = self._existing_ids([cleaned["national_id"] for cleaned, _ in rows])
+                    if not conflicts:
+                        raise
+                    remaining = [row for row in rows if row[0]["national_id"] not in conflicts]
+                    result.duplicates += len(rows) - len(remaining)
+                    rows = remaining
+            result.created += len(rows)
+
+        if self.progress:
+            self.progress(result)
+
+    @staticmethod
+    def _existing_ids(national_ids: list[str]) -> set[str]:
+        """回傳已被帳號或病患使用的身分證字號（大寫）。"""
+
+        # 舊資料可能以小寫建立帳號；同時比對大小寫兩種寫法，仍可走唯一索引。
+        lookup_ids = [*national_ids, *(national_id.lower() for national_id in national_ids)]
+        User = get_user_model()
+        existing = {
+            username.upper()
+            for username in User.objects.filter(username__in=lookup_ids).values_list("username", flat=True)
+        }
+        existing.update(
+            national_id.upper()
+            for national_id in Patient.objects.filter(national_id__in=lookup_ids).values_list(
+                "national_id", flat=True
+            )
+        )
+        return existing
+
+    @staticmethod
+    def _write(rows: list[tuple[dict, str]]) -> None:
+        User = get_user_model()
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(
+                    username=cleaned["national_id"],
+                    password=password_hash,
+                    first_name=cleaned["first_name"],
+                    last_name=cleaned["last_name"],
+                    email=cleaned["email"],
+                    phone_number=cleaned["phone_number"],
+                    role=User.Role.PATIENT,
+                )
+                for cleaned, password_hash in rows
+            )
+            record_numbers = Patient.allocate_medical_record_numbers(len(rows))
+            patients = Patient.objects.bulk_create(
+                Patient(
+                    user=user,
+                    national_id=cleaned["national_id"],
+                    medical_record_number=record_number,
+                    birth_date=cleaned["birth_date"],
+                    phone=cleaned["phone_number"],
+                    phone_digits=extract_phone_digits(cleaned["phone_number"]),
+                    address=cleaned["address"],
+                    emergency_contact=cleaned["emergency_contact"],
+                )
+                for (cleaned, _), user, record_number in zip(rows, users, record_numbers)
+            )
+            # bulk_create 不會觸發 signal，需自行寫入搜尋索引。
+            get_search_backend().index_patients(patients)
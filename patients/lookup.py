@@ -0,0 +1,129 @@
+"""櫃檯病患查詢：以正規化後的欄位做等值與前綴範圍查詢，全部走索引。
+
+病歷號與身分證號在寫入時已轉為大寫（見 ``Patient.save``），
+前綴搜尋改寫成 ``>= prefix AND < 下一個字串`` 的範圍條件，
+避免 ``iexact`` / ``istartswith`` 造成的全表掃描。
+識別碼比對不足時，再以全文索引（``patients.search``）補上姓名與電話片段的結果。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.db.models import Q, QuerySet
+
+from .models import MEDICAL_RECORD_NUMBER_PREFIX, Patient, extract_phone_digits, normalize_identifier
+from .search import get_search_backend
+
+
+DEFAULT_LIMIT = 10
+MIN_PHONE_DIGITS = 3
+
+
+@dataclass
+class LookupMatch:
+    patient: Patient
+    rank: int
+    matched_on: str
+
+    def as_dict(self) -> dict:
+        patient = self.patient
+        return {
+            "id": patient.pk,
+            "name": patient.user.display_name,
+            "medical_record_number": patient.medical_record_number,
+            "national_id": mask_national_id(patient.national_id),
+            "phone": patient.phone,
+            "birth_date": patient.birth_date.isoformat(),
+            "matched_on": self.matched_on,
+        }
+
+
+def mask_national_id(national_id: str) -> str:
+    """回傳給自動完成清單時只顯示頭尾，避免完整身分證號出現在瀏覽器紀錄中。"""
+
+    if len(national_id) < 6:
+        return national_id
+    return f"{national_id[:3]}{'*' * (len(national_id) - 6)}{national_id[-3:]}"
+
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    """將前綴轉成可走 B-tree 索引的半開區間 ``[prefix, upper)``。"""
+
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _base_queryset() -> QuerySet[Patient]:
+    return Patient.objects.select_related("user")
+
+
+def _prefix_filter(field: str, prefix: str) -> Q:
+    lower, upper = prefix_range(prefix)
+    return Q(**{f"{field}__gte": lower, f"{field}__lt": upper})
+
+
+def find_patient(identifier: str) -> Patient | None:
+    """以病歷號或身分證號精確查詢單一病患。"""
+
+    normalized = normalize_identifier(identifier)
+    if not normalized:
+        return None
+    return (
+        _base_queryset()
+        .filter(Q(medical_record_number=normalized) | Q(national_id=normalized))
+        .order_by("pk")
+        .first()
+    )
+
+
+def search_patients(term: str, limit: int = DEFAULT_LIMIT) -> list[LookupMatch]:
+    """依相符程度排序的病患清單：精確相符、病歷號／身分證號前綴、電話前綴、全文比對。
+
+    每一類各自是一次有 ``LIMIT`` 的索引查詢，湊滿 ``limit`` 筆即停止。
+    """
+
+    normalized = normalize_identifier(term)
+    if not normalized:
+        return []
+    digits = extract_phone_digits(term)
+
+    plans: list[tuple[int, str, Q, str]] = []
+    if normalized.isdigit():
+        # 純數字可能是電話或省略 MRN 字首的病歷號，不會與身分證號精確相符。
+        mrn_prefix = f"{MEDICAL_RECORD_NUMBER_PREFIX}{normalized}"
+    else:
+        mrn_prefix = normalized
+        plans.append((0, "identifier", Q(medical_record_number=normalized) | Q(national_id=normalized), "pk"))
+    if mrn_prefix.startswith(MEDICAL_RECORD_NUMBER_PREFIX) and len(mrn_prefix) > len(MEDICAL_RECORD_NUMBER_PREFIX):
+        plans.append(
+            (1, "medical_record_number", _prefix_filter("medical_record_number", mrn_prefix), "medical_record_number")
+        )
+    if normalized[0].isalpha() and not normalized.startswith(MEDICAL_RECORD_NUMBER_PREFIX):
+        plans.append((1, "national_id", _prefix_filter("national_id", normalized), "national_id"))
+    if len(digits) >= MIN_PHONE_DIGITS and digits == normalized:
+        plans.append((2, "phone", _prefix_filter("phone_digits", digits), "phone_digits"))
+
+    matches: list[LookupMatch] = []
+    seen: set[int] = set()
+    for rank, matched_on, condition, ordering in plans:
+        remaining = limit - len(matches)
+        if remaining <= 0:
+            break
+        for patient in _base_queryset().filter(condition).order_by(ordering)[: remaining + len(seen)]:
+            if patient.pk in seen:
+                continue
+            seen.add(patient.pk)
+            matches.append(LookupMatch(patient=patient, rank=rank, matched_on=matched_on))
+            if len(matches) >= limit:
+                break
+
+    remaining = limit - len(matches)
+    if remaining > 0:
+        patient_ids = [
+            pk for pk in get_search_backend().search(term, remaining + len(seen)) if pk not in seen
+        ][:remaining]
+        patients = _base_queryset().in_bulk(patient_ids)
+        matches.extend(
+            LookupMatch(patient=patients[pk], rank=3, matched_on="fulltext") for pk in patient_ids if pk in patients
+        )
+    return matches
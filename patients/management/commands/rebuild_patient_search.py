@@ -0,0 +1,26 @@
+"""重建病患全文搜尋索引。"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from patients.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "清空並以 INSERT ... SELECT 重建病患搜尋索引，用於資料修補或略過 signal 的批次匯入之後。"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        with transaction.atomic():
+            backend.install()
+            backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"已以 {type(backend).__name__} 重建病患搜尋索引，耗時 {time.perf_counter() - started:.1f} 秒。"
+            )
+        )
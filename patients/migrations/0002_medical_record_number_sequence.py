@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalRecordNumberSequence',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': '病歷號序號',
+                'verbose_name_plural': '病歷號序號',
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:07
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _digits(value):
+    value = unicodedata.normalize("NFKC", value or "")
+    return "".join(char for char in value if "0" <= char <= "9")
+
+
+def _identifier(value):
+    # 與 patients.models.normalize_identifier 相同的規則；複製在此，日後修改模型不影響這個遷移。
+    value = unicodedata.normalize("NFKC", value or "")
+    return "".join(value.split()).replace("-", "").upper()
+
+
+def normalize_existing(apps, schema_editor):
+    Patient = apps.get_model("patients", "Patient")
+    # 身分證號與病歷號轉為半形大寫並去除空白、連字號；若正規化後與其他資料同號則保留原值，交由人工處理。
+    for field in ("national_id", "medical_record_number"):
+        changes = [
+            (pk, _identifier(value))
+            for pk, value in Patient.objects.values_list("pk", field).iterator(chunk_size=2000)
+            if _identifier(value) != value
+        ]
+        for pk, normalized in changes:
+            if not Patient.objects.filter(**{field: normalized}).exists():
+                Patient.objects.filter(pk=pk).update(**{field: normalized})
+
+    batch = []
+    for patient in Patient.objects.only("pk", "phone").iterator(chunk_size=2000):
+        patient.phone_digits = _digits(patient.phone)
+        batch.append(patient)
+        if len(batch) >= 2000:
+            Patient.objects.bulk_update(batch, ["phone_digits"])
+            batch = []
+    if batch:
+        Patient.objects.bulk_update(batch, ["phone_digits"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_medical_record_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='電話數字'),
+        ),
+        migrations.RunPython(normalize_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+# 建立索引時的 DDL 與文件格式固定在這個遷移中；日後修改 patients.search 不會改變既有遷移的行為。
+TABLE = "patients_patient_search"
+DOCUMENT_SQL = (
+    "u.last_name || u.first_name || ' ' || u.first_name || ' ' || p.phone_digits || ' ' "
+    "|| p.medical_record_number || ' ' || p.national_id"
+)
+SOURCE_SQL = "FROM patients_patient p INNER JOIN accounts_user u ON u.id = p.user_id"
+
+INSTALL = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(document, tokenize='trigram')",
+        f"DELETE FROM {TABLE}",
+        f"INSERT INTO {TABLE} (rowid, document) SELECT p.id, {DOCUMENT_SQL} {SOURCE_SQL}",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+        "patient_id bigint PRIMARY KEY REFERENCES patients_patient (id) ON DELETE CASCADE "
+        "DEFERRABLE INITIALLY DEFERRED, "
+        "document text NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document_trgm ON {TABLE} USING gin (document gin_trgm_ops)",
+        f"TRUNCATE {TABLE}",
+        f"INSERT INTO {TABLE} (patient_id, document) SELECT p.id, {DOCUMENT_SQL} {SOURCE_SQL}",
+    ],
+}
+UNINSTALL = {
+    "sqlite": [f"DROP TABLE IF EXISTS {TABLE}"],
+    "postgresql": [f"DROP TABLE IF EXISTS {TABLE}"],
+}
+
+
+def _execute(statements, schema_editor):
+    # 其他資料庫沒有專用索引，搜尋退回 ORM 查詢，不需建立資料表。
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def install_search_index(apps, schema_editor):
+    _execute(INSTALL, schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    _execute(UNINSTALL, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("patients", "0003_patient_lookup_normalization"),
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -1,8 +1,101 @@
 from __future__ import annotations
 
+import unicodedata
+
 from django.conf import settings
-from django.db import models
-from django.utils.crypto import get_random_string
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+
+MEDICAL_RECORD_NUMBER_PREFIX = "MRN"
+MEDICAL_RECORD_NUMBER_DIGITS = 8
+
+
+def normalize_identifier(value: str) -> str:
+    """病歷號與身分證號統一轉為半形大寫並去除空白、連字號，查詢時可直接走唯一索引。"""
+
+    value = unicodedata.normalize("NFKC", value or "")
+    return "".join(value.split()).replace("-", "").upper()
+
+
+def extract_phone_digits(value: str) -> str:
+    """只保留電話號碼中的數字，供電話前綴搜尋使用。"""
+
+    value = unicodedata.normalize("NFKC", value or "")
+    return "".join(char for char in value if "0" <= char <= "9")
+
+
+def medical_record_check_digit(digits: str) -> str:
+    """以 Luhn 演算法計算檢查碼，可擋下單一數字打錯與相鄰數字對調。"""
+
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def format_medical_record_number(value: int, *, check_digit: bool | None = None) -> str:
+    if check_digit is None:
+        check_digit = getattr(settings, "PATIENT_MRN_CHECK_DIGIT", False)
+    digits = f"{value:0{MEDICAL_RECORD_NUMBER_DIGITS}d}"
+    if check_digit:
+        digits += medical_record_check_digit(digits)
+    return f"{MEDICAL_RECORD_NUMBER_PREFIX}{digits}"
+
+
+def is_valid_medical_record_number(number: str) -> bool:
+    """檢查帶檢查碼的病歷號；未啟用檢查碼前發出的舊病歷號一律視為有效。"""
+
+    digits = number.removeprefix(MEDICAL_RECORD_NUMBER_PREFIX)
+    if not digits.isdigit():
+        return False
+    if len(digits) != MEDICAL_RECORD_NUMBER_DIGITS + 1:
+        return True
+    return medical_record_check_digit(digits[:-1]) == digits[-1]
+
+
+class MedicalRecordNumberSequence(models.Model):
+    """病歷號序號。
+
+    以單列計數器配號：同一交易內先 ``UPDATE ... SET last_value = last_value + n``
+    再讀回，資料列鎖保證並行註冊不會拿到相同號碼，也不需要查重重試。
+    新格式固定 8 碼數字（可加 1 碼檢查碼），與舊的 6 碼隨機病歷號長度不同，不會衝突。
+    """
+
+    DEFAULT_NAME = "patient"
+
+    name = models.CharField(max_length=30, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "病歷號序號"
+        verbose_name_plural = "病歷號序號"
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, count: int = 1, name: str = DEFAULT_NAME) -> range:
+        """一次保留 ``count`` 個連續序號並回傳其範圍，供匯入時整批配號。"""
+
+        if count < 1:
+            raise ValueError("count 必須大於 0。")
+        # 外層已有交易時不另建 savepoint；UPDATE 與讀回不會留下需要部分回滾的狀態。
+        with transaction.atomic(savepoint=False):
+            if not cls.objects.filter(pk=name).update(last_value=F("last_value") + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, last_value=count)
+                except IntegrityError:
+                    # 另一個交易剛好先建立了計數器，改走一般遞增流程。
+                    cls.objects.filter(pk=name).update(last_value=F("last_value") + count)
+            last_value = cls.objects.filter(pk=name).values_list("last_value", flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
 
 
 class Patient(models.Model):
@@ -17,6 +110,7 @@ class Patient(models.Model):
     medical_record_number = models.CharField("病歷號", max_length=20, unique=True)
     birth_date = models.DateField("生日")
     phone = models.CharField("聯絡電話", max_length=20)
+    phone_digits = models.CharField("電話數字", max_length=20, blank=True, db_index=True, editable=False)
     address = models.CharField("地址", max_length=255, blank=True)
     emergency_contact = models.CharField("緊急聯絡人", max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -30,14 +124,28 @@ class Patient(models.Model):
     def __str__(self) -> str:
         return f"{self.user.display_name} ({self.medical_record_number})"
 
+    def save(self, *args, **kwargs):
+        # 寫入前統一格式，查詢時才能以等值或範圍條件使用索引，不必依賴 iexact 全表掃描。
+        # bulk_create 不會經過這裡，批次寫入端需自行呼叫相同的正規化函式。
+        self.national_id = normalize_identifier(self.national_id)
+        self.medical_record_number = normalize_identifier(self.medical_record_number)
+        self.phone_digits = extract_phone_digits(self.phone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "phone" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "phone_digits"}
+        super().save(*args, **kwargs)
+
     @classmethod
     def generate_medical_record_number(cls) -> str:
         """產生唯一的病歷號。"""
 
-        while True:
-            candidate = f"MRN{get_random_string(6, allowed_chars='0123456789')}"
-            if not cls.objects.filter(medical_record_number=candidate).exists():
-                return candidate
+        return cls.allocate_medical_record_numbers(1)[0]
+
+    @classmethod
+    def allocate_medical_record_numbers(cls, count: int) -> list[str]:
+        """整批配發 ``count`` 個連續且唯一的病歷號，只需兩次查詢。"""
+
+        return [format_medical_record_number(value) for value in MedicalRecordNumberSequence.allocate(count)]
 
 
 class FamilyMember(models.Model):
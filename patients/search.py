@@ -0,0 +1,225 @@
+"""病患全文搜尋索引，依資料庫種類選用 SQLite FTS5 或 PostgreSQL ``pg_trgm``。
+
+索引存放在獨立的 ``patients_patient_search`` 資料表，每位病患一列，內容為
+「姓名、名字、電話數字、病歷號、身分證號」組成的搜尋文件。
+``Patient`` / ``User`` 儲存時由 ``patients.signals`` 同步更新；
+``bulk_create`` 等略過 signal 的批次寫入需自行呼叫 ``index_patients`` 或 ``index_patient_ids``。
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Iterable
+
+from django.db import connection as default_connection
+from django.db.models import Q
+
+from .models import Patient, extract_phone_digits
+
+
+TABLE = "patients_patient_search"
+
+_PHONE_TOKEN = re.compile(r"^[\d()+\-]+$")
+
+
+def build_document(
+    last_name: str,
+    first_name: str,
+    phone_digits: str,
+    medical_record_number: str,
+    national_id: str,
+) -> str:
+    # 姓名連寫讓「王小明」能整串比對，另外保留名字方便只記得名字的情況。
+    return f"{last_name}{first_name} {first_name} {phone_digits} {medical_record_number} {national_id}"
+
+
+def patient_document(patient: Patient) -> str:
+    user = patient.user
+    return build_document(
+        user.last_name,
+        user.first_name,
+        patient.phone_digits,
+        patient.medical_record_number,
+        patient.national_id,
+    )
+
+
+def query_tokens(term: str) -> list[str]:
+    """將輸入拆成搜尋詞；電話格式的詞只保留數字，與索引文件的寫法一致。"""
+
+    tokens = []
+    for token in unicodedata.normalize("NFKC", term).split():
+        if _PHONE_TOKEN.match(token):
+            token = extract_phone_digits(token)
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def _like_pattern(token: str) -> str:
+    escaped = token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# 與 ``build_document`` 相同的組合方式，供整批重建時以 INSERT ... SELECT 在資料庫內產生文件。
+_DOCUMENT_SQL = (
+    "u.last_name || u.first_name || ' ' || u.first_name || ' ' || p.phone_digits || ' ' "
+    "|| p.medical_record_number || ' ' || p.national_id"
+)
+_SOURCE_SQL = "FROM patients_patient p INNER JOIN accounts_user u ON u.id = p.user_id"
+
+
+class SearchBackend:
+    """沒有專用索引的資料庫：退回 ORM 的 ``icontains`` 查詢。"""
+
+    def __init__(self, connection=None):
+        self.connection = connection or default_connection
+
+    def install(self) -> None:
+        pass
+
+    def uninstall(self) -> None:
+        pass
+
+    def index_patients(self, patients: Iterable[Patient]) -> None:
+        pass
+
+    def remove(self, patient_ids: Iterable[int]) -> None:
+        pass
+
+    def rebuild(self) -> None:
+        pass
+
+    def search(self, term: str, limit: int) -> list[int]:
+        condition = Q()
+        for token in query_tokens(term):
+            condition &= (
+                Q(user__last_name__icontains=token)
+                | Q(user__first_name__icontains=token)
+                | Q(phone_digits__contains=token)
+                | Q(medical_record_number__icontains=token)
+                | Q(national_id__icontains=token)
+            )
+        if not condition:
+            return []
+        return list(Patient.objects.filter(condition).order_by("pk").values_list("pk", flat=True)[:limit])
+
+    def index_patient_ids(self, patient_ids: Iterable[int], batch_size: int = 2_000) -> None:
+        patient_ids = list(patient_ids)
+        for start in range(0, len(patient_ids), batch_size):
+            chunk = patient_ids[start : start + batch_size]
+            self.index_patients(Patient.objects.select_related("user").filter(pk__in=chunk))
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 trigram 分詞：任意三個字以上的片段都能走索引，涵蓋中文姓名與電話中段。"""
+
+    def install(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(document, tokenize='trigram')")
+
+    def uninstall(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def index_patients(self, patients: Iterable[Patient]) -> None:
+        rows = [(patient.pk, patient_document(patient)) for patient in patients]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"INSERT OR REPLACE INTO {TABLE} (rowid, document) VALUES (%s, %s)", rows)
+
+    def remove(self, patient_ids: Iterable[int]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(pk,) for pk in patient_ids])
+
+    def rebuild(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+            cursor.execute(f"INSERT INTO {TABLE} (rowid, document) SELECT p.id, {_DOCUMENT_SQL} {_SOURCE_SQL}")
+
+    def search(self, term: str, limit: int) -> list[int]:
+        tokens = query_tokens(term)
+        if not tokens:
+            return []
+        # trigram 索引只能比對三個字以上的片段，較短的詞改以 LIKE 在索引表內過濾。
+        phrases = [token for token in tokens if len(token) >= 3]
+        short = [token for token in tokens if len(token) < 3]
+        conditions: list[str] = []
+        params: list = []
+        if phrases:
+            conditions.append(f"{TABLE} MATCH %s")
+            params.append(" ".join('"{}"'.format(token.replace('"', '""')) for token in phrases))
+        for token in short:
+            conditions.append("document LIKE %s ESCAPE '\\'")
+            params.append(_like_pattern(token))
+        order = "rank" if phrases else "rowid"
+        sql = f"SELECT rowid FROM {TABLE} WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT %s"
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresTrigramBackend(SearchBackend):
+    """``pg_trgm`` GIN 索引支援 ``ILIKE '%片段%'``，再依相似度排序。"""
+
+    def install(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                "patient_id bigint PRIMARY KEY REFERENCES patients_patient (id) ON DELETE CASCADE "
+                "DEFERRABLE INITIALLY DEFERRED, "
+                "document text NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE}_document_trgm ON {TABLE} USING gin (document gin_trgm_ops)"
+            )
+
+    def uninstall(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def index_patients(self, patients: Iterable[Patient]) -> None:
+        rows = [(patient.pk, patient_document(patient)) for patient in patients]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (patient_id, document) VALUES (%s, %s) "
+                "ON CONFLICT (patient_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, patient_ids: Iterable[int]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE patient_id = ANY(%s)", [list(patient_ids)])
+
+    def rebuild(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {TABLE}")
+            cursor.execute(f"INSERT INTO {TABLE} (patient_id, document) SELECT p.id, {_DOCUMENT_SQL} {_SOURCE_SQL}")
+
+    def search(self, term: str, limit: int) -> list[int]:
+        tokens = query_tokens(term)
+        if not tokens:
+            return []
+        conditions = " AND ".join(["document ILIKE %s"] * len(tokens))
+        patterns = [_like_pattern(token) for token in tokens]
+        sql = (
+            f"SELECT patient_id FROM {TABLE} WHERE {conditions} "
+            "ORDER BY similarity(document, %s) DESC, patient_id LIMIT %s"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [*patterns, " ".join(tokens), limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_search_backend(connection=None) -> SearchBackend:
+    connection = connection or default_connection
+    if connection.vendor == "sqlite":
+        return SQLiteFTSBackend(connection)
+    if connection.vendor == "postgresql":
+        return PostgresTrigramBackend(connection)
+    return SearchBackend(connection)
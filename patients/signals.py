@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Patient
+from .search import get_search_backend
+
+
+# 只有這些欄位會影響搜尋文件；登入時僅更新 last_login，不需要重建索引。
+USER_SEARCH_FIELDS = {"first_name", "last_name"}
+PATIENT_SEARCH_FIELDS = {"national_id", "medical_record_number", "phone", "phone_digits"}
+
+
+def _affects_search(update_fields, fields: set[str]) -> bool:
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=Patient, dispatch_uid="patients.index_patient")
+def index_patient(sender, instance: Patient, raw=False, update_fields=None, **kwargs):
+    if raw or not _affects_search(update_fields, PATIENT_SEARCH_FIELDS):
+        return
+    get_search_backend().index_patients([instance])
+
+
+@receiver(post_delete, sender=Patient, dispatch_uid="patients.unindex_patient")
+def unindex_patient(sender, instance: Patient, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid="patients.index_patient_user")
+def index_patient_user(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    if raw or created or not _affects_search(update_fields, USER_SEARCH_FIELDS):
+        return
+    patient = Patient.objects.filter(user=instance).order_by("pk").first()
+    if patient is not None:
+        patient.user = instance
+        get_search_backend().index_patients([patient])
@@ -1,3 +1,325 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import datetime
+import io
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from patients import importer
+from patients.importer import PatientImporter, read_rows, validate_national_ids
+from patients.lookup import find_patient, search_patients
+from patients.search import get_search_backend
+from patients.models import (
+    FamilyMember,
+    MedicalRecordNumberSequence,
+    Patient,
+    is_valid_medical_record_number,
+    medical_record_check_digit,
+)
+from registrations.models import Appointment, DoctorSchedule
+from system.testing import QueryBudgetTestCase
+
+
+class MedicalRecordNumberTests(TestCase):
+    def test_blocks_are_contiguous_and_disjoint(self):
+        first = MedicalRecordNumberSequence.allocate(5)
+        second = MedicalRecordNumberSequence.allocate(3)
+        self.assertEqual(list(first), [1, 2, 3, 4, 5])
+        self.assertEqual(list(second), [6, 7, 8])
+
+    def test_generate_uses_sequence(self):
+        numbers = Patient.allocate_medical_record_numbers(2)
+        self.assertEqual(numbers, ["MRN00000001", "MRN00000002"])
+        self.assertEqual(Patient.generate_medical_record_number(), "MRN00000003")
+
+    @override_settings(PATIENT_MRN_CHECK_DIGIT=True)
+    def test_check_digit(self):
+        number = Patient.generate_medical_record_number()
+        self.assertEqual(len(number), len("MRN") + 9)
+        self.assertTrue(is_valid_medical_record_number(number))
+        self.assertEqual(medical_record_check_digit("7992739871"), "3")
+        tampered = number[:-2] + str((int(number[-2]) + 1) % 10) + number[-1]
+        self.assertFalse(is_valid_medical_record_number(tampered))
+
+    def test_legacy_numbers_remain_valid(self):
+        self.assertTrue(is_valid_medical_record_number("MRN123456"))
+        self.assertFalse(is_valid_medical_record_number("MRN12A456"))
+
+
+class PatientLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.patients = []
+        for index, (national_id, phone) in enumerate(
+            [("a123456789", "0912-345-678"), ("A123450000", "0912 000 111"), ("B223456789", "02-2345-6789")]
+        ):
+            user = User.objects.create_user(username=f"lookup{index}", first_name=f"病患{index}", last_name="王")
+            cls.patients.append(
+                Patient.objects.create(
+                    user=user,
+                    national_id=national_id,
+                    medical_record_number=Patient.generate_medical_record_number(),
+                    birth_date="1990-01-01",
+                    phone=phone,
+                )
+            )
+
+    def test_values_are_normalized_on_save(self):
+        patient = self.patients[0]
+        self.assertEqual(patient.national_id, "A123456789")
+        self.assertEqual(patient.phone_digits, "0912345678")
+        patient.phone = "(03) 555-0000"
+        patient.save(update_fields=["phone"])
+        patient.refresh_from_db()
+        self.assertEqual(patient.phone_digits, "035550000")
+
+    def test_find_patient_is_case_insensitive(self):
+        self.assertEqual(find_patient(" a123456789 "), self.patients[0])
+        self.assertEqual(find_patient(self.patients[1].medical_record_number.lower()), self.patients[1])
+        self.assertIsNone(find_patient("Z999999999"))
+
+    def test_search_ranks_exact_match_first(self):
+        matches = search_patients("a12345")
+        self.assertEqual({match.patient for match in matches}, {self.patients[0], self.patients[1]})
+        self.assertEqual(search_patients("A123456789")[0].rank, 0)
+        self.assertEqual(search_patients("A123456789")[0].patient, self.patients[0])
+
+    def test_search_by_phone_and_mrn_digits(self):
+        self.assertEqual([match.patient for match in search_patients("0912")], [self.patients[1], self.patients[0]])
+        self.assertEqual([match.patient for match in search_patients("0912-345")], [self.patients[0]])
+        self.assertEqual(search_patients("00000002")[0].patient, self.patients[1])
+        self.assertEqual(len(search_patients("0912", limit=1)), 1)
+        self.assertEqual(search_patients("0912-345")[0].as_dict()["national_id"], "A12****789")
+
+
+class PatientSearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="search0", first_name="小明", last_name="王")
+        cls.patient = Patient.objects.create(
+            user=cls.user,
+            national_id="A123456789",
+            medical_record_number=Patient.generate_medical_record_number(),
+            birth_date="1990-01-01",
+            phone="0912-345-678",
+        )
+
+    def test_search_by_name_and_phone_fragment(self):
+        self.assertEqual(get_search_backend().search("王小明", 10), [self.patient.pk])
+        self.assertEqual(get_search_backend().search("小明", 10), [self.patient.pk])
+        self.assertEqual(get_search_backend().search("345-678", 10), [self.patient.pk])
+        self.assertEqual(get_search_backend().search("王大明", 10), [])
+        match = search_patients("王小明")[0]
+        self.assertEqual((match.patient, match.matched_on), (self.patient, "fulltext"))
+
+    def test_index_follows_user_and_patient_changes(self):
+        self.user.first_name = "大同"
+        self.user.save(update_fields=["first_name"])
+        self.assertEqual(get_search_backend().search("王大同", 10), [self.patient.pk])
+        self.assertEqual(get_search_backend().search("王小明", 10), [])
+
+        self.patient.phone = "0922111222"
+        self.patient.save()
+        self.assertEqual(get_search_backend().search("2111", 10), [self.patient.pk])
+
+        self.patient.delete()
+        self.assertEqual(get_search_backend().search("王大同", 10), [])
+
+    def test_rebuild(self):
+        get_search_backend().rebuild()
+        self.assertEqual(get_search_backend().search("王小明", 10), [self.patient.pk])
+
+
+class PatientImportTests(TestCase):
+    CSV = (
+        "national_id,first_name,last_name,birth_date,phone_number,password\n"
+        "a123456789,小明,王,1990-01-02,0912000001,first-pass\n"
+        "A123456789,小明,王,1990-01-02,0912000001,first-pass\n"
+        "B123456789,小華,林,1991-02-03,0912000002,\n"
+        "F131104093,美麗,陳,not-a-date,0912000003,secret\n"
+        "F131104093,美麗,陳,1985-05-06,0912000003,secret\n"
+    )
+
+    def test_validate_national_ids(self):
+        self.assertEqual(
+            validate_national_ids(["A123456789", "A123456788", "F131104093", "A323456789", "1234567890", "A12345"]),
+            [True, False, True, False, False, False],
+        )
+
+    def test_import_skips_duplicates_and_reports_errors(self):
+        result = PatientImporter().run(read_rows(io.StringIO(self.CSV), "csv"))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.duplicates, 1)
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+        self.assertIn("password", result.errors[0][1])
+
+        patient = Patient.objects.select_related("user").get(national_id="A123456789")
+        self.assertEqual(patient.user.username, "A123456789")
+        self.assertTrue(patient.user.check_password("first-pass"))
+        self.assertTrue(patient.medical_record_number.startswith("MRN"))
+        self.assertTrue(Patient.objects.get(national_id="F131104093").user.check_password("secret"))
+        # 未提供密碼的列不會以生日等可猜測的值建立帳號。
+        self.assertFalse(Patient.objects.filter(national_id="B123456789").exists())
+
+        rerun = PatientImporter().run(read_rows(io.StringIO(self.CSV), "csv"))
+        self.assertEqual((rerun.created, rerun.duplicates), (0, 3))
+
+    def test_concurrent_registration_counts_as_duplicate(self):
+        real_hash = importer._hash_passwords
+
+        def register_during_hashing(passwords, executor):
+            # 模擬查重後、寫入前另一個請求註冊了同一個身分證字號。
+            User.objects.create_user(username="F131104093", role=User.Role.PATIENT)
+            return real_hash(passwords, executor)
+
+        with mock.patch.object(importer, "_hash_passwords", side_effect=register_during_hashing):
+            result = PatientImporter().run(read_rows(io.StringIO(self.CSV), "csv"))
+        self.assertEqual((result.created, result.duplicates), (1, 2))
+        self.assertTrue(Patient.objects.filter(national_id="A123456789").exists())
+        self.assertFalse(Patient.objects.filter(national_id="F131104093").exists())
+
+    def test_import_jsonl(self):
+        lines = '{"national_id": "A123456789", "first_name": "小明", "last_name": "王", ' \
+            '"birth_date": "1990-01-02", "phone_number": "0912000001", "password": "first-pass"}\nnot json\n'
+        result = PatientImporter().run(read_rows(io.StringIO(lines), "jsonl"))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors[0][0], 2)
+
+
+class PatientPageBudgetTests(QueryBudgetTestCase):
+    """病患端頁面在大量資料下的查詢數與回應時間上限。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.appointment = cls.patient.appointments.order_by("pk").first()
+        cls.member = FamilyMember.objects.create(
+            patient=cls.patient,
+            full_name="林小華",
+            relationship="子女",
+            national_id="C123456789",
+            phone="0911000111",
+        )
+        cls.open_schedule = (
+            DoctorSchedule.objects.exclude(appointments__patient=cls.patient).order_by("date", "pk").first()
+        )
+
+    def setUp(self):
+        self.client.force_login(self.patient.user)
+
+    def test_dashboard(self):
+        self.assertGetWithinBudget(reverse("patients:dashboard"), max_queries=5)
+
+    def test_appointment_list(self):
+        self.assertGetWithinBudget(reverse("patients:appointments"), max_queries=4)
+
+    def test_appointment_history_pages(self):
+        today = timezone.localdate()
+        history = []
+        for offset in range(25):
+            schedule = DoctorSchedule.objects.create(
+                doctor=self.doctor,
+                date=today - datetime.timedelta(days=400 + offset),
+                session=DoctorSchedule.Session.MORNING,
+            )
+            history.append(
+                Appointment.objects.create(
+                    schedule=schedule, patient=self.patient, queue_number=1, status=Appointment.Status.COMPLETED
+                )
+            )
+        url = reverse("patients:appointments")
+        response = self.assertGetWithinBudget(url, max_queries=4)
+        upcoming = response.context["upcoming_appointments"]
+        self.assertTrue(all(item.schedule.date >= today for item in upcoming))
+        page = response.context["page_obj"]
+        self.assertEqual(len(page.object_list), 20)
+        self.assertTrue(page.has_next)
+        self.assertNotIn(upcoming[0].pk if upcoming else None, [item.pk for item in page.object_list])
+
+        # 後續頁面只查詢歷史紀錄，不重算即將到來的掛號。
+        response = self.assertGetWithinBudget(f"{url}?cursor={page.next_cursor}", max_queries=3)
+        self.assertFalse(response.context["show_upcoming"])
+        older = response.context["page_obj"]
+        self.assertTrue(older.has_previous)
+        seen = [item.pk for item in page.object_list] + [item.pk for item in older.object_list]
+        self.assertEqual(len(seen), len(set(seen)))
+        created = [item.created_at for item in page.object_list + older.object_list]
+        self.assertEqual(created, sorted(created, reverse=True))
+
+    def test_appointment_progress(self):
+        url = reverse("patients:appointment-progress", args=[self.appointment.pk])
+        self.assertGetWithinBudget(url, max_queries=5)
+
+    def test_appointment_cancel(self):
+        url = reverse("patients:appointment-cancel", args=[self.appointment.pk])
+        self.assertPostWithinBudget(url, max_queries=8)
+
+    def test_schedule_search_filtered(self):
+        url = f"{reverse('patients:schedule-search')}?date={timezone.localdate()}&department={self.department.pk}"
+        self.assertGetWithinBudget(url, max_queries=6)
+
+    def test_next_available(self):
+        url = f"{reverse('patients:next-available')}?department={self.department.pk}"
+        self.assertGetWithinBudget(url, max_queries=3, max_seconds=0.5)
+        # 索引建立後只剩 session 與使用者查詢。
+        response = self.assertGetWithinBudget(url, max_queries=2, max_seconds=0.05)
+        dates = [item["date"] for item in response.json()["results"]]
+        self.assertTrue(dates)
+        self.assertEqual(dates, sorted(dates))
+
+    def test_availability_calendar(self):
+        query = f"department={self.department.pk}&month={timezone.localdate():%Y-%m}"
+        url = f"{reverse('patients:availability-calendar')}?{query}"
+        # 整月只需一次分組查詢；另有 session、使用者、科別驗證與首次載入的科別選項。
+        self.assertGetWithinBudget(url, max_queries=5)
+        # 月曆與科別選項都已快取
+        self.assertGetWithinBudget(url, max_queries=3)
+        response = self.assertGetWithinBudget(
+            f"{reverse('patients:availability-calendar-data')}?{query}", max_queries=3, max_seconds=0.2
+        )
+        self.assertTrue(response.json()["days"])
+
+    def test_schedule_search_unfiltered(self):
+        # 未篩選時會列出全部 6,000 個班表；剩餘名額必須由單一彙總查詢提供。
+        self.assertGetWithinBudget(reverse("patients:schedule-search"), max_queries=6, max_seconds=6.0)
+
+    def test_booking_page(self):
+        url = reverse("patients:appointment-book", args=[self.open_schedule.pk])
+        self.assertGetWithinBudget(url, max_queries=6)
+
+    def test_booking_submit(self):
+        url = reverse("patients:appointment-book", args=[self.open_schedule.pk])
+        self.assertPostWithinBudget(url, {"notes": ""}, max_queries=13)
+        self.assertTrue(Appointment.objects.filter(schedule=self.open_schedule, patient=self.patient).exists())
+
+    def test_doctor_detail(self):
+        url = reverse("patients:doctor-detail", args=[self.doctor.pk])
+        response = self.assertGetWithinBudget(url, max_queries=5)
+        self.assertIn("private", response.headers["Cache-Control"])
+        # 片段快取命中後只剩 session 與使用者查詢
+        self.assertGetWithinBudget(url, max_queries=2)
+        self.assertEqual(self.client.get(url, headers={"if-none-match": response.headers["ETag"]}).status_code, 304)
+        self.assertGetWithinBudget(reverse("patients:doctor-detail", args=[0]), max_queries=2, status=404)
+
+    def test_family_pages(self):
+        self.assertGetWithinBudget(reverse("patients:family"), max_queries=4)
+        self.assertGetWithinBudget(reverse("patients:family-add"), max_queries=3)
+        self.assertGetWithinBudget(reverse("patients:family-edit", args=[self.member.pk]), max_queries=4)
+
+    def test_family_create_and_delete(self):
+        self.assertPostWithinBudget(
+            reverse("patients:family-add"),
+            {
+                "full_name": "林大同",
+                "relationship": "父親",
+                "national_id": "D123456789",
+                "birth_date": "1950-05-05",
+                "phone": "0922000222",
+            },
+            max_queries=7,
+        )
+        self.assertPostWithinBudget(reverse("patients:family-delete", args=[self.member.pk]), max_queries=10)
@@ -5,11 +5,14 @@ from .views import (
     AppointmentCreateView,
     AppointmentListView,
     AppointmentProgressView,
+    AvailabilityCalendarDataView,
+    AvailabilityCalendarView,
     DoctorDetailView,
     FamilyMemberCreateView,
     FamilyMemberDeleteView,
     FamilyMemberListView,
     FamilyMemberUpdateView,
+    NextAvailableView,
     PatientDashboardView,
     ScheduleSearchView,
 )
@@ -22,6 +25,9 @@ urlpatterns = [
     path("appointments/<int:pk>/cancel/", AppointmentCancelView.as_view(), name="appointment-cancel"),
     path("appointments/<int:pk>/progress/", AppointmentProgressView.as_view(), name="appointment-progress"),
     path("schedules/", ScheduleSearchView.as_view(), name="schedule-search"),
+    path("schedules/calendar/", AvailabilityCalendarView.as_view(), name="availability-calendar"),
+    path("schedules/calendar/data/", AvailabilityCalendarDataView.as_view(), name="availability-calendar-data"),
+    path("schedules/next-available/", NextAvailableView.as_view(), name="next-available"),
     path("schedules/<int:pk>/book/", AppointmentCreateView.as_view(), name="appointment-book"),
     path("doctors/<int:pk>/", DoctorDetailView.as_view(), name="doctor-detail"),
     path("family/", FamilyMemberListView.as_view(), name="family"),
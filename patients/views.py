@@ -1,39 +1,49 @@
 from __future__ import annotations
 
+from asgiref.sync import sync_to_async
 from django import forms
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
-from django.db.models import Max
-from django.http import Http404
-from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.db.models import Count, Max, Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import FormView, View
 
-from registrations.forms import AppointmentBookingForm, ScheduleSearchForm
+from hospital.pagination import PaginationMixin
+from hospital.views import AsyncUserMixin, CachedPageMixin
+from registrations import availability, kiosk, reference
+from registrations.forms import AppointmentBookingForm, AvailabilityCalendarForm, ScheduleSearchForm
 from registrations.models import Appointment, AppointmentEventLog, Doctor, DoctorSchedule
 from .forms import FamilyMemberForm
 from .models import FamilyMember
 
 
-class PatientDashboardView(LoginRequiredMixin, TemplateView):
+class PatientDashboardView(AsyncUserMixin, LoginRequiredMixin, TemplateView):
     template_name = "patients/dashboard.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        patient = getattr(self.request.user, "patient_profile", None)
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        patient = getattr(request.user, "patient_profile", None)
         if patient:
             upcoming = (
                 Appointment.objects.filter(patient=patient, status=Appointment.Status.RESERVED)
                 .order_by("schedule__date")
-                .select_related("schedule", "schedule__doctor", "schedule__doctor__department")[:3]
+                .select_related(
+                    "schedule",
+                    "schedule__doctor",
+                    "schedule__doctor__user",
+                    "schedule__doctor__department",
+                )[:3]
             )
-            context["upcoming_appointments"] = upcoming
+            context["upcoming_appointments"] = [appointment async for appointment in upcoming]
             context["patient"] = patient
-            context["family_count"] = patient.family_members.count()
-        return context
+            context["family_count"] = await patient.family_members.acount()
+        return self.render_to_response(context)
 
 
 class FamilyMemberListView(LoginRequiredMixin, TemplateView):
@@ -114,84 +124,214 @@ class FamilyMemberDeleteView(LoginRequiredMixin, View):
         return redirect("patients:family")
 
 
-class ScheduleSearchView(LoginRequiredMixin, TemplateView):
+class ScheduleSearchView(AsyncUserMixin, LoginRequiredMixin, TemplateView):
     template_name = "patients/schedule_search.html"
 
     def get_form(self):
         return ScheduleSearchForm(self.request.GET or None)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
         form = self.get_form()
-        schedules = DoctorSchedule.objects.select_related(
-            "doctor",
-            "doctor__user",
-            "doctor__department",
-        ).filter(status__in=[DoctorSchedule.Status.OPEN, DoctorSchedule.Status.CLOSED])
+        schedules = (
+            DoctorSchedule.objects.select_related(
+                "doctor",
+                "doctor__user",
+                "doctor__department",
+            )
+            .filter(status__in=[DoctorSchedule.Status.OPEN, DoctorSchedule.Status.CLOSED])
+            .with_active_counts()
+        )
 
-        if form.is_valid():
+        context["next_slots"] = None
+        # 表單驗證會以 queryset 查詢選取的科別，需在同步執行緒中進行。
+        if await sync_to_async(form.is_valid)():
             date = form.cleaned_data.get("date")
             department = form.cleaned_data.get("department")
             if date:
                 schedules = schedules.filter(date=date)
             if department:
                 schedules = schedules.filter(doctor__department=department)
+                # 最快可掛號的門診由名額索引回答，不必逐日查詢。
+                context["next_slots"] = await sync_to_async(availability.next_available)(
+                    department_id=department.pk, limit=3
+                )
 
         schedules = schedules.order_by("date", "session", "doctor__department__name")
         context.update({
             "form": form,
-            "schedules": schedules,
+            "schedules": [schedule async for schedule in schedules],
         })
+        return self.render_to_response(context)
+
+
+class NextAvailableView(LoginRequiredMixin, View):
+    """指定科別或醫師最早仍有名額的門診，資料來自名額索引，只需一次快取讀取。"""
+
+    max_limit = 20
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(max(int(request.GET.get("limit", 5)), 1), self.max_limit)
+        except ValueError:
+            limit = 5
+        slots = availability.next_available(
+            department_id=request.GET.get("department"),
+            doctor_id=request.GET.get("doctor"),
+            limit=limit,
+        )
+        results = []
+        for slot in slots:
+            doctor = slot.doctor
+            results.append(
+                {
+                    "schedule_id": slot.schedule_id,
+                    "date": slot.date.isoformat(),
+                    "session": slot.session,
+                    "session_label": slot.session_label,
+                    "doctor": doctor.name if doctor else "",
+                    "department": doctor.department_name if doctor else "",
+                    "remaining": slot.remaining,
+                    "quota": slot.quota,
+                    "booking_url": reverse("patients:appointment-book", args=[slot.schedule_id]),
+                }
+            )
+        return JsonResponse({"results": results})
+
+
+class AvailabilityCalendarView(LoginRequiredMixin, TemplateView):
+    """科別月曆：整月每日各時段的名額由一次分組查詢算出並快取，不必逐日查詢班表。"""
+
+    template_name = "patients/availability_calendar.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = AvailabilityCalendarForm(self.request.GET or None)
+        context.update({"form": form, "calendar": None, "today": timezone.localdate()})
+        if form.is_valid():
+            context["calendar"] = availability.month_calendar(
+                form.cleaned_data["department"].pk, form.cleaned_data["month"]
+            )
         return context
 
 
-class DoctorDetailView(LoginRequiredMixin, DetailView):
-    model = Doctor
+class AvailabilityCalendarDataView(LoginRequiredMixin, View):
+    """月曆元件使用的 JSON：只列出有門診的日期。"""
+
+    def get(self, request, *args, **kwargs):
+        form = AvailabilityCalendarForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        month_calendar = availability.month_calendar(form.cleaned_data["department"].pk, form.cleaned_data["month"])
+        days = []
+        for day in sorted(month_calendar.days.values(), key=lambda item: item.date):
+            days.append(
+                {
+                    "date": day.date.isoformat(),
+                    "total": day.total,
+                    "remaining": day.remaining,
+                    "level": day.level,
+                    "sessions": [
+                        {
+                            "session": item.session,
+                            "session_label": item.session_label,
+                            "total": item.total,
+                            "remaining": item.remaining,
+                        }
+                        for item in day.sessions
+                    ],
+                }
+            )
+        return JsonResponse(
+            {
+                "department": month_calendar.department_id,
+                "month": month_calendar.month.strftime("%Y-%m"),
+                "days": days,
+            }
+        )
+
+
+class DoctorDetailView(LoginRequiredMixin, CachedPageMixin, DetailView):
+    """醫師介紹頁：姓名與科別取自參考資料快取，專長與簡介所在的片段快取未命中時才查詢資料庫。"""
+
     template_name = "patients/doctor_detail.html"
-    context_object_name = "doctor"
+    context_object_name = "entry"
+    cache_namespaces = (reference.NAMESPACE,)
+
+    def get_object(self, queryset=None):
+        entry = reference.doctor(self.kwargs["pk"])
+        if entry is None:
+            raise Http404("找不到醫師")
+        return entry
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pk = self.object.pk
+        context["doctor"] = SimpleLazyObject(
+            lambda: Doctor.objects.select_related("user", "department").get(pk=pk)
+        )
+        return context
+
 
+class AppointmentListView(LoginRequiredMixin, PaginationMixin, ListView):
+    """即將到來的掛號一次列出；歷史紀錄依 ``(created_at, id)`` 游標逐頁載入，不計算總筆數。"""
 
-class AppointmentListView(LoginRequiredMixin, ListView):
     template_name = "patients/appointments.html"
     context_object_name = "appointments"
+    paginate_by = 20
+    pagination_mode = "keyset"
+    keyset_ordering = Appointment.HISTORY_ORDERING
+    related = (
+        "schedule",
+        "schedule__doctor",
+        "schedule__doctor__user",
+        "schedule__doctor__department",
+        "family_member",
+    )
+
+    def _patient_appointments(self):
+        patient = getattr(self.request.user, "patient_profile", None)
+        return Appointment.objects.select_related(*self.related).filter(patient=patient)
 
-    def get_queryset(self):  # pragma: no cover - Django QuerySet
-        return (
-            Appointment.objects.select_related(
-                "schedule",
-                "schedule__doctor",
-                "schedule__doctor__department",
-                "family_member",
-            )
-            .filter(patient__user=self.request.user)
-            .order_by("-created_at")
-        )
+    def get_queryset(self):
+        return self._patient_appointments().history()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # 翻到後面的歷史頁時不再重複查詢即將到來的掛號。
+        context["show_upcoming"] = not self.request.GET.get(self.cursor_kwarg)
+        if context["show_upcoming"]:
+            context["upcoming_appointments"] = list(self._patient_appointments().upcoming())
+        return context
 
 
-class AppointmentProgressView(LoginRequiredMixin, TemplateView):
+class AppointmentProgressView(AsyncUserMixin, LoginRequiredMixin, TemplateView):
     template_name = "patients/appointment_progress.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        appointment = get_object_or_404(
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        appointment = await aget_object_or_404(
             Appointment.objects.select_related(
                 "schedule",
                 "schedule__doctor",
+                "schedule__doctor__user",
                 "schedule__doctor__department",
             ),
             pk=self.kwargs["pk"],
-            patient__user=self.request.user,
+            patient__user=request.user,
         )
         schedule = appointment.schedule
-        current_number = (
-            schedule.appointments.filter(
-                status__in=[Appointment.Status.IN_PROGRESS, Appointment.Status.COMPLETED]
-            ).aggregate(max_number=Max("queue_number"))["max_number"]
-            or 0
+        # 目前號碼與各狀態人數以單一彙總查詢取得。
+        progress = await schedule.appointments.aaggregate(
+            current_number=Max(
+                "queue_number",
+                filter=Q(status__in=[Appointment.Status.IN_PROGRESS, Appointment.Status.COMPLETED]),
+            ),
+            checked_in=Count("pk", filter=Q(status=Appointment.Status.CHECKED_IN)),
+            waiting=Count("pk", filter=Q(status=Appointment.Status.RESERVED)),
+            completed=Count("pk", filter=Q(status=Appointment.Status.COMPLETED)),
+            active=Count("pk", filter=~Q(status=Appointment.Status.CANCELLED)),
         )
-        checked_in = schedule.appointments.filter(status=Appointment.Status.CHECKED_IN).count()
-        waiting = schedule.appointments.filter(status=Appointment.Status.RESERVED).count()
-        completed = schedule.appointments.filter(status=Appointment.Status.COMPLETED).count()
         events = (
             AppointmentEventLog.objects.filter(appointment__schedule=schedule)
             .select_related("appointment", "actor")
@@ -201,15 +341,21 @@ class AppointmentProgressView(LoginRequiredMixin, TemplateView):
             {
                 "appointment": appointment,
                 "schedule": schedule,
-                "current_number": current_number,
-                "checked_in_count": checked_in,
-                "waiting_count": waiting,
-                "completed_count": completed,
-                "remaining": schedule.remaining_quota,
-                "events": events,
+                "current_number": progress["current_number"] or 0,
+                "checked_in_count": progress["checked_in"],
+                "waiting_count": progress["waiting"],
+                "completed_count": progress["completed"],
+                "remaining": max(schedule.quota - progress["active"], 0),
+                "events": [event async for event in events],
+                # 報到用 QR code 只在仍可報到時顯示，由報到機驗證簽章後直接更新。
+                "kiosk_token": (
+                    kiosk.make_token(appointment.pk, schedule.date)
+                    if appointment.status == Appointment.Status.RESERVED and schedule.date >= timezone.localdate()
+                    else None
+                ),
             }
         )
-        return context
+        return self.render_to_response(context)
 
 
 class AppointmentCreateView(LoginRequiredMixin, FormView):
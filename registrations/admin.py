@@ -1,31 +1,58 @@
 from django.contrib import admin
 
+from hospital.admin import PerformanceModelAdmin
+
 from .models import Appointment, AppointmentEventLog, Doctor, DoctorSchedule
 
 
 @admin.register(Doctor)
 class DoctorAdmin(admin.ModelAdmin):
     list_display = ("user", "department", "license_number", "is_active")
+    list_select_related = ("user", "department")
     search_fields = ("user__username", "user__last_name", "license_number")
     list_filter = ("department", "is_active")
+    autocomplete_fields = ("user",)
 
 
 @admin.register(DoctorSchedule)
-class DoctorScheduleAdmin(admin.ModelAdmin):
-    list_display = ("doctor", "date", "session", "status", "quota", "capacity_used")
-    list_filter = ("date", "session", "status", "doctor__department")
+class DoctorScheduleAdmin(PerformanceModelAdmin):
+    list_display = ("doctor", "date", "session", "status", "quota", "active_appointments")
+    list_select_related = ("doctor__user", "doctor__department")
+    list_filter = ("session", "status", "doctor__department")
     search_fields = ("doctor__user__last_name", "doctor__department__name")
+    date_hierarchy = "date"
+    autocomplete_fields = ("doctor",)
+    ordering = ("-date", "session")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_active_counts_subquery()
+
+    @admin.display(description="已掛號", ordering="active_appointments_count")
+    def active_appointments(self, obj):
+        return obj.capacity_used
 
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(PerformanceModelAdmin):
     list_display = ("schedule", "queue_number", "patient", "status", "created_at")
+    list_select_related = ("schedule__doctor__user", "schedule__doctor__department", "patient__user")
     list_filter = ("status", "schedule__date", "schedule__doctor__department")
     search_fields = ("patient__user__last_name", "patient__medical_record_number")
+    patient_search_field = "patient"
+    autocomplete_fields = ("schedule", "patient", "family_member")
+    ordering = ("-pk",)
 
 
 @admin.register(AppointmentEventLog)
-class AppointmentEventLogAdmin(admin.ModelAdmin):
+class AppointmentEventLogAdmin(PerformanceModelAdmin):
     list_display = ("appointment", "event", "actor", "created_at")
+    list_select_related = (
+        "appointment__schedule__doctor__user",
+        "appointment__schedule__doctor__department",
+        "actor",
+    )
     list_filter = ("event", "created_at")
     search_fields = ("appointment__patient__user__last_name",)
+    patient_search_field = "appointment__patient"
+    autocomplete_fields = ("appointment", "actor")
+    ordering = ("-pk",)
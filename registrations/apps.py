@@ -5,3 +5,6 @@ class RegistrationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "registrations"
     verbose_name = "掛號與班表"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,317 @@
+"""各科別近期仍有名額的門診索引，回答「某科或某位醫師最快可以掛哪一診」。
+
+每個科別一份依日期、時段排序的精簡清單（``Slot``），存放在共用快取，查詢只需一次快取讀取。
+掛號與取消時（``registrations.signals``）只重新計算該班表的名額並更新清單中的一筆；
+班表或醫師異動時則遞增版本號整份重建。清單只是加速查詢的索引，實際預約仍以資料庫驗證名額。
+
+``month_calendar`` 提供科別月曆：每日每個時段的總名額與剩餘名額，以一次依日期、時段分組的
+查詢算出整個月並快取；掛號或取消時刪除該月的快取，班表異動則隨版本號一併失效。
+"""
+
+from __future__ import annotations
+
+import calendar
+import datetime
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import models
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from hospital.cache import bump_version, pending_bump, record, versioned_key
+
+from . import reference
+from .models import DoctorSchedule
+
+
+NAMESPACE = "availability"
+HORIZON_DAYS = 90
+CACHE_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 5
+# 剩餘比例低於此值的日期在月曆上標示為「名額緊張」
+LOW_CAPACITY_RATIO = 0.25
+SESSION_ORDER = {value: index for index, value in enumerate(DoctorSchedule.Session.values)}
+
+
+@dataclass(frozen=True)
+class Slot:
+    schedule_id: int
+    date: datetime.date
+    session: str
+    doctor_id: int
+    remaining: int
+    quota: int
+
+    @property
+    def sort_key(self) -> tuple:
+        return self.date, SESSION_ORDER.get(self.session, len(SESSION_ORDER)), self.schedule_id
+
+    @property
+    def session_label(self) -> str:
+        return DoctorSchedule.Session(self.session).label
+
+    @property
+    def doctor(self) -> reference.DoctorEntry | None:
+        return reference.doctor(self.doctor_id)
+
+
+def _key(department_id: int, today: datetime.date) -> str:
+    # 鍵中帶日期，跨日後自然改用新的清單，不會留下已過去的門診。
+    return versioned_key(NAMESPACE, department_id, today.isoformat())
+
+
+def _schedules(today: datetime.date):
+    return (
+        DoctorSchedule.objects.filter(
+            status=DoctorSchedule.Status.OPEN,
+            doctor__is_active=True,
+            date__gte=today,
+            date__lte=today + datetime.timedelta(days=HORIZON_DAYS),
+        )
+        .with_active_counts()
+        .order_by()
+    )
+
+
+def _slot(row: dict) -> Slot:
+    return Slot(
+        schedule_id=row["pk"],
+        date=row["date"],
+        session=row["session"],
+        doctor_id=row["doctor_id"],
+        remaining=max(row["quota"] - row["active_appointments_count"], 0),
+        quota=row["quota"],
+    )
+
+
+def _load(department_id: int, today: datetime.date) -> tuple[Slot, ...]:
+    rows = _schedules(today).filter(doctor__department_id=department_id).values(
+        "pk", "date", "session", "doctor_id", "quota", "active_appointments_count"
+    )
+    slots = [slot for slot in map(_slot, rows) if slot.remaining > 0]
+    return tuple(sorted(slots, key=lambda slot: slot.sort_key))
+
+
+def department_slots(department_id: int) -> tuple[Slot, ...]:
+    today = timezone.localdate()
+    if pending_bump(NAMESPACE) is not None:
+        # 班表異動尚未提交，不以未提交的資料建立共用快取。
+        return _load(department_id, today)
+    key = _key(department_id, today)
+    slots = cache.get(key)
+    record(NAMESPACE, hit=slots is not None)
+    if slots is None:
+        slots = _load(department_id, today)
+        cache.set(key, slots, CACHE_TIMEOUT)
+    return slots
+
+
+def next_available(
+    *,
+    department_id: int | str | None = None,
+    doctor_id: int | str | None = None,
+    after: datetime.date | None = None,
+    limit: int = 5,
+) -> list[Slot]:
+    """指定科別或醫師最早仍有名額的門診，最多 ``limit`` 筆；兩者皆未指定時回傳空清單。"""
+
+    if doctor_id not in (None, ""):
+        entry = reference.doctor(doctor_id)
+        if entry is None or not entry.is_active:
+            return []
+        department_id, doctor_id = entry.department_id, entry.pk
+    else:
+        doctor_id = None
+    try:
+        department_id = int(department_id)
+    except (TypeError, ValueError):
+        return []
+    results = []
+    for slot in department_slots(department_id):
+        if after and slot.date < after:
+            continue
+        if doctor_id is not None and slot.doctor_id != doctor_id:
+            continue
+        results.append(slot)
+        if len(results) >= limit:
+            break
+    return results
+
+
+@dataclass(frozen=True)
+class SessionCapacity:
+    session: str
+    total: int
+    remaining: int
+
+    @property
+    def session_label(self) -> str:
+        return DoctorSchedule.Session(self.session).label
+
+
+@dataclass(frozen=True)
+class CalendarDay:
+    date: datetime.date
+    sessions: tuple[SessionCapacity, ...] = ()
+
+    @property
+    def total(self) -> int:
+        return sum(item.total for item in self.sessions)
+
+    @property
+    def remaining(self) -> int:
+        return sum(item.remaining for item in self.sessions)
+
+    @property
+    def level(self) -> str:
+        """熱度等級：``none`` 無門診、``full`` 額滿、``low`` 名額緊張、``open`` 尚有名額。"""
+
+        if not self.total:
+            return "none"
+        if not self.remaining:
+            return "full"
+        return "low" if self.remaining / self.total < LOW_CAPACITY_RATIO else "open"
+
+
+@dataclass(frozen=True)
+class MonthCalendar:
+    department_id: int
+    month: datetime.date
+    days: dict[datetime.date, CalendarDay]
+
+    @property
+    def previous_month(self) -> datetime.date:
+        return (self.month - datetime.timedelta(days=1)).replace(day=1)
+
+    @property
+    def next_month(self) -> datetime.date:
+        return (self.month + datetime.timedelta(days=31)).replace(day=1)
+
+    @property
+    def weeks(self) -> list[list[CalendarDay | None]]:
+        """以週日為首的月曆格，不屬於本月的日期為 ``None``。"""
+
+        grid = calendar.Calendar(firstweekday=calendar.SUNDAY)
+        return [
+            [self.days.get(day, CalendarDay(day)) if day.month == self.month.month else None for day in week]
+            for week in grid.monthdatescalendar(self.month.year, self.month.month)
+        ]
+
+
+def _calendar_key(department_id: int, month: datetime.date) -> str:
+    return versioned_key(NAMESPACE, "calendar", department_id, month.strftime("%Y-%m"))
+
+
+def _load_month(department_id: int, month: datetime.date) -> dict[datetime.date, CalendarDay]:
+    last_day = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+    # 掛號數以相關子查詢逐班表計算，再依日期與時段加總，避免與掛號資料列 JOIN 後重複計算名額。
+    rows = (
+        DoctorSchedule.objects.filter(
+            doctor__department_id=department_id,
+            doctor__is_active=True,
+            status__in=[DoctorSchedule.Status.OPEN, DoctorSchedule.Status.CLOSED],
+            date__range=(month, last_day),
+        )
+        .with_active_counts_subquery()
+        .order_by()
+        .values("date", "session")
+        .annotate(
+            total=models.Sum("quota"),
+            remaining=models.Sum(
+                models.Case(
+                    models.When(
+                        status=DoctorSchedule.Status.OPEN,
+                        then=Greatest(models.F("quota") - models.F("active_appointments_count"), 0),
+                    ),
+                    default=0,
+                )
+            ),
+        )
+    )
+    sessions: dict[datetime.date, list[SessionCapacity]] = {}
+    for row in rows:
+        sessions.setdefault(row["date"], []).append(
+            SessionCapacity(session=row["session"], total=row["total"], remaining=row["remaining"])
+        )
+    return {
+        day: CalendarDay(
+            day, tuple(sorted(items, key=lambda item: SESSION_ORDER.get(item.session, len(SESSION_ORDER))))
+        )
+        for day, items in sessions.items()
+    }
+
+
+def month_calendar(department_id: int, month: datetime.date) -> MonthCalendar:
+    """科別某月每日各時段的總名額與剩餘名額；``month`` 可為該月任一天。"""
+
+    month = month.replace(day=1)
+    if pending_bump(NAMESPACE) is not None:
+        return MonthCalendar(department_id=department_id, month=month, days=_load_month(department_id, month))
+    key = _calendar_key(department_id, month)
+    days = cache.get(key)
+    record(f"{NAMESPACE}-calendar", hit=days is not None)
+    if days is None:
+        days = _load_month(department_id, month)
+        cache.set(key, days, CACHE_TIMEOUT)
+    return MonthCalendar(department_id=department_id, month=month, days=days)
+
+
+def refresh_schedule(schedule_id: int) -> None:
+    """掛號或取消後重新計算單一班表的名額，並更新所屬科別清單中的那一筆。
+
+    名額在取得科別的鎖之後才讀取，兩筆掛號同時提交時，後寫入清單的一定是較新的名額。
+    鎖被占用時只刪除該科別的清單與該月月曆，不遞增版本號，其他科別的快取不受影響。
+    """
+
+    today = timezone.localdate()
+    target = DoctorSchedule.objects.filter(pk=schedule_id).values("date", "doctor__department_id").first()
+    if target is None:
+        return
+    department_id = target["doctor__department_id"]
+    # 月曆是整月的加總，直接刪除該月快取，下次讀取時重新彙總。
+    cache.delete(_calendar_key(department_id, target["date"].replace(day=1)))
+    key = _key(department_id, today)
+    lock = f"{key}:lock"
+    if not cache.add(lock, 1, LOCK_TIMEOUT):
+        # 同一科別正由其他請求更新，讀改寫可能互相覆蓋，改為刪除這一科的清單，下次讀取時重建。
+        cache.delete(key)
+        return
+    try:
+        slots = cache.get(key)
+        if slots is None:
+            return
+        row = (
+            DoctorSchedule.objects.filter(pk=schedule_id)
+            .with_active_counts()
+            .values(
+                "pk",
+                "date",
+                "session",
+                "status",
+                "doctor_id",
+                "doctor__is_active",
+                "quota",
+                "active_appointments_count",
+            )
+            .first()
+        )
+        updated = [item for item in slots if item.schedule_id != schedule_id]
+        if row is not None:
+            slot = _slot(row)
+            if (
+                row["status"] == DoctorSchedule.Status.OPEN
+                and row["doctor__is_active"]
+                and today <= slot.date <= today + datetime.timedelta(days=HORIZON_DAYS)
+                and slot.remaining > 0
+            ):
+                updated.append(slot)
+                updated.sort(key=lambda item: item.sort_key)
+        cache.set(key, tuple(updated), CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def invalidate() -> None:
+    bump_version(NAMESPACE)
+
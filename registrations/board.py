@@ -0,0 +1,117 @@
+"""候診區叫號看板：今日各診間目前看診號碼與候診人數。
+
+看板以一次彙總查詢算出，存入共用快取約一秒（``FRESH_SECONDS``）。過期後只有取得
+``cache.add`` 鎖的請求重新計算，其他請求在重建期間繼續使用剛過期的看板；完全沒有看板時
+才短暫等待重建結果。數十台螢幕同時輪詢，資料庫每秒仍只需一次查詢。
+看板內容的雜湊作為 ``ETag``，內容沒變時螢幕只會收到 304。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import models
+from django.utils import timezone
+
+from hospital.cache import record
+
+from . import reference
+from .models import Appointment, DoctorSchedule
+
+
+NAMESPACE = "board"
+FRESH_SECONDS = 1.0
+# 過期的看板在重建期間仍可使用；超過這個時間才會從快取消失。
+STALE_SECONDS = 30
+LOCK_TIMEOUT = 5
+WAIT_SECONDS = 0.5
+WAIT_INTERVAL = 0.05
+
+
+@dataclass(frozen=True)
+class Board:
+    data: dict
+    etag: str
+    built_at: float
+
+
+def _key(department_id: int | None) -> str:
+    return f"{NAMESPACE}:{department_id or 'all'}:{timezone.localdate().isoformat()}"
+
+
+def _rooms(department_id: int | None) -> list[dict]:
+    schedules = DoctorSchedule.objects.filter(date=timezone.localdate()).exclude(status=DoctorSchedule.Status.ENDED)
+    if department_id:
+        schedules = schedules.filter(doctor__department_id=department_id)
+    rows = (
+        schedules.order_by("session", "clinic_room", "pk")
+        .values("pk", "session", "status", "clinic_room", "doctor_id")
+        .annotate(
+            current_number=models.Max(
+                "appointments__queue_number",
+                filter=models.Q(appointments__status=Appointment.Status.IN_PROGRESS),
+            ),
+            last_completed=models.Max(
+                "appointments__queue_number",
+                filter=models.Q(appointments__status=Appointment.Status.COMPLETED),
+            ),
+            waiting=models.Count("appointments", filter=models.Q(appointments__status=Appointment.Status.CHECKED_IN)),
+        )
+    )
+    rooms = []
+    for row in rows:
+        doctor = reference.doctor(row["doctor_id"])
+        rooms.append(
+            {
+                "schedule_id": row["pk"],
+                "room": row["clinic_room"],
+                "session": row["session"],
+                "session_label": DoctorSchedule.Session(row["session"]).label,
+                "status": row["status"],
+                "status_label": DoctorSchedule.Status(row["status"]).label,
+                "doctor": doctor.name if doctor else "",
+                "department": doctor.department_name if doctor else "",
+                "current_number": row["current_number"] or row["last_completed"] or 0,
+                "waiting": row["waiting"],
+            }
+        )
+    return rooms
+
+
+def _build(department_id: int | None) -> Board:
+    data = {"date": timezone.localdate().isoformat(), "department": department_id, "rooms": _rooms(department_id)}
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True).encode()
+    return Board(data=data, etag=hashlib.md5(payload).hexdigest(), built_at=time.time())
+
+
+def get_board(department_id: int | None = None) -> Board:
+    key = _key(department_id)
+    board = cache.get(key)
+    fresh = board is not None and time.time() - board.built_at < FRESH_SECONDS
+    record(NAMESPACE, hit=fresh)
+    if fresh:
+        return board
+
+    lock = f"{key}:lock"
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            board = _build(department_id)
+            cache.set(key, board, STALE_SECONDS)
+        finally:
+            cache.delete(lock)
+        return board
+    if board is not None:
+        # 其他請求正在重建，先回傳剛過期的看板
+        return board
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        board = cache.get(key)
+        if board is not None:
+            return board
+    # 重建的請求可能已失敗，自行計算但不寫入快取，避免與持有鎖的請求互相覆蓋。
+    return _build(department_id)
@@ -0,0 +1,199 @@
+"""櫃檯批次作業：一次報到、取消或改期多筆掛號。
+
+輸入可混合掛號編號與病歷號（掃描病歷條碼），病歷號對應到指定日期的掛號。
+整批以一次查詢載入並在記憶體中逐筆判斷是否可處理，再以一個 ``UPDATE`` 轉換狀態、
+``bulk_create`` 寫入事件紀錄。``UPDATE`` 仍帶有原狀態條件，若更新筆數與判斷結果不符，
+表示期間有其他人異動，整批回復並拋出 ``BulkConflict``。
+
+批次更新不會觸發 ``post_save``，影響名額的取消與改期在交易提交後自行更新名額索引。
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+from dataclasses import dataclass, field
+from functools import partial
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import availability
+from .models import Appointment, AppointmentEventLog, DoctorSchedule
+
+
+MAX_ITEMS = 200
+SEPARATORS = re.compile(r"[\s,，、;]+")
+
+
+class Action(models.TextChoices):
+    CHECK_IN = "check_in", "報到"
+    CANCEL = "cancel", "取消"
+    RESCHEDULE = "reschedule", "改期"
+
+
+SOURCE_STATUSES = {
+    Action.CHECK_IN: (Appointment.Status.RESERVED,),
+    Action.CANCEL: (Appointment.Status.RESERVED, Appointment.Status.CHECKED_IN, Appointment.Status.IN_PROGRESS),
+    Action.RESCHEDULE: (Appointment.Status.RESERVED,),
+}
+EVENTS = {
+    Action.CHECK_IN: AppointmentEventLog.Event.CHECKED_IN,
+    Action.CANCEL: AppointmentEventLog.Event.CANCELLED,
+    Action.RESCHEDULE: AppointmentEventLog.Event.SYSTEM,
+}
+
+
+class BulkConflict(Exception):
+    """判斷後到更新前，有掛號被其他請求異動。"""
+
+
+@dataclass
+class BulkResult:
+    action: str
+    updated: list[int] = field(default_factory=list)
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "action": self.action,
+            "updated": len(self.updated),
+            "appointment_ids": self.updated,
+            "skipped": [{"identifier": identifier, "reason": reason} for identifier, reason in self.skipped],
+        }
+
+
+def parse_identifiers(raw: str) -> list[str]:
+    """以空白、換行或逗號分隔的掛號編號與病歷號，去除重複並保留輸入順序。"""
+
+    tokens = (token.strip().upper() for token in SEPARATORS.split(raw))
+    return list(dict.fromkeys(token for token in tokens if token))
+
+
+def _load(identifiers: list[str], date: datetime.date) -> dict[str, list[dict]]:
+    ids = {int(token) for token in identifiers if token.isdigit()}
+    numbers = {token for token in identifiers if not token.isdigit()}
+    rows = (
+        Appointment.objects.filter(
+            models.Q(pk__in=ids) | models.Q(patient__medical_record_number__in=numbers, schedule__date=date)
+        )
+        .order_by("schedule__date", "queue_number")
+        .select_for_update(of=("self",))
+        .values("pk", "status", "schedule_id", "patient_id", "patient__medical_record_number")
+    )
+    matches: dict[str, list[dict]] = {}
+    for row in rows:
+        if row["pk"] in ids:
+            matches.setdefault(str(row["pk"]), []).append(row)
+        if row["patient__medical_record_number"] in numbers:
+            matches.setdefault(row["patient__medical_record_number"], []).append(row)
+    return matches
+
+
+def _lock_target(target_id: int) -> tuple[DoctorSchedule, int, int, set[int]]:
+    """鎖定目標時段並回傳（班表、剩餘名額、下一個號碼、已有有效掛號的病患）。
+
+    鎖定讓同時改期或掛號到此時段的請求依序進行；FOR UPDATE 不能與 GROUP BY 並用，
+    名額與號碼改由該時段的掛號列表計算，一個時段的掛號數不多。
+    """
+
+    target = DoctorSchedule.objects.select_for_update().get(pk=target_id)
+    rows = list(Appointment.objects.filter(schedule=target).values_list("patient_id", "status", "queue_number"))
+    active = [patient_id for patient_id, status, _ in rows if status != Appointment.Status.CANCELLED]
+    next_number = max((number for _, _, number in rows), default=0) + 1
+    return target, max(target.quota - len(active), 0), next_number, set(active)
+
+
+def _refresh_availability(schedule_ids: set[int]) -> None:
+    for schedule_id in sorted(schedule_ids):
+        availability.refresh_schedule(schedule_id)
+
+
+def apply(
+    action: str,
+    identifiers: list[str],
+    *,
+    actor=None,
+    date: datetime.date | None = None,
+    target: DoctorSchedule | None = None,
+) -> BulkResult:
+    action = Action(action)
+    if action == Action.RESCHEDULE and target is None:
+        raise ValueError("改期需要指定目標時段。")
+    date = date or timezone.localdate()
+    sources = SOURCE_STATUSES[action]
+    result = BulkResult(action=action.value)
+
+    with transaction.atomic():
+        matches = _load(identifiers, date)
+        if action == Action.RESCHEDULE:
+            # 目標時段已有有效掛號的病患（``booked``）不可再改期到同一時段。
+            target, remaining, next_number, booked = _lock_target(target.pk)
+
+        eligible: list[dict] = []
+        seen: set[int] = set()
+        for identifier in identifiers:
+            rows = [row for row in matches.get(identifier, []) if row["pk"] not in seen]
+            if not rows:
+                reason = "重複輸入" if identifier in matches else "找不到掛號"
+                result.skipped.append((identifier, reason))
+                continue
+            for row in rows:
+                seen.add(row["pk"])
+                if row["status"] not in sources:
+                    label = Appointment.Status(row["status"]).label
+                    result.skipped.append((identifier, f"狀態為「{label}」，無法{action.label}"))
+                elif action == Action.RESCHEDULE and row["schedule_id"] == target.pk:
+                    result.skipped.append((identifier, "已在目標時段"))
+                elif action == Action.RESCHEDULE and row["patient_id"] in booked:
+                    result.skipped.append((identifier, "目標時段已有此病患的掛號"))
+                elif action == Action.RESCHEDULE and len(eligible) >= remaining:
+                    result.skipped.append((identifier, "目標時段名額不足"))
+                else:
+                    if action == Action.RESCHEDULE:
+                        booked.add(row["patient_id"])
+                    eligible.append(row)
+
+        if not eligible:
+            return result
+
+        now = timezone.now()
+        pks = [row["pk"] for row in eligible]
+        changes: dict = {"updated_at": now}
+        if action == Action.CHECK_IN:
+            changes.update(status=Appointment.Status.CHECKED_IN, check_in_at=now)
+        elif action == Action.CANCEL:
+            changes.update(status=Appointment.Status.CANCELLED, cancelled_at=now)
+        else:
+            changes.update(
+                schedule=target,
+                queue_number=models.Case(
+                    *(models.When(pk=pk, then=models.Value(next_number + index)) for index, pk in enumerate(pks)),
+                    output_field=models.PositiveIntegerField(),
+                ),
+            )
+        updated = Appointment.objects.filter(pk__in=pks, status__in=sources).update(**changes)
+        if updated != len(pks):
+            raise BulkConflict
+        AppointmentEventLog.objects.bulk_create(
+            [
+                AppointmentEventLog(
+                    appointment_id=row["pk"],
+                    event=EVENTS[action],
+                    actor=actor,
+                    payload=(
+                        {"action": action.value, "from_schedule": row["schedule_id"], "to_schedule": target.pk}
+                        if action == Action.RESCHEDULE
+                        else {"bulk": True}
+                    ),
+                )
+                for row in eligible
+            ]
+        )
+        if action != Action.CHECK_IN:
+            schedules = {row["schedule_id"] for row in eligible}
+            if target is not None:
+                schedules.add(target.pk)
+            transaction.on_commit(partial(_refresh_availability, schedules))
+        result.updated = pks
+    return result
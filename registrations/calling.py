@@ -0,0 +1,105 @@
+"""叫號：以一個條件式 ``UPDATE`` 把門診中號碼最小的已報到病患改為看診中。
+
+挑選與更新在同一個陳述式內完成，且只有在該列仍為「已報到」、門診中沒有其他看診中病患時才會更新；
+兩位醫師同時叫號或按鈕連點時，只有一個請求會更新到資料列，其他請求更新零筆。
+支援 ``UPDATE ... RETURNING`` 的資料庫（PostgreSQL、SQLite 3.35 以上）一次往返即可取得被叫到的掛號，
+叫號事件在同一交易中寫入。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Appointment, AppointmentEventLog
+
+
+@dataclass(frozen=True)
+class CalledPatient:
+    appointment_id: int
+    queue_number: int
+
+
+def supports_update_returning() -> bool:
+    if connection.vendor == "postgresql":
+        return True
+    # SQLite 3.35 起 INSERT 與 UPDATE 同時支援 RETURNING，Django 以這個旗標判斷 INSERT 是否可回傳欄位。
+    return connection.vendor == "sqlite" and connection.features.can_return_columns_from_insert
+
+
+def _claim_returning(schedule_id: int, now) -> CalledPatient | None:
+    table = connection.ops.quote_name(Appointment._meta.db_table)
+    checked_in, in_progress = Appointment.Status.CHECKED_IN, Appointment.Status.IN_PROGRESS
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+    # 外層再比對一次 status：PostgreSQL 在等待列鎖後只會重新檢查外層條件。
+    sql = f"""
+        UPDATE {table}
+        SET status = %s, check_in_at = COALESCE(check_in_at, %s), updated_at = %s
+        WHERE status = %s
+          AND id = (
+            SELECT id FROM {table}
+            WHERE schedule_id = %s AND status = %s
+            ORDER BY queue_number, id
+            LIMIT 1
+          )
+          AND NOT EXISTS (SELECT 1 FROM {table} WHERE schedule_id = %s AND status = %s)
+        RETURNING id, queue_number
+    """
+    params = [in_progress, timestamp, timestamp, checked_in, schedule_id, checked_in, schedule_id, in_progress]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return CalledPatient(*row) if row else None
+
+
+def _claim_locked(schedule_id: int, now) -> CalledPatient | None:
+    """不支援 ``UPDATE ... RETURNING`` 時，先鎖定候選列再以條件式更新。"""
+
+    appointments = Appointment.objects.filter(schedule_id=schedule_id)
+    candidate = (
+        appointments.filter(status=Appointment.Status.CHECKED_IN)
+        .order_by("queue_number", "pk")
+        .select_for_update()
+        .values_list("pk", "queue_number")
+        .first()
+    )
+    if candidate is None or appointments.filter(status=Appointment.Status.IN_PROGRESS).exists():
+        return None
+    updated = Appointment.objects.filter(pk=candidate[0], status=Appointment.Status.CHECKED_IN).update(
+        status=Appointment.Status.IN_PROGRESS,
+        check_in_at=Coalesce("check_in_at", Value(now)),
+        updated_at=now,
+    )
+    return CalledPatient(*candidate) if updated else None
+
+
+def call_next(schedule_id: int, *, actor=None, click_token: str = "") -> CalledPatient | None:
+    """叫出門診中號碼最小的已報到病患；沒有可叫的病患或已有人看診中時回傳 ``None``。
+
+    ``click_token`` 記錄在叫號事件中，重送同一次點擊時可據此辨認（見 ``repeated_call``）。
+    """
+
+    now = timezone.now()
+    claim = _claim_returning if supports_update_returning() else _claim_locked
+    with transaction.atomic():
+        called = claim(schedule_id, now)
+        if called is not None:
+            AppointmentEventLog.objects.create(
+                appointment_id=called.appointment_id,
+                event=AppointmentEventLog.Event.CALLED,
+                actor=actor,
+                payload={"click": click_token} if click_token else {},
+            )
+    return called
+
+
+def repeated_call(appointment: Appointment, click_token: str) -> bool:
+    """``appointment`` 是否正是由同一次點擊（``click_token``）叫出。"""
+
+    if not click_token:
+        return False
+    return appointment.events.filter(event=AppointmentEventLog.Event.CALLED, payload__click=click_token).exists()
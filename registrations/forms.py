@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import uuid
+
 from django import forms
 from django.contrib.auth import get_user_model
 from django.db import models, transaction
@@ -7,19 +9,41 @@ from django.utils import timezone
 
 from clinics.models import Department
 from patients.models import FamilyMember, Patient
+from . import bulk, reference
 from .models import Appointment, AppointmentEventLog, Doctor, DoctorSchedule
+from .reference import ReferenceChoiceField
 
 
 class ScheduleSearchForm(forms.Form):
     date = forms.DateField(label="看診日期", required=False, widget=forms.DateInput(attrs={"type": "date"}))
-    department = forms.ModelChoiceField(
+    department = ReferenceChoiceField(
         label="科別",
         required=False,
-        queryset=Department.objects.filter(is_active=True).order_by("name"),
+        queryset=Department.objects.filter(is_active=True),
+        choices=lambda: reference.department_choices(active_only=True),
         empty_label="全部科別",
     )
 
 
+class AvailabilityCalendarForm(forms.Form):
+    department = ReferenceChoiceField(
+        label="科別",
+        queryset=Department.objects.filter(is_active=True),
+        choices=lambda: reference.department_choices(active_only=True),
+        empty_label="請選擇科別",
+    )
+    month = forms.DateField(
+        label="月份",
+        required=False,
+        input_formats=["%Y-%m"],
+        widget=forms.DateInput(attrs={"type": "month"}, format="%Y-%m"),
+    )
+
+    def clean_month(self):
+        month = self.cleaned_data.get("month") or timezone.localdate()
+        return month.replace(day=1)
+
+
 class AppointmentBookingForm(forms.Form):
     family_member = forms.ModelChoiceField(label="就診對象", required=False, queryset=FamilyMember.objects.none())
     notes = forms.CharField(label="備註", required=False, widget=forms.Textarea(attrs={"rows": 3}))
@@ -88,7 +112,12 @@ class AppointmentBookingForm(forms.Form):
 
 
 class PatientLookupForm(forms.Form):
-    identifier = forms.CharField(label="病歷號或身分證號", max_length=20, required=False)
+    identifier = forms.CharField(
+        label="病歷號、身分證號、姓名或電話",
+        max_length=20,
+        required=False,
+        widget=forms.TextInput(attrs={"list": "patient-suggestions", "autocomplete": "off"}),
+    )
 
     def clean_identifier(self):
         identifier = self.cleaned_data.get("identifier", "").strip().upper()
@@ -218,8 +247,31 @@ class StaffPatientProfileForm(forms.Form):
         return patient
 
 
+class SchedulePickerWidget(forms.Select):
+    """只輸出目前選取的門診時段，其餘選項由前端依篩選條件向班表挑選器載入。
+
+    今日起的班表可能有上千筆，逐一輸出 ``<option>`` 會讓頁面過大。
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        choices = [("", field.empty_label)]
+        selected = [item for item in value if item]
+        if selected:
+            choices += [(obj.pk, field.label_from_instance(obj)) for obj in field.queryset.filter(pk__in=selected)]
+        return [
+            (None, [self.create_option(name, option_value, label, str(option_value) in value, index, attrs=attrs)], index)
+            for index, (option_value, label) in enumerate(choices)
+        ]
+
+
 class OnsiteAppointmentForm(forms.Form):
-    schedule = forms.ModelChoiceField(label="門診時段", queryset=DoctorSchedule.objects.none())
+    schedule = forms.ModelChoiceField(
+        label="門診時段",
+        queryset=DoctorSchedule.objects.none(),
+        widget=SchedulePickerWidget,
+        empty_label="請先依日期、科別或醫師搜尋",
+    )
     family_member = forms.ModelChoiceField(label="就診對象", required=False, queryset=FamilyMember.objects.none())
     notes = forms.CharField(label="備註", required=False, widget=forms.Textarea(attrs={"rows": 3}))
 
@@ -229,11 +281,11 @@ class OnsiteAppointmentForm(forms.Form):
         self.actor = actor
         self.fields["family_member"].queryset = patient.family_members.all()
         self.fields["family_member"].empty_label = "本人"
-        today = timezone.localdate()
+        # 驗證時只以主鍵查詢一筆，並在同一查詢附上已掛號數。
         self.fields["schedule"].queryset = (
-            DoctorSchedule.objects.filter(date__gte=today)
+            DoctorSchedule.objects.filter(date__gte=timezone.localdate())
+            .with_active_counts()
             .select_related("doctor", "doctor__user", "doctor__department")
-            .order_by("date", "session", "doctor__department__name")
         )
 
     def clean_schedule(self):
@@ -295,20 +347,68 @@ class OnsiteAppointmentForm(forms.Form):
         return appointment
 
 
+class StaffBulkAppointmentForm(forms.Form):
+    action = forms.ChoiceField(label="作業", choices=bulk.Action.choices)
+    identifiers = forms.CharField(
+        label="掛號編號或病歷號",
+        widget=forms.Textarea(attrs={"rows": 6, "autocomplete": "off"}),
+        help_text="每行一筆，可直接掃描病歷條碼；病歷號對應到看診日期當天的掛號。",
+    )
+    date = forms.DateField(
+        label="看診日期",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+        help_text="以病歷號查詢時使用，預設為今天。",
+    )
+    target_schedule = forms.IntegerField(label="改期目標時段編號", required=False, min_value=1)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.target: DoctorSchedule | None = None
+
+    def clean_identifiers(self):
+        identifiers = bulk.parse_identifiers(self.cleaned_data["identifiers"])
+        if not identifiers:
+            raise forms.ValidationError("請輸入至少一筆掛號編號或病歷號。")
+        if len(identifiers) > bulk.MAX_ITEMS:
+            raise forms.ValidationError(f"一次最多處理 {bulk.MAX_ITEMS} 筆。")
+        return identifiers
+
+    def clean_date(self):
+        return self.cleaned_data.get("date") or timezone.localdate()
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get("action") != bulk.Action.RESCHEDULE:
+            return cleaned
+        target_id = cleaned.get("target_schedule")
+        if not target_id:
+            raise forms.ValidationError("改期需要指定目標時段。")
+        target = DoctorSchedule.objects.filter(
+            pk=target_id,
+            status__in=[DoctorSchedule.Status.OPEN, DoctorSchedule.Status.CLOSED],
+            date__gte=timezone.localdate(),
+        ).first()
+        if target is None:
+            raise forms.ValidationError("目標時段不存在或未開放掛號。")
+        self.target = target
+        return cleaned
+
+
 class ClinicStatusFilterForm(forms.Form):
     date = forms.DateField(label="日期", required=False, widget=forms.DateInput(attrs={"type": "date"}))
-    department = forms.ModelChoiceField(
+    department = ReferenceChoiceField(
         label="科別",
         required=False,
-        queryset=Department.objects.filter(is_active=True).order_by("name"),
+        queryset=Department.objects.filter(is_active=True),
+        choices=lambda: reference.department_choices(active_only=True),
         empty_label="全部科別",
     )
-    doctor = forms.ModelChoiceField(
+    doctor = ReferenceChoiceField(
         label="醫師",
         required=False,
-        queryset=Doctor.objects.filter(is_active=True).select_related("user", "department").order_by(
-            "department__name", "user__last_name"
-        ),
+        queryset=Doctor.objects.filter(is_active=True),
+        choices=lambda: reference.doctor_choices(active_only=True),
         empty_label="全部醫師",
     )
 
@@ -319,6 +419,10 @@ class ClinicStatusFilterForm(forms.Form):
         return doctor
 
 
+class SchedulePickerFilterForm(ClinicStatusFilterForm):
+    page = forms.IntegerField(min_value=1, required=False)
+
+
 class DoctorActionBaseForm(forms.Form):
     """Base helper to驗證醫師操作的門診/掛號資料。"""
 
@@ -338,6 +442,12 @@ class DoctorActionBaseForm(forms.Form):
 
 class DoctorCallNextForm(DoctorActionBaseForm):
     schedule_id = forms.IntegerField(widget=forms.HiddenInput)
+    # 每次產生表單都是新的值，連點或重送同一次點擊時不會叫出第二位病患。
+    click_token = forms.CharField(widget=forms.HiddenInput, required=False, max_length=64)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["click_token"].initial = uuid.uuid4().hex
 
     def clean_schedule_id(self):
         schedule_id = self.cleaned_data["schedule_id"]
@@ -0,0 +1,135 @@
+"""自助報到機：掃描掛號 QR code 後直接完成報到。
+
+QR code 內容為 ``<掛號編號>.<看診日期>.<HMAC>``，HMAC 以 ``SECRET_KEY`` 計算，
+驗證時不需查詢資料庫。報到只執行一個以主鍵比對的條件式 ``UPDATE``：掛號仍為「已預約」、
+看診日期與 QR code 相同（改期後舊的 QR code 自然失效），支援 ``RETURNING`` 時同一次往返取回號碼。
+"""
+
+from __future__ import annotations
+
+import base64
+import datetime
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .calling import supports_update_returning
+from .models import Appointment, AppointmentEventLog, DoctorSchedule
+
+
+SALT = "registrations.kiosk"
+# 128 位元的 HMAC 已足夠，截短讓 QR code 維持在較小的版本。
+DIGEST_BYTES = 16
+
+
+class KioskError(Exception):
+    """無法報到；訊息可直接顯示在報到機上。"""
+
+
+@dataclass(frozen=True)
+class Receipt:
+    appointment_id: int
+    queue_number: int
+    date: datetime.date
+    already_checked_in: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            "appointment_id": self.appointment_id,
+            "queue_number": self.queue_number,
+            "date": self.date.isoformat(),
+            "already_checked_in": self.already_checked_in,
+        }
+
+
+def _digest(value: str) -> str:
+    mac = salted_hmac(SALT, value, algorithm="sha256").digest()[:DIGEST_BYTES]
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode()
+
+
+def make_token(appointment_id: int, date: datetime.date) -> str:
+    value = f"{appointment_id}.{date:%Y%m%d}"
+    return f"{value}.{_digest(value)}"
+
+
+def read_token(token: str) -> tuple[int, datetime.date]:
+    """驗證 QR code 並回傳（掛號編號、看診日期），不查詢資料庫。"""
+
+    try:
+        appointment_id, raw_date, digest = token.strip().split(".")
+        date = datetime.datetime.strptime(raw_date, "%Y%m%d").date()
+        appointment_id = int(appointment_id)
+    except ValueError as exc:
+        raise KioskError("無法辨識的報到條碼。") from exc
+    if not constant_time_compare(digest, _digest(f"{appointment_id}.{raw_date}")):
+        raise KioskError("無法辨識的報到條碼。")
+    return appointment_id, date
+
+
+def _update_returning(appointment_id: int, date: datetime.date, now) -> int | None:
+    appointments = connection.ops.quote_name(Appointment._meta.db_table)
+    schedules = connection.ops.quote_name(DoctorSchedule._meta.db_table)
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+    sql = f"""
+        UPDATE {appointments}
+        SET status = %s, check_in_at = %s, updated_at = %s
+        WHERE id = %s
+          AND status = %s
+          AND EXISTS (SELECT 1 FROM {schedules} s WHERE s.id = {appointments}.schedule_id AND s.date = %s)
+        RETURNING queue_number
+    """
+    params = [
+        Appointment.Status.CHECKED_IN,
+        timestamp,
+        timestamp,
+        appointment_id,
+        Appointment.Status.RESERVED,
+        connection.ops.adapt_datefield_value(date),
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _update_then_read(appointment_id: int, date: datetime.date, now) -> int | None:
+    updated = Appointment.objects.filter(
+        pk=appointment_id, status=Appointment.Status.RESERVED, schedule__date=date
+    ).update(status=Appointment.Status.CHECKED_IN, check_in_at=now, updated_at=now)
+    if not updated:
+        return None
+    return Appointment.objects.filter(pk=appointment_id).values_list("queue_number", flat=True).first()
+
+
+def check_in(token: str, *, today: datetime.date | None = None) -> Receipt:
+    appointment_id, date = read_token(token)
+    if date != (today or timezone.localdate()):
+        raise KioskError("僅能於看診當日報到。")
+    now = timezone.now()
+    update = _update_returning if supports_update_returning() else _update_then_read
+    with transaction.atomic():
+        queue_number = update(appointment_id, date, now)
+        if queue_number is not None:
+            AppointmentEventLog.objects.create(
+                appointment_id=appointment_id,
+                event=AppointmentEventLog.Event.CHECKED_IN,
+                payload={"source": "kiosk"},
+            )
+            return Receipt(appointment_id, queue_number, date)
+
+    # 沒有更新任何資料列時才查詢原因；重複掃描已報到的掛號回傳相同的收據。
+    row = (
+        Appointment.objects.filter(pk=appointment_id, schedule__date=date)
+        .values_list("status", "queue_number")
+        .first()
+    )
+    if row is None:
+        raise KioskError("找不到今日的掛號，請洽櫃檯。")
+    status, queue_number = row
+    if status == Appointment.Status.CHECKED_IN:
+        return Receipt(appointment_id, queue_number, date, already_checked_in=True)
+    if status == Appointment.Status.CANCELLED:
+        raise KioskError("此掛號已取消，請洽櫃檯。")
+    raise KioskError("此掛號已開始或完成看診。")
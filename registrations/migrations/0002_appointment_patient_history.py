@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_patient_search_index'),
+        ('registrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='appointment_patient_history'),
+        ),
+    ]
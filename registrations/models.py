@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from clinics.models import Department
 from patients.models import FamilyMember, Patient
@@ -31,6 +33,46 @@ class Doctor(models.Model):
         return f"{self.user.display_name} / {self.department.name}"
 
 
+class DoctorScheduleQuerySet(models.QuerySet):
+    def with_active_counts(self):
+        """以單一查詢附上未取消掛號數，避免逐列呼叫 ``capacity_used``。"""
+
+        return self.annotate(
+            active_appointments_count=models.Count(
+                "appointments",
+                filter=~models.Q(appointments__status=Appointment.Status.CANCELLED),
+            )
+        )
+
+    def with_active_counts_subquery(self):
+        """與 ``with_active_counts`` 相同，但以相關子查詢計算。
+
+        不需 GROUP BY，分頁的計數查詢會略過這個欄位，只有實際取出的列才會計算。
+        """
+
+        active = (
+            Appointment.objects.filter(schedule=models.OuterRef("pk"))
+            .exclude(status=Appointment.Status.CANCELLED)
+            .order_by()
+            .values("schedule")
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        )
+        return self.annotate(
+            active_appointments_count=Coalesce(models.Subquery(active), 0, output_field=models.IntegerField())
+        )
+
+    def bookable(self):
+        """仍開放掛號且尚有名額的班表，並在同一查詢附上剩餘名額 ``remaining``。"""
+
+        return (
+            self.filter(status__in=[DoctorSchedule.Status.OPEN, DoctorSchedule.Status.CLOSED])
+            .with_active_counts()
+            .annotate(remaining=models.F("quota") - models.F("active_appointments_count"))
+            .filter(remaining__gt=0)
+        )
+
+
 class DoctorSchedule(models.Model):
     class Session(models.TextChoices):
         MORNING = "morning", "上午"
@@ -54,6 +96,8 @@ class DoctorSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DoctorScheduleQuerySet.as_manager()
+
     class Meta:
         verbose_name = "班表"
         verbose_name_plural = "班表"
@@ -65,6 +109,12 @@ class DoctorSchedule(models.Model):
 
     @property
     def capacity_used(self) -> int:
+        annotated = getattr(self, "active_appointments_count", None)
+        if annotated is not None:
+            return annotated
+        prefetched = getattr(self, "_prefetched_objects_cache", {}).get("appointments")
+        if prefetched is not None:
+            return sum(1 for item in prefetched if item.status != Appointment.Status.CANCELLED)
         return self.appointments.exclude(status=Appointment.Status.CANCELLED).count()
 
     def next_queue_number(self) -> int:
@@ -77,6 +127,21 @@ class DoctorSchedule(models.Model):
         return max(self.quota - self.capacity_used, 0)
 
 
+class AppointmentQuerySet(models.QuerySet):
+    def _upcoming_condition(self, today=None) -> models.Q:
+        return models.Q(schedule__date__gte=today or timezone.localdate(), status__in=Appointment.UPCOMING_STATUSES)
+
+    def upcoming(self, today=None):
+        """今日起尚未看診完成的掛號，依門診日期排序；每位病患通常只有幾筆。"""
+
+        return self.filter(self._upcoming_condition(today)).order_by("schedule__date", "schedule__session", "queue_number")
+
+    def history(self, today=None):
+        """``upcoming`` 以外的掛號，依建立時間由新到舊，搭配 ``(created_at, id)`` 游標分頁。"""
+
+        return self.exclude(self._upcoming_condition(today)).order_by(*Appointment.HISTORY_ORDERING)
+
+
 class Appointment(models.Model):
     class Status(models.TextChoices):
         RESERVED = "reserved", "已預約"
@@ -103,11 +168,20 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    UPCOMING_STATUSES = (Status.RESERVED, Status.CHECKED_IN, Status.IN_PROGRESS)
+    HISTORY_ORDERING = ("-created_at", "-pk")
+
+    objects = AppointmentQuerySet.as_manager()
+
     class Meta:
         verbose_name = "掛號"
         verbose_name_plural = "掛號"
         unique_together = ("schedule", "queue_number")
         ordering = ["schedule", "queue_number"]
+        indexes = [
+            # 病患掛號紀錄依 (created_at, id) 游標分頁，每頁都是索引上的一段範圍掃描。
+            models.Index(fields=["patient", "-created_at", "-id"], name="appointment_patient_history"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.schedule} #{self.queue_number}"
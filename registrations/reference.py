@@ -0,0 +1,183 @@
+"""科別與醫師的參考資料快取。
+
+這兩類資料一個月只異動幾次，卻出現在幾乎每個表單的下拉選單中。
+資料以版本號（``hospital.cache``）控管：Department、Doctor 與醫師帳號姓名異動時
+由 ``registrations.signals`` 遞增版本；讀取時先比對行程內記住的版本，
+相同就直接使用，不同才從共用快取或資料庫重新載入。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from django import forms
+from django.core.cache import cache
+from django.utils.choices import BaseChoiceIterator
+
+from clinics.models import Department
+from hospital.cache import bump_version, get_version, pending_bump, record
+
+from .models import Doctor
+
+
+NAMESPACE = "reference"
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class DepartmentEntry:
+    pk: int
+    code: str
+    name: str
+    description: str
+    is_active: bool
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass(frozen=True)
+class DoctorEntry:
+    pk: int
+    name: str
+    department_id: int
+    department_name: str
+    title: str
+    is_active: bool
+
+    @property
+    def label(self) -> str:
+        return f"{self.name} / {self.department_name}"
+
+    def __str__(self) -> str:
+        return self.label
+
+
+def _load_departments() -> tuple[DepartmentEntry, ...]:
+    return tuple(
+        DepartmentEntry(pk=pk, code=code, name=name, description=description, is_active=is_active)
+        for pk, code, name, description, is_active in Department.objects.order_by("name").values_list(
+            "pk", "code", "name", "description", "is_active"
+        )
+    )
+
+
+def _load_doctors() -> tuple[DoctorEntry, ...]:
+    return tuple(
+        DoctorEntry(
+            pk=doctor.pk,
+            name=doctor.user.display_name,
+            department_id=doctor.department_id,
+            department_name=doctor.department.name,
+            title=doctor.title,
+            is_active=doctor.is_active,
+        )
+        for doctor in Doctor.objects.select_related("user", "department").order_by(
+            "department__name", "user__last_name"
+        )
+    )
+
+
+_LOADERS: dict[str, Callable[[], tuple]] = {
+    "departments": _load_departments,
+    "doctors": _load_doctors,
+}
+# 行程內記住最近一次載入的版本與資料；整個 tuple 一次替換，多執行緒讀取不需加鎖。
+_memo: dict[str, tuple[int, tuple]] = {}
+
+
+def _get(kind: str) -> tuple:
+    pending = pending_bump(NAMESPACE)
+    if pending is not None:
+        # 同一交易異動過參考資料且尚未提交：只記在這個交易內，不寫入共用快取與行程內記憶。
+        if kind not in pending.memo:
+            pending.memo[kind] = _LOADERS[kind]()
+        return pending.memo[kind]
+    version = get_version(NAMESPACE)
+    memoized = _memo.get(kind)
+    if memoized is not None and memoized[0] == version:
+        record(NAMESPACE, hit=True)
+        return memoized[1]
+    key = f"{NAMESPACE}:{version}:{kind}"
+    entries = cache.get(key)
+    record(NAMESPACE, hit=entries is not None)
+    if entries is None:
+        entries = _LOADERS[kind]()
+        cache.set(key, entries, CACHE_TIMEOUT)
+    _memo[kind] = (version, entries)
+    return entries
+
+
+def invalidate() -> None:
+    bump_version(NAMESPACE)
+
+
+def departments(*, active_only: bool = False) -> list[DepartmentEntry]:
+    return [entry for entry in _get("departments") if entry.is_active or not active_only]
+
+
+def doctors(
+    *,
+    active_only: bool = False,
+    department_id: int | str | None = None,
+    include: Iterable[int] = (),
+) -> list[DoctorEntry]:
+    """依科別、醫師姓氏排序的醫師清單；``include`` 中的醫師即使停用也保留（編輯既有班表時使用）。"""
+
+    include = set(include)
+    try:
+        department_id = int(department_id) if department_id not in (None, "") else None
+    except (TypeError, ValueError):
+        return []
+    return [
+        entry
+        for entry in _get("doctors")
+        if (entry.is_active or not active_only or entry.pk in include)
+        and (department_id is None or entry.department_id == department_id)
+    ]
+
+
+def doctor(pk: int | str) -> DoctorEntry | None:
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return next((entry for entry in _get("doctors") if entry.pk == pk), None)
+
+
+def department_choices(*, active_only: bool = False) -> list[tuple[int, str]]:
+    return [(entry.pk, entry.name) for entry in departments(active_only=active_only)]
+
+
+def doctor_choices(**filters) -> list[tuple[int, str]]:
+    return [(entry.pk, entry.label) for entry in doctors(**filters)]
+
+
+class ReferenceChoiceIterator(BaseChoiceIterator):
+    def __init__(self, field: ReferenceChoiceField):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        yield from self.field.load_choices()
+
+    def __len__(self):
+        return len(self.field.load_choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.load_choices())
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """選項來自參考資料快取的 ``ModelChoiceField``。
+
+    顯示下拉選單不需查詢資料庫；送出時仍以 ``queryset`` 驗證並取得模型物件，行為與原本相同。
+    """
+
+    iterator = ReferenceChoiceIterator
+
+    def __init__(self, queryset, *, choices: Callable[[], list[tuple[int, str]]], **kwargs):
+        self.load_choices = choices
+        super().__init__(queryset, **kwargs)
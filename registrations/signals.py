@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from clinics.models import Department
+
+from . import availability, reference
+from .models import Appointment, Doctor, DoctorSchedule
+
+
+# 醫師下拉選單顯示帳號姓名，姓名異動時也要讓參考資料失效。
+DOCTOR_USER_FIELDS = {"first_name", "last_name", "username"}
+# 只異動這些欄位時，班表仍屬於同一科別，可只更新名額索引中的一筆。
+SCHEDULE_SLOT_FIELDS = {"status", "quota", "open_at", "close_at", "clinic_room", "updated_at"}
+
+
+@receiver([post_save, post_delete], sender=Department, dispatch_uid="registrations.department_reference")
+@receiver([post_save, post_delete], sender=Doctor, dispatch_uid="registrations.doctor_reference")
+def invalidate_reference(sender, raw=False, **kwargs):
+    if not raw:
+        reference.invalidate()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid="registrations.doctor_user_reference")
+def invalidate_doctor_user(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    if raw or created or getattr(instance, "role", "") != "doctor":
+        return
+    if update_fields is None or not DOCTOR_USER_FIELDS.isdisjoint(update_fields):
+        reference.invalidate()
+
+
+@receiver(post_save, sender=Appointment, dispatch_uid="registrations.appointment_availability")
+def refresh_availability(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    # 報到、看診等狀態轉換不影響名額，只有新掛號與取消需要更新。
+    if raw:
+        return
+    cancelled = instance.status == Appointment.Status.CANCELLED and (
+        update_fields is None or "status" in update_fields
+    )
+    if created or cancelled:
+        transaction.on_commit(lambda: availability.refresh_schedule(instance.schedule_id))
+
+
+@receiver(post_delete, sender=Appointment, dispatch_uid="registrations.appointment_delete_availability")
+def refresh_availability_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability.refresh_schedule(instance.schedule_id))
+
+
+@receiver(post_save, sender=DoctorSchedule, dispatch_uid="registrations.schedule_availability")
+def refresh_schedule_availability(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created or (update_fields is not None and set(update_fields) <= SCHEDULE_SLOT_FIELDS):
+        transaction.on_commit(lambda: availability.refresh_schedule(instance.pk))
+    else:
+        # 可能更換了醫師（科別），整份重建。
+        availability.invalidate()
+
+
+@receiver(post_delete, sender=DoctorSchedule, dispatch_uid="registrations.schedule_delete_availability")
+@receiver([post_save, post_delete], sender=Doctor, dispatch_uid="registrations.doctor_availability")
+def invalidate_availability(sender, raw=False, **kwargs):
+    if not raw:
+        availability.invalidate()
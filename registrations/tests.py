@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import calendar
 import datetime
+from unittest import mock
 
 from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 
 from accounts.models import User
 from clinics.models import Department
-from patients.models import Patient
+from patients.models import FamilyMember, Patient
+from registrations import availability, board, calling, kiosk, reference
+from registrations.forms import ClinicStatusFilterForm
 from registrations.models import Appointment, AppointmentEventLog, Doctor, DoctorSchedule
+from registrations.views import StaffDashboardView, StaffSchedulePickerView
+from system.testing import QueryBudgetTestCase
 
 
 class DoctorWorkflowTests(TestCase):
@@ -110,6 +118,30 @@ class DoctorWorkflowTests(TestCase):
             ).exists()
         )
 
+    def test_call_next_repeated_click_is_idempotent(self):
+        Appointment.objects.filter(pk=self.reserved_appt.pk).update(status=Appointment.Status.CHECKED_IN)
+        url = reverse("registrations:doctor-call-next")
+        data = {"schedule_id": self.schedule.pk, "click_token": "click-1"}
+        self.client.post(url, data)
+        response = self.client.post(url, data, follow=True)
+        self.assertTrue(any("#1" in str(message) for message in get_messages(response.wsgi_request)))
+        self.reserved_appt.refresh_from_db()
+        self.assertEqual(self.reserved_appt.status, Appointment.Status.CHECKED_IN)
+        self.assertEqual(AppointmentEventLog.objects.filter(event=AppointmentEventLog.Event.CALLED).count(), 1)
+
+        # 不同的點擊在前一位看診完成前仍不會叫出下一位
+        response = self.client.post(url, {**data, "click_token": "click-2"}, follow=True)
+        self.assertTrue(any("正在看診中" in str(message) for message in get_messages(response.wsgi_request)))
+
+    def test_call_next_without_update_returning(self):
+        Appointment.objects.filter(pk=self.reserved_appt.pk).update(status=Appointment.Status.CHECKED_IN)
+        with mock.patch.object(calling, "supports_update_returning", return_value=False):
+            called = calling.call_next(self.schedule.pk, actor=self.doctor_user)
+            self.assertEqual(called, calling.CalledPatient(self.checked_in_appt.pk, 1))
+            self.assertIsNone(calling.call_next(self.schedule.pk, actor=self.doctor_user))
+        self.checked_in_appt.refresh_from_db()
+        self.assertEqual(self.checked_in_appt.status, Appointment.Status.IN_PROGRESS)
+
     def test_call_next_requires_checked_in_patient(self):
         # 標記為未報到狀態
         Appointment.objects.filter(pk=self.checked_in_appt.pk).update(
@@ -160,3 +192,667 @@ class DoctorWorkflowTests(TestCase):
         events = AppointmentEventLog.objects.order_by("event")
         self.assertEqual(events.count(), 2)
         self.assertEqual({event.event for event in events}, {AppointmentEventLog.Event.COMPLETED, AppointmentEventLog.Event.CANCELLED})
+
+
+class ReferenceDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(code="NEU", name="神經科")
+        user = User.objects.create_user(username="ref-doc", role=User.Role.DOCTOR, first_name="明", last_name="李")
+        cls.doctor = Doctor.objects.create(user=user, department=cls.department, license_number="REF-001")
+
+    def test_choices_render_from_cache(self):
+        ClinicStatusFilterForm().as_p()
+        with self.assertNumQueries(0):
+            html = ClinicStatusFilterForm().as_p()
+        self.assertIn("神經科", html)
+        self.assertIn("明 李 / 神經科", html)
+
+    def test_bound_form_still_validates_against_database(self):
+        form = ClinicStatusFilterForm({"department": self.department.pk, "doctor": self.doctor.pk})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["doctor"], self.doctor)
+
+    def test_signals_invalidate_reference_data(self):
+        self.assertIn((self.department.pk, "神經科"), reference.department_choices())
+        self.department.name = "神經內科"
+        self.department.save()
+        self.assertIn((self.department.pk, "神經內科"), reference.department_choices())
+
+        self.doctor.user.first_name = "大明"
+        self.doctor.user.save(update_fields=["first_name"])
+        self.assertEqual(reference.doctors()[0].name, "大明 李")
+
+        self.doctor.is_active = False
+        self.doctor.save()
+        self.assertEqual(reference.doctor_choices(active_only=True), [])
+        self.assertEqual(len(reference.doctors(active_only=True, include=[self.doctor.pk])), 1)
+
+    def test_rolled_back_changes_are_not_cached(self):
+        reference.department_choices()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Department.objects.filter(pk=self.department.pk).update(name="暫時名稱")
+            Department.objects.get(pk=self.department.pk).save()
+            # 同一交易內看得到尚未提交的名稱
+            self.assertIn((self.department.pk, "暫時名稱"), reference.department_choices())
+            raise RuntimeError
+        self.assertIn((self.department.pk, "神經科"), reference.department_choices())
+
+
+class AvailabilityIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 班表異動在提交後才確定寫入快取，這裡模擬已提交的資料。
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.department = Department.objects.create(code="ENT", name="耳鼻喉科")
+            user = User.objects.create_user(username="ent-doc", role=User.Role.DOCTOR, first_name="華", last_name="陳")
+            cls.doctor = Doctor.objects.create(user=user, department=cls.department, license_number="ENT-001")
+            other_user = User.objects.create_user(username="ent-doc2", role=User.Role.DOCTOR, first_name="安", last_name="吳")
+            cls.other_doctor = Doctor.objects.create(user=other_user, department=cls.department, license_number="ENT-002")
+            today = timezone.localdate()
+            cls.evening = DoctorSchedule.objects.create(
+                doctor=cls.doctor, date=today + datetime.timedelta(days=1), session=DoctorSchedule.Session.EVENING, quota=1
+            )
+            cls.morning = DoctorSchedule.objects.create(
+                doctor=cls.doctor, date=today + datetime.timedelta(days=1), session=DoctorSchedule.Session.MORNING, quota=2
+            )
+            cls.later = DoctorSchedule.objects.create(
+                doctor=cls.other_doctor, date=today + datetime.timedelta(days=3), session=DoctorSchedule.Session.AFTERNOON
+            )
+            patient_user = User.objects.create_user(username="ent-patient", role=User.Role.PATIENT)
+            cls.patient = Patient.objects.create(
+                user=patient_user,
+                national_id="F123456789",
+                medical_record_number="MRN9001",
+                birth_date=datetime.date(1985, 5, 5),
+                phone="0955000555",
+            )
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            availability.invalidate()
+
+    def test_slots_ordered_by_date_and_session(self):
+        slots = availability.next_available(department_id=self.department.pk)
+        self.assertEqual([slot.schedule_id for slot in slots], [self.morning.pk, self.evening.pk, self.later.pk])
+        with self.assertNumQueries(0):
+            availability.next_available(department_id=self.department.pk)
+        slots = availability.next_available(doctor_id=self.other_doctor.pk)
+        self.assertEqual([slot.schedule_id for slot in slots], [self.later.pk])
+
+    def test_booking_and_cancellation_update_single_slot(self):
+        availability.next_available(department_id=self.department.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(schedule=self.evening, patient=self.patient, queue_number=1)
+        with self.assertNumQueries(0):
+            slots = availability.next_available(department_id=self.department.pk)
+        # 額滿的班表從索引移除
+        self.assertNotIn(self.evening.pk, [slot.schedule_id for slot in slots])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(schedule=self.morning, patient=self.patient, queue_number=1)
+        self.assertEqual(availability.next_available(department_id=self.department.pk, limit=1)[0].remaining, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = Appointment.Status.CANCELLED
+            appointment.save(update_fields=["status", "updated_at"])
+        slots = availability.next_available(department_id=self.department.pk)
+        self.assertEqual([slot.schedule_id for slot in slots], [self.morning.pk, self.evening.pk, self.later.pk])
+
+    def test_contended_refresh_drops_only_that_department(self):
+        availability.next_available(department_id=self.department.pk)
+        other = Department.objects.create(code="DER", name="皮膚科")
+        availability.department_slots(other.pk)
+        today = timezone.localdate()
+        lock = f"{availability._key(self.department.pk, today)}:lock"
+        cache.add(lock, 1)
+        self.addCleanup(cache.delete, lock)
+        availability.refresh_schedule(self.evening.pk)
+        self.assertIsNone(cache.get(availability._key(self.department.pk, today)))
+        self.assertIsNotNone(cache.get(availability._key(other.pk, today)))
+
+    def test_schedule_status_change_removes_slot(self):
+        availability.next_available(department_id=self.department.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.later.status = DoctorSchedule.Status.PAUSED
+            self.later.save(update_fields=["status", "updated_at"])
+        slots = availability.next_available(department_id=self.department.pk)
+        self.assertNotIn(self.later.pk, [slot.schedule_id for slot in slots])
+
+    def test_next_available_endpoint(self):
+        self.client.force_login(self.patient.user)
+        url = reverse("patients:next-available")
+        results = self.client.get(f"{url}?doctor={self.doctor.pk}&limit=1").json()["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["schedule_id"], self.morning.pk)
+        self.assertEqual(results[0]["session_label"], "上午")
+        self.assertEqual(results[0]["booking_url"], reverse("patients:appointment-book", args=[self.morning.pk]))
+        self.assertEqual(self.client.get(url).json()["results"], [])
+
+    def test_month_calendar_aggregates_sessions(self):
+        day = self.morning.date
+        with self.assertNumQueries(1):
+            month = availability.month_calendar(self.department.pk, day)
+        entry = month.days[day]
+        self.assertEqual(
+            [(item.session, item.total, item.remaining) for item in entry.sessions],
+            [("morning", 2, 2), ("evening", 1, 1)],
+        )
+        self.assertEqual(entry.level, "open")
+        cells = [cell for week in month.weeks for cell in week if cell is not None]
+        self.assertEqual(len(cells), calendar.monthrange(day.year, day.month)[1])
+        with self.assertNumQueries(0):
+            availability.month_calendar(self.department.pk, day)
+
+        # 掛號後刪除該月快取，重新彙總時反映剩餘名額
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(schedule=self.evening, patient=self.patient, queue_number=1)
+        entry = availability.month_calendar(self.department.pk, day).days[day]
+        self.assertEqual((entry.total, entry.remaining), (3, 2))
+        self.assertEqual(entry.level, "open")
+
+    def test_month_calendar_levels(self):
+        day = self.morning.date
+        with self.captureOnCommitCallbacks(execute=True):
+            self.morning.status = DoctorSchedule.Status.CLOSED
+            self.morning.save(update_fields=["status", "updated_at"])
+            Appointment.objects.create(schedule=self.evening, patient=self.patient, queue_number=1)
+        entry = availability.month_calendar(self.department.pk, day).days[day]
+        # 手動關閉的班表仍計入總名額，但不算剩餘名額
+        self.assertEqual((entry.total, entry.remaining, entry.level), (3, 0, "full"))
+
+    def test_calendar_pages(self):
+        self.client.force_login(self.patient.user)
+        month = self.morning.date.strftime("%Y-%m")
+        url = reverse("patients:availability-calendar-data")
+        data = self.client.get(f"{url}?department={self.department.pk}&month={month}").json()
+        self.assertEqual(data["month"], month)
+        day = next(item for item in data["days"] if item["date"] == self.morning.date.isoformat())
+        self.assertEqual(day["total"], 3)
+        self.assertEqual([item["session_label"] for item in day["sessions"]], ["上午", "夜間"])
+        self.assertEqual(self.client.get(f"{url}?month={month}").status_code, 400)
+
+        response = self.client.get(
+            f"{reverse('patients:availability-calendar')}?department={self.department.pk}&month={month}"
+        )
+        self.assertContains(response, "上午 2/2")
+
+        admin = User.objects.create_user(username="calendar-admin", role=User.Role.ADMIN)
+        self.client.force_login(admin)
+        response = self.client.get(
+            f"{reverse('administration:schedules-calendar')}?department={self.department.pk}&month={month}"
+        )
+        self.assertContains(response, "夜間 1/1")
+
+
+class BulkAppointmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(code="DER", name="皮膚科")
+        user = User.objects.create_user(username="der-doc", role=User.Role.DOCTOR)
+        cls.doctor = Doctor.objects.create(user=user, department=department, license_number="DER-001")
+        cls.staff_user = User.objects.create_user(username="bulk-staff", role=User.Role.STAFF)
+        today = timezone.localdate()
+        cls.schedule = DoctorSchedule.objects.create(doctor=cls.doctor, date=today, session=DoctorSchedule.Session.MORNING)
+        cls.target = DoctorSchedule.objects.create(
+            doctor=cls.doctor, date=today + datetime.timedelta(days=1), session=DoctorSchedule.Session.MORNING, quota=2
+        )
+        cls.patients = []
+        cls.appointments = []
+        for index in range(4):
+            patient_user = User.objects.create_user(username=f"bulk-patient-{index}", role=User.Role.PATIENT)
+            patient = Patient.objects.create(
+                user=patient_user,
+                national_id=f"G10000000{index}",
+                medical_record_number=f"MRN80{index:02d}",
+                birth_date=datetime.date(1990, 1, 1),
+                phone=f"09770000{index:02d}",
+            )
+            cls.patients.append(patient)
+            cls.appointments.append(
+                Appointment.objects.create(schedule=cls.schedule, patient=patient, queue_number=index + 1)
+            )
+        Appointment.objects.filter(pk=cls.appointments[3].pk).update(status=Appointment.Status.CANCELLED)
+
+    def setUp(self):
+        self.client.force_login(self.staff_user)
+        self.url = reverse("registrations:staff-appointment-bulk")
+
+    def test_check_in_mixes_ids_and_medical_record_numbers(self):
+        first, second, _, cancelled = self.appointments
+        identifiers = f"{first.pk}\n{self.patients[1].medical_record_number.lower()}, {cancelled.pk} 999999 {first.pk}"
+        # session、使用者、一次載入、一個 UPDATE、一次 bulk_create，另加 savepoint，不隨筆數增加。
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, {"action": "check_in", "identifiers": identifiers})
+        data = response.json()
+        self.assertEqual(data["updated"], 2)
+        self.assertEqual(sorted(data["appointment_ids"]), sorted([first.pk, second.pk]))
+        self.assertEqual([item["identifier"] for item in data["skipped"]], [str(cancelled.pk), "999999"])
+        self.assertEqual(
+            set(Appointment.objects.filter(status=Appointment.Status.CHECKED_IN).values_list("pk", flat=True)),
+            {first.pk, second.pk},
+        )
+        self.assertEqual(AppointmentEventLog.objects.filter(event=AppointmentEventLog.Event.CHECKED_IN).count(), 2)
+
+        # 已報到的掛號再次送出只會被略過
+        data = self.client.post(self.url, {"action": "check_in", "identifiers": str(first.pk)}).json()
+        self.assertEqual(data["updated"], 0)
+        self.assertIn("已報到", data["skipped"][0]["reason"])
+
+    def test_cancel_refreshes_availability(self):
+        availability.invalidate()
+        availability.department_slots(self.doctor.department_id)
+        identifiers = " ".join(str(item.pk) for item in self.appointments[:3])
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.client.post(self.url, {"action": "cancel", "identifiers": identifiers}).json()
+        self.assertEqual(data["updated"], 3)
+        self.assertFalse(self.schedule.appointments.exclude(status=Appointment.Status.CANCELLED).exists())
+        slot = next(slot for slot in availability.department_slots(self.doctor.department_id) if slot.schedule_id == self.schedule.pk)
+        self.assertEqual(slot.remaining, self.schedule.quota)
+
+    def test_reschedule_respects_target_capacity(self):
+        identifiers = " ".join(str(item.pk) for item in self.appointments[:3])
+        data = self.client.post(
+            self.url, {"action": "reschedule", "identifiers": identifiers, "target_schedule": self.target.pk}
+        ).json()
+        self.assertEqual(data["updated"], 2)
+        self.assertEqual(data["skipped"], [{"identifier": str(self.appointments[2].pk), "reason": "目標時段名額不足"}])
+        moved = list(self.target.appointments.order_by("queue_number").values_list("pk", "queue_number"))
+        self.assertEqual(moved, [(self.appointments[0].pk, 1), (self.appointments[1].pk, 2)])
+        event = AppointmentEventLog.objects.get(appointment=self.appointments[0], event=AppointmentEventLog.Event.SYSTEM)
+        self.assertEqual(event.payload["to_schedule"], self.target.pk)
+
+    def test_dashboard_bulk_tab(self):
+        response = self.client.get(f"{reverse('registrations:staff-dashboard')}?mode=bulk")
+        self.assertContains(response, self.url)
+        self.assertIn("bulk_form", response.context)
+
+    def test_invalid_requests(self):
+        response = self.client.post(self.url, {"action": "reschedule", "identifiers": "1"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, {"action": "check_in", "identifiers": " , "})
+        self.assertIn("identifiers", response.json()["errors"])
+
+
+class KioskCheckInTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(code="OPH", name="眼科")
+        user = User.objects.create_user(username="oph-doc", role=User.Role.DOCTOR)
+        doctor = Doctor.objects.create(user=user, department=department, license_number="OPH-001")
+        cls.today = timezone.localdate()
+        cls.schedule = DoctorSchedule.objects.create(doctor=doctor, date=cls.today, session=DoctorSchedule.Session.MORNING)
+        patient_user = User.objects.create_user(username="oph-patient", role=User.Role.PATIENT)
+        patient = Patient.objects.create(
+            user=patient_user,
+            national_id="H123456789",
+            medical_record_number="MRN7001",
+            birth_date=datetime.date(1980, 3, 3),
+            phone="0966000666",
+        )
+        cls.appointment = Appointment.objects.create(schedule=cls.schedule, patient=patient, queue_number=7)
+
+    def setUp(self):
+        self.url = reverse("registrations:kiosk-check-in")
+        self.token = kiosk.make_token(self.appointment.pk, self.today)
+
+    def _scan(self, token, **headers):
+        return self.client.post(self.url, {"token": token}, headers={"accept": "application/json", **headers})
+
+    def test_token_verified_without_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(kiosk.read_token(self.token), (self.appointment.pk, self.today))
+        tampered = self.token.replace(f"{self.appointment.pk}.", f"{self.appointment.pk + 1}.", 1)
+        for token in (tampered, "garbage", ""):
+            with self.subTest(token=token), self.assertRaises(kiosk.KioskError):
+                kiosk.read_token(token)
+
+    def test_check_in_is_single_update(self):
+        # 不讀取 session 與使用者：UPDATE ... RETURNING、事件紀錄，加上 savepoint。
+        with self.assertNumQueries(4):
+            response = self._scan(self.token)
+        self.assertEqual(response.json(), {
+            "appointment_id": self.appointment.pk,
+            "queue_number": 7,
+            "date": self.today.isoformat(),
+            "already_checked_in": False,
+        })
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, Appointment.Status.CHECKED_IN)
+        self.assertTrue(self.appointment.events.filter(event=AppointmentEventLog.Event.CHECKED_IN).exists())
+
+        # 重複掃描回傳相同號碼，不再寫入事件
+        self.assertTrue(self._scan(self.token).json()["already_checked_in"])
+        self.assertEqual(self.appointment.events.count(), 1)
+
+    def test_rejected_scans(self):
+        tomorrow = kiosk.make_token(self.appointment.pk, self.today + datetime.timedelta(days=1))
+        self.assertEqual(self._scan(tomorrow).json()["error"], "僅能於看診當日報到。")
+        Appointment.objects.filter(pk=self.appointment.pk).update(status=Appointment.Status.CANCELLED)
+        response = self._scan(self.token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("已取消", response.json()["error"])
+
+    def test_html_receipt_and_fallback_update(self):
+        with mock.patch.object(kiosk, "supports_update_returning", return_value=False):
+            response = self.client.post(self.url, {"token": self.token})
+        self.assertContains(response, "<strong>7</strong>", html=False)
+        self.assertContains(self.client.get(reverse("registrations:kiosk")), self.url)
+
+    def test_progress_page_shows_token(self):
+        self.client.force_login(self.appointment.patient.user)
+        response = self.client.get(reverse("patients:appointment-progress", args=[self.appointment.pk]))
+        self.assertEqual(response.context["kiosk_token"], self.token)
+        # QR code 產生程式隨站台發佈，不在含病患資料的頁面載入第三方腳本。
+        self.assertContains(response, "/static/vendor/qrcode/qrcode.js")
+        self.assertNotContains(response, '<script src="https://')
+
+
+class DisplayBoardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(code="PED", name="小兒科")
+        user = User.objects.create_user(username="ped-doc", role=User.Role.DOCTOR, first_name="明", last_name="林")
+        doctor = Doctor.objects.create(user=user, department=cls.department, license_number="PED-001")
+        cls.doctor_name = user.display_name
+        cls.schedule = DoctorSchedule.objects.create(
+            doctor=doctor, date=timezone.localdate(), session=DoctorSchedule.Session.MORNING, clinic_room="201"
+        )
+        statuses = [
+            Appointment.Status.COMPLETED,
+            Appointment.Status.IN_PROGRESS,
+            Appointment.Status.CHECKED_IN,
+            Appointment.Status.CHECKED_IN,
+            Appointment.Status.RESERVED,
+        ]
+        for number, status in enumerate(statuses, start=1):
+            patient_user = User.objects.create_user(username=f"ped-patient-{number}", role=User.Role.PATIENT)
+            patient = Patient.objects.create(
+                user=patient_user,
+                national_id=f"J20000000{number}",
+                medical_record_number=f"MRN60{number:02d}",
+                birth_date=datetime.date(2015, 1, 1),
+                phone=f"09880000{number:02d}",
+            )
+            Appointment.objects.create(schedule=cls.schedule, patient=patient, queue_number=number, status=status)
+
+    def setUp(self):
+        cache.clear()
+        reference.departments()
+        reference.doctors()
+        self.url = reverse("registrations:board-department-data", args=[self.department.pk])
+
+    def test_board_is_microcached_with_etag(self):
+        # 不讀取 session：只有一次彙總查詢
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        room = response.json()["rooms"][0]
+        self.assertEqual(
+            (room["room"], room["doctor"], room["current_number"], room["waiting"]), ("201", self.doctor_name, 2, 2)
+        )
+        self.assertIn("max-age=1", response.headers["Cache-Control"])
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, headers={"if-none-match": response.headers["ETag"]})
+        self.assertEqual(cached.status_code, 304)
+
+        page = self.client.get(reverse("registrations:board-department", args=[self.department.pk]))
+        self.assertContains(page, "小兒科叫號看板")
+        self.assertNotEqual(page.headers["ETag"], response.headers["ETag"])
+        self.assertEqual(self.client.get(reverse("registrations:board-department-data", args=[0])).status_code, 404)
+
+    def test_board_rejects_writes_without_cache_headers(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        for url in (self.url, reverse("registrations:board-department", args=[self.department.pk])):
+            with self.assertNumQueries(0):
+                response = self.client.post(url, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 405)
+            self.assertNotIn("ETag", response.headers)
+            self.assertNotIn("public", response.headers.get("Cache-Control", ""))
+        self.assertEqual(self.client.head(self.url, headers={"if-none-match": etag}).status_code, 304)
+
+    def test_single_flight_rebuild(self):
+        stale = board.get_board(self.department.pk)
+        Appointment.objects.filter(schedule=self.schedule, queue_number=3).update(status=Appointment.Status.IN_PROGRESS)
+        key = board._key(self.department.pk)
+        with mock.patch.object(board.time, "time", return_value=stale.built_at + board.FRESH_SECONDS + 1):
+            # 其他請求持有重建鎖時，沿用剛過期的看板而不查詢資料庫
+            cache.add(f"{key}:lock", 1)
+            with self.assertNumQueries(0):
+                self.assertEqual(board.get_board(self.department.pk).etag, stale.etag)
+            cache.delete(f"{key}:lock")
+            with self.assertNumQueries(1):
+                rebuilt = board.get_board(self.department.pk)
+        self.assertNotEqual(rebuilt.etag, stale.etag)
+        self.assertEqual(rebuilt.data["rooms"][0]["current_number"], 3)
+
+
+class StaffPageBudgetTests(QueryBudgetTestCase):
+    """櫃檯與門診狀態頁面在大量資料下的查詢數與回應時間上限。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff_user = User.objects.create_user(username="perf-staff", password="staff-pass", role=User.Role.STAFF)
+        cls.appointment = cls.patient.appointments.order_by("pk").first()
+        cls.open_schedule = (
+            DoctorSchedule.objects.exclude(appointments__patient=cls.patient).order_by("date", "pk").first()
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff_user)
+
+    def _dashboard_url(self):
+        return f"{reverse('registrations:staff-dashboard')}?identifier={self.patient.medical_record_number}"
+
+    def test_staff_dashboard(self):
+        self.assertGetWithinBudget(reverse("registrations:staff-dashboard"), max_queries=3)
+
+    def test_staff_dashboard_with_patient(self):
+        # 即將到來與歷史紀錄各一次查詢，歷史紀錄只取一頁。
+        response = self.assertGetWithinBudget(self._dashboard_url(), max_queries=6)
+        self.assertLessEqual(len(response.context["history_page"].object_list), StaffDashboardView.history_page_size)
+        # 門診時段改由挑選器載入，頁面只輸出空白選項。
+        self.assertEqual(len(response.context["appointment_form"]["schedule"].subwidgets), 1)
+
+    def test_bulk_check_in(self):
+        reserved = list(
+            Appointment.objects.filter(status=Appointment.Status.RESERVED).order_by("pk").values_list("pk", flat=True)[:30]
+        )
+        response = self.assertPostWithinBudget(
+            reverse("registrations:staff-appointment-bulk"),
+            {"action": "check_in", "identifiers": "\n".join(map(str, reserved))},
+            max_queries=7,
+            max_seconds=0.3,
+            status=200,
+        )
+        self.assertEqual(response.json()["updated"], len(reserved))
+
+    def test_schedule_picker(self):
+        url = reverse("registrations:staff-schedule-picker")
+        response = self.assertGetWithinBudget(url, max_queries=3, max_seconds=0.3)
+        data = response.json()
+        self.assertEqual(len(data["results"]), StaffSchedulePickerView.page_size)
+        self.assertTrue(data["has_next"])
+        self.assertTrue(all(item["remaining"] > 0 for item in data["results"]))
+
+        schedule = self.open_schedule
+        query = f"{url}?date={schedule.date}&doctor={schedule.doctor_id}&department={schedule.doctor.department_id}"
+        response = self.assertGetWithinBudget(query, max_queries=5, max_seconds=0.3)
+        results = response.json()["results"]
+        self.assertEqual({item["date"] for item in results}, {schedule.date.isoformat()})
+        self.assertIn(schedule.pk, [item["id"] for item in results])
+        expected = schedule.quota - schedule.capacity_used
+        self.assertEqual(next(item for item in results if item["id"] == schedule.pk)["remaining"], expected)
+
+        DoctorSchedule.objects.filter(pk=schedule.pk).update(quota=schedule.capacity_used)
+        results = self.client.get(query).json()["results"]
+        self.assertNotIn(schedule.pk, [item["id"] for item in results])
+        self.assertEqual(self.client.get(f"{url}?page=0").status_code, 400)
+
+    def test_patient_lookup(self):
+        url = reverse("registrations:staff-patient-lookup")
+        for term in (self.patient.medical_record_number, self.patient.national_id[:4], self.patient.phone[:5]):
+            response = self.assertGetWithinBudget(f"{url}?q={term}", max_queries=6, max_seconds=0.05)
+            results = response.json()["results"]
+            self.assertTrue(results)
+            self.assertLessEqual(len(results), 10)
+        response = self.client.get(f"{url}?q={self.patient.medical_record_number.lower()}")
+        self.assertEqual(response.json()["results"][0]["id"], self.patient.pk)
+
+    def test_patient_create(self):
+        self.assertPostWithinBudget(
+            reverse("registrations:staff-patient-create"),
+            {
+                "national_id": "E123456789",
+                "first_name": "小明",
+                "last_name": "王",
+                "phone_number": "0933000333",
+                "birth_date": "1980-03-03",
+                "password1": "init-pass",
+                "password2": "init-pass",
+            },
+            # 含一次病患搜尋索引寫入
+            max_queries=11,
+            max_seconds=2.0,
+        )
+
+    def test_patient_update(self):
+        self.assertPostWithinBudget(
+            reverse("registrations:staff-patient-update", args=[self.patient.pk]),
+            {
+                "national_id": self.patient.national_id,
+                "first_name": "更新",
+                "last_name": "林",
+                "phone_number": "0944000444",
+                "birth_date": "1970-01-01",
+            },
+            max_queries=10,
+        )
+
+    def test_onsite_appointment(self):
+        self.assertPostWithinBudget(
+            reverse("registrations:staff-appointment-create", args=[self.patient.pk]),
+            {"schedule": self.open_schedule.pk},
+            max_queries=13,
+        )
+
+    def test_check_in_and_cancel(self):
+        self.assertPostWithinBudget(
+            reverse("registrations:staff-appointment-check-in", args=[self.appointment.pk]),
+            max_queries=7,
+        )
+        self.assertPostWithinBudget(
+            reverse("registrations:staff-appointment-cancel", args=[self.appointment.pk]),
+            max_queries=7,
+        )
+
+    def test_clinic_status(self):
+        self.assertGetWithinBudget(reverse("registrations:clinic-status"), max_queries=6, max_seconds=3.0)
+
+
+class DoctorPageBudgetTests(QueryBudgetTestCase):
+    """醫師儀表板與叫號操作在大量資料下的查詢數與回應時間上限。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.schedule = DoctorSchedule.objects.get(doctor=cls.doctor, date=cls.seed.start_date)
+        cls.queue = list(cls.schedule.appointments.order_by("queue_number"))
+        Appointment.objects.filter(pk=cls.queue[0].pk).update(status=Appointment.Status.CHECKED_IN)
+
+    def setUp(self):
+        self.client.force_login(self.doctor.user)
+
+    def test_doctor_dashboard(self):
+        self.assertGetWithinBudget(reverse("registrations:doctor-dashboard"), max_queries=5)
+
+    def test_call_next(self):
+        # session、使用者與班表驗證之外，叫號只有一個條件式 UPDATE 與一筆事件（加上 savepoint）。
+        self.assertPostWithinBudget(
+            reverse("registrations:doctor-call-next"),
+            {"schedule_id": self.schedule.pk},
+            max_queries=7,
+        )
+
+    def test_complete_appointment(self):
+        Appointment.objects.filter(pk=self.queue[0].pk).update(status=Appointment.Status.IN_PROGRESS)
+        self.assertPostWithinBudget(
+            reverse("registrations:doctor-complete-appointment"),
+            {"appointment_id": self.queue[0].pk},
+            max_queries=7,
+        )
+
+    def test_end_schedule(self):
+        # 結束門診會逐筆處理當班所有掛號，查詢數隨名額成長但有上限。
+        self.assertPostWithinBudget(
+            reverse("registrations:doctor-schedule-action"),
+            {"schedule_id": self.schedule.pk, "action": "end"},
+            max_queries=10 + 3 * self.scale.quota,
+        )
+
+
+class AdminPageBudgetTests(QueryBudgetTestCase):
+    """後台大型資料表的列表、搜尋與外鍵自動完成。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin_user = User.objects.create_superuser(username="perf-admin", password="admin-pass")
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_changelists(self):
+        for model, max_queries in (
+            ("registrations/appointment", 6),
+            ("registrations/appointmenteventlog", 5),
+            ("registrations/doctorschedule", 8),
+            ("patients/patient", 5),
+            ("accounts/user", 5),
+        ):
+            with self.subTest(model=model):
+                self.assertGetWithinBudget(f"/admin/{model}/", max_queries=max_queries, max_seconds=0.5)
+
+    def test_schedule_changelist_annotates_capacity(self):
+        response = self.client.get("/admin/registrations/doctorschedule/")
+        schedules = list(response.context["cl"].result_list)
+        for schedule in schedules[:5]:
+            self.assertEqual(schedule.active_appointments_count, schedule.appointments.exclude(status="cancelled").count())
+
+    def test_search_uses_patient_lookup(self):
+        response = self.assertGetWithinBudget(
+            f"/admin/registrations/appointment/?q={self.patient.medical_record_number}", max_queries=8, max_seconds=0.5
+        )
+        appointments = list(response.context["cl"].result_list)
+        self.assertTrue(appointments)
+        self.assertEqual({appointment.patient_id for appointment in appointments}, {self.patient.pk})
+
+    def test_autocomplete(self):
+        url = reverse("admin:autocomplete")
+        response = self.assertGetWithinBudget(
+            f"{url}?app_label=registrations&model_name=appointment&field_name=patient&term={self.patient.national_id}",
+            max_queries=7,
+            max_seconds=0.3,
+        )
+        self.assertEqual([item["id"] for item in response.json()["results"]], [str(self.patient.pk)])
+
+    def test_search_keeps_declared_fields(self):
+        doctor_user = self.doctor.user
+        User.objects.filter(pk=doctor_user.pk).update(last_name="歐陽", email="ouyang.doctor@example.com")
+        for term in ("歐陽", "ouyang.doctor@example.com", doctor_user.username):
+            with self.subTest(term=term):
+                response = self.client.get("/admin/accounts/user/", {"q": term})
+                self.assertEqual(list(response.context["cl"].result_list), [doctor_user])
+
+        url = reverse("admin:autocomplete")
+        response = self.client.get(
+            url,
+            {"app_label": "registrations", "model_name": "doctor", "field_name": "user", "term": "歐陽"},
+        )
+        self.assertEqual([item["id"] for item in response.json()["results"]], [str(doctor_user.pk)])
+
+        member = FamilyMember.objects.create(
+            patient=self.patient, full_name="林小華", relationship="子女", national_id="C123456789"
+        )
+        response = self.client.get("/admin/patients/familymember/", {"q": "林小"})
+        self.assertEqual(list(response.context["cl"].result_list), [member])
@@ -2,22 +2,31 @@ from django.urls import path
 
 from .views import (
     ClinicStatusView,
+    DisplayBoardDataView,
+    DisplayBoardView,
     DoctorDashboardView,
     DoctorCallNextView,
     DoctorCompleteAppointmentView,
     DoctorScheduleActionView,
+    KioskCheckInView,
+    KioskView,
     StaffAppointmentCancelView,
     StaffAppointmentCheckInView,
+    StaffBulkAppointmentView,
     StaffDashboardView,
     StaffOnsiteAppointmentView,
     StaffPatientCreateView,
+    StaffPatientLookupView,
     StaffPatientUpdateView,
+    StaffSchedulePickerView,
 )
 
 app_name = "registrations"
 
 urlpatterns = [
     path("staff/dashboard/", StaffDashboardView.as_view(), name="staff-dashboard"),
+    path("staff/patients/lookup/", StaffPatientLookupView.as_view(), name="staff-patient-lookup"),
+    path("staff/schedules/picker/", StaffSchedulePickerView.as_view(), name="staff-schedule-picker"),
     path("staff/patients/create/", StaffPatientCreateView.as_view(), name="staff-patient-create"),
     path("staff/patients/<int:pk>/update/", StaffPatientUpdateView.as_view(), name="staff-patient-update"),
     path(
@@ -25,6 +34,7 @@ urlpatterns = [
         StaffOnsiteAppointmentView.as_view(),
         name="staff-appointment-create",
     ),
+    path("staff/appointments/bulk/", StaffBulkAppointmentView.as_view(), name="staff-appointment-bulk"),
     path(
         "staff/appointments/<int:pk>/check-in/",
         StaffAppointmentCheckInView.as_view(),
@@ -47,5 +57,11 @@ urlpatterns = [
         DoctorScheduleActionView.as_view(),
         name="doctor-schedule-action",
     ),
+    path("kiosk/", KioskView.as_view(), name="kiosk"),
+    path("kiosk/check-in/", KioskCheckInView.as_view(), name="kiosk-check-in"),
+    path("board/", DisplayBoardView.as_view(), name="board"),
+    path("board/data/", DisplayBoardDataView.as_view(), name="board-data"),
+    path("board/<int:department_id>/", DisplayBoardView.as_view(), name="board-department"),
+    path("board/<int:department_id>/data/", DisplayBoardDataView.as_view(), name="board-department-data"),
     path("clinic-status/", ClinicStatusView.as_view(), name="clinic-status"),
 ]
@@ -3,17 +3,26 @@ from __future__ import annotations
 import datetime
 from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
 from django import forms
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
-from django.db.models import Prefetch, Q
-from django.shortcuts import get_object_or_404, redirect
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
 
+from hospital.cache import record
+from hospital.pagination import KeysetPaginator
+from hospital.views import AsyncUserMixin
+from patients.lookup import find_patient, search_patients
 from patients.models import Patient
 
 from .forms import (
@@ -23,9 +32,12 @@ from .forms import (
     DoctorScheduleActionForm,
     OnsiteAppointmentForm,
     PatientLookupForm,
+    SchedulePickerFilterForm,
+    StaffBulkAppointmentForm,
     StaffPatientCreationForm,
     StaffPatientProfileForm,
 )
+from . import board, bulk, calling, kiosk, reference
 from .models import Appointment, AppointmentEventLog, DoctorSchedule
 
 
@@ -45,6 +57,7 @@ class DoctorRequiredMixin(UserPassesTestMixin):
 
 class StaffDashboardView(StaffRequiredMixin, LoginRequiredMixin, TemplateView):
     template_name = "registrations/staff_dashboard.html"
+    history_page_size = 10
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -55,9 +68,11 @@ class StaffDashboardView(StaffRequiredMixin, LoginRequiredMixin, TemplateView):
         mode = self.request.GET.get("mode")
         if self.request.GET.get("identifier"):
             mode = "search"
-        if mode not in {"search", "create"}:
+        if mode not in {"search", "create", "bulk"}:
             mode = "search"
         context["active_mode"] = mode
+        if mode == "bulk":
+            context["bulk_form"] = StaffBulkAppointmentForm()
         patient = None
         if search_form.is_valid():
             identifier = search_form.cleaned_data.get("identifier")
@@ -69,25 +84,96 @@ class StaffDashboardView(StaffRequiredMixin, LoginRequiredMixin, TemplateView):
             context["selected_patient"] = patient
             context["patient_form"] = StaffPatientProfileForm(patient=patient)
             context["appointment_form"] = OnsiteAppointmentForm(patient=patient, actor=self.request.user)
-            context["appointments"] = list(
-                patient.appointments.select_related(
-                    "schedule",
-                    "schedule__doctor",
-                    "schedule__doctor__department",
-                ).order_by("schedule__date", "queue_number")
+            context["schedule_filter_form"] = SchedulePickerFilterForm(prefix="picker")
+            appointments = patient.appointments.select_related(
+                "schedule",
+                "schedule__doctor",
+                "schedule__doctor__user",
+                "schedule__doctor__department",
             )
+            # 即將到來的掛號全部列出；歷史紀錄以游標分頁，長期病患也只取一頁。
+            context["upcoming_appointments"] = list(appointments.upcoming())
+            page = KeysetPaginator(
+                appointments.history(), self.history_page_size, Appointment.HISTORY_ORDERING
+            ).page(self.request.GET.get("cursor"))
+            context["history_page"] = page
+            query_params = self.request.GET.copy()
+            query_params.pop("cursor", None)
+            context["history_query_string"] = query_params.urlencode()
         else:
             context["selected_patient"] = None
-            context["appointments"] = []
         return context
 
     def _find_patient(self, identifier: str) -> Patient | None:
-        return (
-            Patient.objects.select_related("user")
-            .filter(Q(medical_record_number__iexact=identifier) | Q(national_id__iexact=identifier))
-            .first()
+        patient = find_patient(identifier)
+        if patient is None:
+            # 輸入姓名或部分電話時，只有唯一符合者才直接帶出，避免選錯病患。
+            matches = search_patients(identifier, limit=2)
+            if len(matches) == 1:
+                patient = matches[0].patient
+        return patient
+
+
+class StaffPatientLookupView(StaffRequiredMixin, LoginRequiredMixin, View):
+    """櫃檯查詢框的自動完成：依病歷號、身分證號或電話前綴回傳排序後的病患清單。"""
+
+    min_length = 2
+
+    def get(self, request, *args, **kwargs):
+        term = request.GET.get("q", "").strip()
+        if len(term) < self.min_length:
+            return JsonResponse({"results": []})
+        return JsonResponse({"results": [match.as_dict() for match in search_patients(term)]})
+
+
+class StaffSchedulePickerView(StaffRequiredMixin, LoginRequiredMixin, View):
+    """現場掛號的門診時段挑選器：依日期、科別、醫師篩選今日起仍有名額的時段，分頁回傳。"""
+
+    page_size = 20
+
+    def get(self, request, *args, **kwargs):
+        form = SchedulePickerFilterForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        date = form.cleaned_data.get("date")
+        department = form.cleaned_data.get("department")
+        doctor = form.cleaned_data.get("doctor")
+        page = form.cleaned_data.get("page") or 1
+
+        schedules = DoctorSchedule.objects.bookable().filter(date__gte=timezone.localdate())
+        if date:
+            schedules = schedules.filter(date=date)
+        if department:
+            schedules = schedules.filter(doctor__department=department)
+        if doctor:
+            schedules = schedules.filter(doctor=doctor)
+        # 多取一筆判斷是否還有下一頁，不另外計算總數。
+        offset = (page - 1) * self.page_size
+        rows = list(
+            schedules.order_by("date", "session", "doctor__department__name", "doctor__user__last_name", "pk").values(
+                "pk", "date", "session", "doctor_id", "quota", "remaining"
+            )[offset : offset + self.page_size + 1]
         )
 
+        sessions = dict(DoctorSchedule.Session.choices)
+        results = []
+        for row in rows[: self.page_size]:
+            entry = reference.doctor(row["doctor_id"])
+            session = sessions.get(row["session"], row["session"])
+            results.append(
+                {
+                    "id": row["pk"],
+                    "label": f"{entry} {row['date']:%Y-%m-%d} {session}（剩 {row['remaining']} 號）",
+                    "date": row["date"].isoformat(),
+                    "session": row["session"],
+                    "doctor": entry.name if entry else "",
+                    "department": entry.department_name if entry else "",
+                    "remaining": row["remaining"],
+                    "quota": row["quota"],
+                }
+            )
+        return JsonResponse({"results": results, "page": page, "has_next": len(rows) > self.page_size})
+
 
 class StaffPatientCreateView(StaffRequiredMixin, LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
@@ -201,6 +287,51 @@ class StaffAppointmentCancelView(StaffRequiredMixin, LoginRequiredMixin, View):
         return redirect(redirect_url)
 
 
+class StaffBulkAppointmentView(StaffRequiredMixin, LoginRequiredMixin, View):
+    """批次報到、取消或改期，回傳精簡的 JSON 結果，不重新產生整個櫃檯頁面。"""
+
+    def post(self, request, *args, **kwargs):
+        form = StaffBulkAppointmentForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        try:
+            result = bulk.apply(
+                form.cleaned_data["action"],
+                form.cleaned_data["identifiers"],
+                actor=request.user,
+                date=form.cleaned_data["date"],
+                target=form.target,
+            )
+        except bulk.BulkConflict:
+            return JsonResponse({"errors": {"__all__": ["部分掛號已被其他人異動，請重新送出。"]}}, status=409)
+        return JsonResponse(result.as_dict())
+
+
+class KioskView(TemplateView):
+    template_name = "registrations/kiosk.html"
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class KioskCheckInView(View):
+    """報到機掃描 QR code 後呼叫的端點。
+
+    QR code 本身即為簽章過的憑證，不使用 session 與登入狀態，因此不需 CSRF 保護；
+    也不讀取使用者與櫃檯頁面資料，每次報到只有一個條件式 UPDATE 與一筆事件。
+    """
+
+    def post(self, request, *args, **kwargs):
+        wants_json = "application/json" in request.headers.get("Accept", "")
+        try:
+            receipt = kiosk.check_in(request.POST.get("token", ""))
+        except kiosk.KioskError as exc:
+            if wants_json:
+                return JsonResponse({"error": str(exc)}, status=400)
+            return render(request, "registrations/kiosk_receipt.html", {"error": str(exc)}, status=400)
+        if wants_json:
+            return JsonResponse(receipt.as_dict())
+        return render(request, "registrations/kiosk_receipt.html", {"receipt": receipt})
+
+
 class DoctorDashboardView(DoctorRequiredMixin, LoginRequiredMixin, TemplateView):
     template_name = "registrations/doctor_dashboard.html"
 
@@ -339,22 +470,28 @@ class DoctorDashboardView(DoctorRequiredMixin, LoginRequiredMixin, TemplateView)
         return context
 
 
-class ClinicStatusView(StaffRequiredMixin, LoginRequiredMixin, TemplateView):
+class ClinicStatusView(AsyncUserMixin, StaffRequiredMixin, LoginRequiredMixin, TemplateView):
     template_name = "registrations/clinic_status.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        form = ClinicStatusFilterForm(self.request.GET or None)
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        form = ClinicStatusFilterForm(request.GET or None)
         context["filter_form"] = form
 
         schedules = (
             DoctorSchedule.objects.select_related("doctor", "doctor__user", "doctor__department")
-            .prefetch_related("appointments", "appointments__patient__user", "appointments__family_member")
+            .prefetch_related(
+                Prefetch(
+                    "appointments",
+                    queryset=Appointment.objects.select_related("patient", "patient__user", "family_member"),
+                )
+            )
             .order_by("date", "session", "doctor__department__name", "doctor__user__last_name")
         )
 
         selected_date = timezone.localdate()
-        if form.is_valid():
+        # 表單驗證會以 queryset 查詢選取的科別與醫師，需在同步執行緒中進行。
+        if await sync_to_async(form.is_valid)():
             date = form.cleaned_data.get("date")
             if date:
                 selected_date = date
@@ -367,7 +504,7 @@ class ClinicStatusView(StaffRequiredMixin, LoginRequiredMixin, TemplateView):
         schedules = schedules.filter(date=selected_date)
 
         schedule_data: list[dict] = []
-        for schedule in schedules:
+        async for schedule in schedules:
             appointments = sorted(schedule.appointments.all(), key=lambda a: a.queue_number)
             waiting = sum(1 for a in appointments if a.status == Appointment.Status.RESERVED)
             checked_in = sum(1 for a in appointments if a.status == Appointment.Status.CHECKED_IN)
@@ -396,9 +533,69 @@ class ClinicStatusView(StaffRequiredMixin, LoginRequiredMixin, TemplateView):
 
         context["selected_date"] = selected_date
         context["schedules"] = schedule_data
+        return self.render_to_response(context)
+
+
+class DisplayBoardMixin:
+    """候診區看板共用：公開唯讀，不讀取 session 與使用者；看板內容未變時回應 304。"""
+
+    etag_suffix = ""
+    http_method_names = ["get", "head"]
+
+    def dispatch(self, request, *args, **kwargs):
+        # 其他方法直接回 405，不可經過條件請求判斷（If-None-Match 相符時會誤回 412）。
+        if request.method.lower() not in self.http_method_names:
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        department_id = kwargs.get("department_id")
+        if department_id is not None and not any(
+            entry.pk == department_id and entry.is_active for entry in reference.departments()
+        ):
+            raise Http404("找不到科別")
+        self.board = board.get_board(department_id)
+        etag = quote_etag(f"{self.board.etag}-{self.etag_suffix}")
+        response = get_conditional_response(request, etag=etag)
+        record("conditional", hit=response is not None)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        # 只有看板內容（200）與未變更（304）可供公開快取。
+        if response.status_code in (200, 304):
+            response.headers["ETag"] = etag
+            patch_cache_control(response, public=True, max_age=int(board.FRESH_SECONDS))
+        return response
+
+
+class DisplayBoardView(DisplayBoardMixin, TemplateView):
+    template_name = "registrations/display_board.html"
+    etag_suffix = "html"
+    poll_seconds = 2
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        department_id = self.kwargs.get("department_id")
+        context.update(
+            {
+                "board": self.board.data,
+                "department": next(
+                    (entry for entry in reference.departments() if entry.pk == department_id), None
+                ),
+                "data_url": (
+                    reverse("registrations:board-department-data", args=[department_id])
+                    if department_id
+                    else reverse("registrations:board-data")
+                ),
+                "poll_seconds": self.poll_seconds,
+            }
+        )
         return context
 
 
+class DisplayBoardDataView(DisplayBoardMixin, View):
+    etag_suffix = "json"
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self.board.data, json_dumps_params={"ensure_ascii": False})
+
+
 class DoctorBaseActionView(DoctorRequiredMixin, LoginRequiredMixin, View):
     """共用醫師操作的錯誤處理與導轉。"""
 
@@ -431,42 +628,29 @@ class DoctorCallNextView(DoctorBaseActionView):
                 messages.info(request, "門診已結束。")
                 return self._redirect_to_schedule(schedule)
 
+            click_token = form.cleaned_data["click_token"]
+            called = calling.call_next(schedule.pk, actor=request.user, click_token=click_token)
+            if called:
+                messages.success(request, f"已呼叫 #{called.queue_number} 號病患。")
+                return self._redirect_to_schedule(schedule)
+
+            # 沒有更新任何掛號時才查詢原因，叫號成功的路徑不需額外查詢。
             current_in_progress = (
                 schedule.appointments.filter(status=Appointment.Status.IN_PROGRESS)
+                .select_related("patient", "patient__user")
                 .order_by("queue_number")
                 .first()
             )
-            if current_in_progress:
+            if current_in_progress and calling.repeated_call(current_in_progress, click_token):
+                # 同一次點擊重送：回報與第一次相同的結果
+                messages.success(request, f"已呼叫 #{current_in_progress.queue_number} 號病患。")
+            elif current_in_progress:
                 messages.warning(
                     request,
                     f"{current_in_progress.patient.user.display_name} 正在看診中，請先標記完成。",
                 )
-                return self._redirect_to_schedule(schedule)
-
-            next_appointment = (
-                schedule.appointments.filter(status=Appointment.Status.CHECKED_IN)
-                .order_by("queue_number")
-                .select_related("patient", "patient__user")
-                .first()
-            )
-            if not next_appointment:
+            else:
                 messages.info(request, "目前沒有已報到病患可叫號。")
-                return self._redirect_to_schedule(schedule)
-
-            with transaction.atomic():
-                next_appointment.status = Appointment.Status.IN_PROGRESS
-                if not next_appointment.check_in_at:
-                    next_appointment.check_in_at = timezone.now()
-                next_appointment.save(update_fields=["status", "check_in_at", "updated_at"])
-                AppointmentEventLog.objects.create(
-                    appointment=next_appointment,
-                    event=AppointmentEventLog.Event.CALLED,
-                    actor=request.user,
-                )
-            messages.success(
-                request,
-                f"已呼叫 {next_appointment.patient.user.display_name}（#{next_appointment.queue_number}）。",
-            )
             return self._redirect_to_schedule(schedule)
 
         self._report_form_errors(request, form)
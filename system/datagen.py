@@ -0,0 +1,405 @@
+"""大量模擬資料產生工具，供效能測試、壓力測試與 ``generate_hospital_data`` 指令共用。
+
+- 帳號共用同一組預先計算好的密碼雜湊，避免每筆帳號都執行一次 PBKDF2。
+- 病歷號每批以 ``Patient.allocate_medical_record_numbers()`` 一次配號，不會逐筆查重；
+  ``bulk_create`` 不觸發 signal，病患搜尋索引由此處直接寫入。
+- 記憶體中只保留主鍵；掛號、家屬以 ``executemany`` 分批寫入，
+  事件紀錄以 ``INSERT ... SELECT`` 一次產生，可擴充到數百萬筆。
+"""
+
+from __future__ import annotations
+
+import datetime
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from clinics.models import Department
+from patients.models import FamilyMember, Patient
+from patients.search import get_search_backend
+from registrations import reference
+from registrations.models import Appointment, AppointmentEventLog, Doctor, DoctorSchedule
+
+
+T = TypeVar("T")
+
+DEFAULT_PASSWORD = "perf-pass"
+
+SESSION_CYCLE = [
+    DoctorSchedule.Session.MORNING,
+    DoctorSchedule.Session.AFTERNOON,
+    DoctorSchedule.Session.EVENING,
+]
+
+RELATIONSHIPS = ["父親", "母親", "配偶", "子女", "兄弟姊妹"]
+
+
+@dataclass
+class SeedScale:
+    departments: int = 10
+    doctors: int = 200
+    days: int = 30
+    past_days: int = 0
+    patients: int = 2_000
+    appointments: int = 50_000
+    family_members: int = 0
+    quota: int = 20
+    event_logs: bool = False
+
+
+@dataclass
+class SeedResult:
+    departments: list[Department] = field(default_factory=list)
+    doctors: list[Doctor] = field(default_factory=list)
+    patient_ids: array = field(default_factory=lambda: array("q"))
+    schedule_count: int = 0
+    appointment_count: int = 0
+    family_member_count: int = 0
+    event_count: int = 0
+    start_date: datetime.date | None = None
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    batch: list[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_rows(model: type[models.Model], field_names: list[str], rows: Iterable[tuple], batch_size: int) -> int:
+    """以 ``executemany`` 直接寫入，略過 ORM 逐欄位轉換；呼叫端負責提供已轉換的值。"""
+
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(name).column) for name in field_names)
+    placeholders = ", ".join(["%s"] * len(field_names))
+    sql = f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})"
+    inserted = 0
+    with connection.cursor() as cursor:
+        for batch in batched(rows, batch_size):
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+    return inserted
+
+
+# 模擬身分證號：字母 + 0 + 8 位數字。第二碼為 0 的身分證號實際上不存在，不會與真實病患衝突；
+# 字串等長，字典序即為序號順序，可由既有最大值接續配號。
+NATIONAL_ID_PATTERN = r"^[A-Z]0[0-9]{8}$"
+NATIONAL_ID_CAPACITY = 26 * 10**8
+# 模擬科別代碼：SIM + 7 位序號，同樣由既有最大值接續配號。
+DEPARTMENT_CODE_PREFIX = "SIM"
+DEPARTMENT_CODE_PATTERN = rf"^{DEPARTMENT_CODE_PREFIX}[0-9]{{7}}$"
+DEPARTMENT_CODE_CAPACITY = 10**7
+
+
+def _national_id(number: int) -> str:
+    return f"{chr(65 + number // 10**8)}0{number % 10**8:08d}"
+
+
+def _department_code(number: int) -> str:
+    return f"{DEPARTMENT_CODE_PREFIX}{number:07d}"
+
+
+def next_national_id_number() -> int:
+    """已產生過的模擬身分證號之後的第一個序號；與前綴無關，多次產生的資料不會重複。"""
+
+    latest = Patient.objects.filter(national_id__regex=NATIONAL_ID_PATTERN).aggregate(Max("national_id"))
+    value = latest["national_id__max"]
+    return 0 if value is None else (ord(value[0]) - 65) * 10**8 + int(value[2:]) + 1
+
+
+def next_department_code_number() -> int:
+    latest = Department.objects.filter(code__regex=DEPARTMENT_CODE_PATTERN).aggregate(Max("code"))
+    value = latest["code__max"]
+    return 0 if value is None else int(value[len(DEPARTMENT_CODE_PREFIX) :]) + 1
+
+
+def prefix_conflicts(prefix: str, scale: SeedScale) -> list[str]:
+    """以 ``prefix`` 產生 ``scale`` 的資料前，列出會違反唯一限制的項目；空清單表示可以產生。
+
+    帳號與醫師證書號由前綴組成，需確認沒有被使用；科別代碼與身分證號由既有資料接續配號，
+    只需確認剩餘的號碼足夠。
+    """
+
+    User = get_user_model()
+    conflicts = []
+    if User.objects.filter(username__startswith=f"{prefix}-").exists():
+        conflicts.append(f"已存在前綴為「{prefix}」的帳號")
+    if Doctor.objects.filter(license_number__startswith=f"{prefix}-LIC").exists():
+        conflicts.append(f"已存在前綴為「{prefix}」的醫師證書號")
+    if next_department_code_number() + scale.departments > DEPARTMENT_CODE_CAPACITY:
+        conflicts.append("模擬科別代碼已用盡")
+    if next_national_id_number() + scale.patients > NATIONAL_ID_CAPACITY:
+        conflicts.append("模擬身分證號已用盡")
+    return conflicts
+
+
+def _bulk_ids(model: type[models.Model], objects: Iterable[models.Model], batch_size: int) -> array:
+    ids = array("q")
+    for batch in batched(objects, batch_size):
+        ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+    return ids
+
+
+def _appointment_status(day_offset: int, slot: int) -> str:
+    """過去的門診大多已完成、少數取消或未到；當日依號碼分佈在各階段；未來皆為已預約。"""
+
+    if day_offset < 0:
+        bucket = slot % 20
+        if bucket < 2:
+            return Appointment.Status.CANCELLED
+        if bucket == 2:
+            return Appointment.Status.RESERVED
+        return Appointment.Status.COMPLETED
+    if day_offset == 0:
+        bucket = slot % 4
+        if bucket == 0:
+            return Appointment.Status.COMPLETED
+        if bucket == 1:
+            return Appointment.Status.CHECKED_IN
+    return Appointment.Status.RESERVED
+
+
+def _insert_events(first_appointment_id: int) -> int:
+    """依掛號狀態以 ``INSERT ... SELECT`` 產生對應的事件紀錄，不需將掛號讀回 Python。"""
+
+    quote = connection.ops.quote_name
+    events_table = quote(AppointmentEventLog._meta.db_table)
+    appointments_table = quote(Appointment._meta.db_table)
+    rules = [
+        (AppointmentEventLog.Event.BOOKED, None),
+        (AppointmentEventLog.Event.CHECKED_IN, [Appointment.Status.CHECKED_IN, Appointment.Status.COMPLETED]),
+        (AppointmentEventLog.Event.CALLED, [Appointment.Status.COMPLETED]),
+        (AppointmentEventLog.Event.COMPLETED, [Appointment.Status.COMPLETED]),
+        (AppointmentEventLog.Event.CANCELLED, [Appointment.Status.CANCELLED]),
+    ]
+    inserted = 0
+    with connection.cursor() as cursor:
+        for event, statuses in rules:
+            sql = (
+                f"INSERT INTO {events_table} ({quote('appointment_id')}, {quote('event')}, {quote('payload')}, "
+                f"{quote('created_at')}) "
+                f"SELECT {quote('id')}, %s, '{{}}', {quote('created_at')} FROM {appointments_table} "
+                f"WHERE {quote('id')} >= %s"
+            )
+            params: list = [event, first_appointment_id]
+            if statuses:
+                sql += f" AND {quote('status')} IN ({', '.join(['%s'] * len(statuses))})"
+                params.extend(statuses)
+            cursor.execute(sql, params)
+            inserted += cursor.rowcount
+    return inserted
+
+
+def seed_hospital(
+    scale: SeedScale | None = None,
+    *,
+    start_date: datetime.date | None = None,
+    password: str = DEFAULT_PASSWORD,
+    prefix: str = "perf",
+    batch_size: int = 2_000,
+    progress: Callable[[str, int], None] | None = None,
+) -> SeedResult:
+    """建立一間模擬醫院：科別、醫師、班表、病患、家屬、掛號與事件紀錄。
+
+    班表從 ``start_date - past_days`` 排到 ``start_date + days``；掛號平均分配到各班表，
+    同一班表內不會出現重複病患，且每個班表的掛號數不超過 ``scale.quota``。
+    """
+
+    scale = scale or SeedScale()
+    start_date = start_date or timezone.localdate()
+    report = progress or (lambda label, count: None)
+    password_hash = make_password(password)
+    User = get_user_model()
+    ops = connection.ops
+    now = timezone.now()
+    now_value = ops.adapt_datetimefield_value(now)
+    result = SeedResult(start_date=start_date)
+
+    with transaction.atomic():
+        first_code = next_department_code_number()
+        result.departments = Department.objects.bulk_create(
+            Department(code=_department_code(first_code + index), name=f"{prefix}-科別{index:03d}")
+            for index in range(scale.departments)
+        )
+        report("departments", len(result.departments))
+
+        doctor_users = User.objects.bulk_create(
+            (
+                User(
+                    username=f"{prefix}-doc{index:05d}",
+                    password=password_hash,
+                    role=User.Role.DOCTOR,
+                    first_name=f"醫師{index:05d}",
+                    last_name="陳",
+                )
+                for index in range(scale.doctors)
+            ),
+            batch_size=batch_size,
+        )
+        result.doctors = Doctor.objects.bulk_create(
+            (
+                Doctor(
+                    user=user,
+                    department=result.departments[index % scale.departments],
+                    license_number=f"{prefix}-LIC{index:06d}",
+                    title="主治醫師",
+                )
+                for index, user in enumerate(doctor_users)
+            ),
+            batch_size=batch_size,
+        )
+        # bulk_create 不觸發 signal，需自行讓科別與醫師的參考資料快取失效。
+        reference.invalidate()
+        report("doctors", len(result.doctors))
+
+        search_backend = get_search_backend()
+        first_national_id = next_national_id_number()
+        for chunk in batched(range(scale.patients), batch_size):
+            record_numbers = Patient.allocate_medical_record_numbers(len(chunk))
+            users = User.objects.bulk_create(
+                User(
+                    username=f"{prefix}-pat{index:07d}",
+                    password=password_hash,
+                    role=User.Role.PATIENT,
+                    first_name=f"病患{index:07d}",
+                    last_name="林",
+                    phone_number=f"09{index:08d}",
+                )
+                for index in chunk
+            )
+            patients = Patient.objects.bulk_create(
+                Patient(
+                    user=user,
+                    national_id=_national_id(first_national_id + index),
+                    medical_record_number=record_number,
+                    birth_date=datetime.date(1950 + index % 60, 1 + index % 12, 1 + index % 28),
+                    phone=f"09{index:08d}",
+                    phone_digits=f"09{index:08d}",
+                )
+                for index, user, record_number in zip(chunk, users, record_numbers)
+            )
+            search_backend.index_patients(patients)
+            result.patient_ids.extend(patient.pk for patient in patients)
+            report("patients", len(result.patient_ids))
+
+        if scale.family_members and result.patient_ids:
+            patient_ids = result.patient_ids
+            result.family_member_count = _insert_rows(
+                FamilyMember,
+                ["patient", "full_name", "relationship", "national_id", "birth_date", "phone", "notes", "created_at"],
+                (
+                    (
+                        patient_ids[index % len(patient_ids)],
+                        f"家屬{index:07d}",
+                        RELATIONSHIPS[index % len(RELATIONSHIPS)],
+                        # 家屬的身分證號沒有唯一限制，沿用病患之後的號碼即可。
+                        _national_id((first_national_id + scale.patients + index) % NATIONAL_ID_CAPACITY),
+                        ops.adapt_datefield_value(datetime.date(1940 + index % 80, 1 + index % 12, 1 + index % 28)),
+                        f"08{index:08d}",
+                        "",
+                        now_value,
+                    )
+                    for index in range(scale.family_members)
+                ),
+                batch_size,
+            )
+            report("family_members", result.family_member_count)
+
+        first_day = -scale.past_days
+        schedule_days: list[int] = []
+
+        def schedules() -> Iterator[DoctorSchedule]:
+            for day in range(first_day, scale.days):
+                for index, doctor in enumerate(result.doctors):
+                    schedule_days.append(day)
+                    yield DoctorSchedule(
+                        doctor=doctor,
+                        date=start_date + datetime.timedelta(days=day),
+                        session=SESSION_CYCLE[(day + index) % len(SESSION_CYCLE)],
+                        clinic_room=f"{100 + index % 50}",
+                        quota=scale.quota,
+                        status=DoctorSchedule.Status.ENDED if day < 0 else DoctorSchedule.Status.OPEN,
+                    )
+
+        schedule_ids = _bulk_ids(DoctorSchedule, schedules(), batch_size)
+        result.schedule_count = len(schedule_ids)
+        report("schedules", result.schedule_count)
+
+        if not scale.appointments or not schedule_ids or not result.patient_ids:
+            return result
+
+        per_schedule = min(
+            scale.quota,
+            len(result.patient_ids),
+            -(-scale.appointments // len(schedule_ids)),
+        )
+        first_appointment_id = (Appointment.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+        def appointments() -> Iterator[tuple]:
+            created = 0
+            patient_ids = result.patient_ids
+            for schedule_index, schedule_id in enumerate(schedule_ids):
+                day = schedule_days[schedule_index]
+                schedule_date = start_date + datetime.timedelta(days=day)
+                booked_at = ops.adapt_datetimefield_value(
+                    timezone.make_aware(
+                        datetime.datetime.combine(schedule_date - datetime.timedelta(days=7), datetime.time(8))
+                    )
+                )
+                visited_at = ops.adapt_datetimefield_value(
+                    timezone.make_aware(datetime.datetime.combine(schedule_date, datetime.time(9)))
+                )
+                for slot in range(per_schedule):
+                    if created >= scale.appointments:
+                        return
+                    status = _appointment_status(day, slot)
+                    yield (
+                        schedule_id,
+                        patient_ids[(schedule_index * per_schedule + slot) % len(patient_ids)],
+                        slot + 1,
+                        status,
+                        visited_at if status in {Appointment.Status.CHECKED_IN, Appointment.Status.COMPLETED} else None,
+                        visited_at if status == Appointment.Status.COMPLETED else None,
+                        booked_at if status == Appointment.Status.CANCELLED else None,
+                        "",
+                        booked_at,
+                        now_value,
+                    )
+                    created += 1
+                    if created % 500_000 == 0:
+                        report("appointments", created)
+
+        result.appointment_count = _insert_rows(
+            Appointment,
+            [
+                "schedule",
+                "patient",
+                "queue_number",
+                "status",
+                "check_in_at",
+                "completed_at",
+                "cancelled_at",
+                "notes",
+                "created_at",
+                "updated_at",
+            ],
+            appointments(),
+            batch_size,
+        )
+        report("appointments", result.appointment_count)
+
+        if scale.event_logs:
+            result.event_count = _insert_events(first_appointment_id)
+            report("event_logs", result.event_count)
+
+    return result
@@ -0,0 +1,170 @@
+"""比較同步 WSGI worker 與單一 ASGI 行程處理唯讀頁面的同時處理能力與記憶體用量。"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+
+from patients.models import Patient
+from registrations.models import Appointment
+from system.datagen import SeedScale, seed_hospital
+
+from .loadtest import Command as LoadTestCommand, Sample, _client, _close_connections, percentile
+
+
+Plan = list[tuple[str, str, str]]  # (頁面, session key, 路徑)
+
+
+def _rss_mb() -> float:
+    # Linux 的 ru_maxrss 單位為 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _wsgi_request(page: str, session_key: str, path: str) -> tuple[Sample, int, float]:
+    started = time.perf_counter()
+    response = _client(session_key).get(path)
+    return (page, time.perf_counter() - started, response.status_code), os.getpid(), _rss_mb()
+
+
+async def _asgi_requests(plan: Plan, concurrency: int) -> list[Sample]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(page: str, session_key: str, path: str) -> Sample:
+        async with semaphore:
+            client = AsyncClient(raise_request_exception=False)
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+            started = time.perf_counter()
+            response = await client.get(path)
+            return page, time.perf_counter() - started, response.status_code
+
+    return await asyncio.gather(*(fetch(*item) for item in plan))
+
+
+def _run_asgi(plan: Plan, concurrency: int) -> tuple[list[Sample], float, float]:
+    _close_connections()
+    started = time.perf_counter()
+    samples = asyncio.run(_asgi_requests(plan, concurrency))
+    elapsed = time.perf_counter() - started
+    _close_connections()
+    return samples, elapsed, _rss_mb()
+
+
+class Command(LoadTestCommand):
+    help = (
+        "以相同的請求組合（病患儀表板、班表查詢、看診進度、門診狀態）比較 N 個同步 worker 行程"
+        "與單一 ASGI 行程的吞吐量、延遲與記憶體。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=200)
+        parser.add_argument("--doctors", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=400, help="每種模式送出的請求數")
+        parser.add_argument("--workers", type=int, default=5, help="同步模式的 worker 行程數（gunicorn.conf.py 依 CPU 配額計算，最多 8）")
+        parser.add_argument("--concurrency", type=int, default=32, help="ASGI 行程同時處理的請求數")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["workers"] < 1:
+            raise CommandError("--requests 與 --workers 必須大於 0。")
+        super().handle(*args, **options)
+
+    def _run(self, options) -> None:
+        seed = seed_hospital(
+            SeedScale(
+                departments=2,
+                doctors=options["doctors"],
+                days=1,
+                patients=options["patients"],
+                appointments=options["patients"] * 2,
+                quota=30,
+            ),
+            prefix="bench",
+        )
+        User = get_user_model()
+        staff = User.objects.create_user(username="bench-staff", role=User.Role.STAFF)
+        staff_session = self._session_for(staff)
+        today = timezone.localdate().isoformat()
+        department_id = seed.departments[0].pk
+
+        visits: list[tuple[str, int]] = []
+        for patient in Patient.objects.select_related("user").filter(pk__in=seed.patient_ids).order_by("pk"):
+            appointment_id = (
+                Appointment.objects.filter(patient=patient).order_by("pk").values_list("pk", flat=True).first()
+            )
+            if appointment_id:
+                visits.append((self._session_for(patient.user), appointment_id))
+        if not visits:
+            raise CommandError("沒有產生任何掛號，請增加 --patients。")
+
+        pages = (
+            ("dashboard", lambda session, _: (session, reverse("patients:dashboard"))),
+            (
+                "schedules",
+                lambda session, _: (
+                    session,
+                    f"{reverse('patients:schedule-search')}?date={today}&department={department_id}",
+                ),
+            ),
+            ("progress", lambda session, pk: (session, reverse("patients:appointment-progress", args=[pk]))),
+            ("clinic", lambda session, _: (staff_session, f"{reverse('registrations:clinic-status')}?date={today}")),
+        )
+        plan: Plan = []
+        for index in range(options["requests"]):
+            page, build = pages[index % len(pages)]
+            plan.append((page, *build(*visits[index % len(visits)])))
+        _close_connections()
+
+        self.stdout.write(
+            f"{len(plan)} 個請求：同步模式 {options['workers']} 個 worker 行程，"
+            f"ASGI 模式 1 個行程、同時 {options['concurrency']} 個請求。"
+        )
+
+        rows = []
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_close_connections,
+        ) as executor:
+            started = time.perf_counter()
+            results = list(executor.map(_wsgi_request, *zip(*plan)))
+            elapsed = time.perf_counter() - started
+        memory: dict[int, float] = {}
+        for _, pid, rss in results:
+            memory[pid] = max(memory.get(pid, 0.0), rss)
+        rows.append(("wsgi", options["workers"], [sample for sample, _, _ in results], elapsed, sum(memory.values())))
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+            samples, elapsed, rss = executor.submit(_run_asgi, plan, options["concurrency"]).result()
+        rows.append(("asgi", options["concurrency"], samples, elapsed, rss))
+
+        self._report_modes(rows)
+
+    def _report_modes(self, rows) -> None:
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'模式':<6}{'同時':>6}{'req/s':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+            f"{'錯誤':>6}{'RSS(MB)':>10}{'req/s/100MB':>13}"
+        )
+        for mode, slots, samples, elapsed, rss in rows:
+            latencies = sorted(latency for _, latency, _ in samples)
+            errors = sum(1 for _, _, status in samples if status >= 400)
+            throughput = len(samples) / elapsed if elapsed else 0.0
+            self.stdout.write(
+                f"{mode:<6}{slots:>6}{throughput:>9.1f}"
+                f"{percentile(latencies, 0.50) * 1000:>10.1f}"
+                f"{percentile(latencies, 0.95) * 1000:>10.1f}"
+                f"{percentile(latencies, 0.99) * 1000:>10.1f}"
+                f"{errors:>6}{rss:>10.1f}{throughput / rss * 100 if rss else 0:>13.1f}"
+            )
+        self.stdout.write("")
+        self.stdout.write("RSS 為各 worker 行程的最大常駐記憶體加總（含 fork 時共用的頁面）。")
@@ -0,0 +1,56 @@
+"""顯示目前的快取設定、往返延遲與各類快取的命中率。"""
+
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital.cache import flush_stats, read_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "顯示快取後端設定、讀寫延遲與各類快取（參考資料、公告、整頁快取等）的命中統計。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="顯示後將累計的命中統計歸零")
+        parser.add_argument("--probes", type=int, default=100, help="量測讀寫延遲的次數")
+
+    def handle(self, *args, **options):
+        config = settings.CACHES["default"]
+        self.stdout.write(f"快取設定：{settings.CACHE_BACKEND}（{config['BACKEND']}）")
+        if config.get("LOCATION"):
+            self.stdout.write(f"位置：{config['LOCATION']}")
+
+        probes = max(options["probes"], 1)
+        key = "stats:probe"
+        try:
+            started = time.perf_counter()
+            for index in range(probes):
+                cache.set(key, index, timeout=60)
+                if cache.get(key) != index:
+                    raise CommandError("快取讀回的值與寫入的不同，請檢查快取後端。")
+            elapsed = time.perf_counter() - started
+            cache.delete(key)
+        except CommandError:
+            raise
+        except Exception as exc:  # 後端無法連線時各家用戶端拋出的例外型別不同
+            raise CommandError(f"無法存取快取：{exc}") from exc
+        self.stdout.write(f"讀寫往返：平均 {elapsed / probes * 1000:.3f} ms（{probes} 次）")
+
+        flush_stats()
+        stats = read_stats()
+        if not stats:
+            self.stdout.write("尚無命中統計；使用 locmem 時每個行程各自計算，這裡只看得到本行程。")
+        else:
+            self.stdout.write(f"{'快取':<16}{'命中':>12}{'未命中':>12}{'命中率':>10}")
+            for name, (hits, misses) in sorted(stats.items()):
+                total = hits + misses
+                rate = f"{hits / total:.1%}" if total else "-"
+                self.stdout.write(f"{name:<16}{hits:>12}{misses:>12}{rate:>10}")
+
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("已將命中統計歸零。"))
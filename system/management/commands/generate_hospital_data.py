@@ -0,0 +1,74 @@
+"""產生大量模擬資料，建立效能測試用的資料庫。"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from system.datagen import DEFAULT_PASSWORD, SeedScale, prefix_conflicts, seed_hospital
+
+
+class Command(BaseCommand):
+    help = "以 bulk_create 分批建立科別、醫師、班表、病患、家屬、掛號與事件紀錄，可擴充到數百萬筆。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--departments", type=int, default=20)
+        parser.add_argument("--doctors", type=int, default=500)
+        parser.add_argument("--days", type=int, default=30, help="今日起往後排班的天數")
+        parser.add_argument("--past-days", type=int, default=335, help="往前補齊的歷史班表天數")
+        parser.add_argument("--patients", type=int, default=200_000)
+        parser.add_argument("--appointments", type=int, default=5_000_000)
+        parser.add_argument("--family-members", type=int, default=50_000)
+        parser.add_argument("--quota", type=int, default=30, help="每個班表的名額")
+        parser.add_argument("--no-events", action="store_true", help="不產生掛號事件紀錄")
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--prefix", default="gen", help="帳號、醫師證書號與科別名稱的前綴，用來區隔多次產生的資料；科別代碼與身分證號自動接續配號")
+        parser.add_argument("--password", default=DEFAULT_PASSWORD, help="所有模擬帳號共用的密碼")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        scale = SeedScale(
+            departments=max(options["departments"], 1),
+            doctors=max(options["doctors"], 1),
+            days=options["days"],
+            past_days=options["past_days"],
+            patients=options["patients"],
+            appointments=options["appointments"],
+            family_members=options["family_members"],
+            quota=options["quota"],
+            event_logs=not options["no_events"],
+        )
+        conflicts = prefix_conflicts(prefix, scale)
+        if conflicts:
+            raise CommandError(f"{'；'.join(conflicts)}。帳號與醫師證書號衝突時請改用其他 --prefix。")
+        capacity = scale.doctors * (scale.days + scale.past_days) * min(scale.quota, max(scale.patients, 1))
+        if scale.appointments > capacity:
+            self.stderr.write(
+                self.style.WARNING(f"班表總名額只有 {capacity} 筆，掛號數將以此為上限。")
+            )
+
+        started = time.perf_counter()
+
+        def progress(label: str, count: int) -> None:
+            self.stdout.write(f"[{time.perf_counter() - started:7.1f}s] {label}: {count}")
+
+        try:
+            result = seed_hospital(
+                scale,
+                password=options["password"],
+                prefix=prefix,
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+        except IntegrityError as exc:
+            raise CommandError(f"資料衝突，請改用其他 --prefix：{exc}") from exc
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完成：{result.schedule_count} 個班表、{len(result.patient_ids)} 位病患、"
+                f"{result.family_member_count} 位家屬、{result.appointment_count} 筆掛號、"
+                f"{result.event_count} 筆事件，耗時 {time.perf_counter() - started:.1f} 秒。"
+            )
+        )
@@ -0,0 +1,283 @@
+"""以程序內 WSGI 應用程式重播早上八點開放掛號的尖峰流量。"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import shutil
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, F, Q
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from patients.models import Patient
+from registrations.models import Appointment, AppointmentEventLog, DoctorSchedule
+from system.datagen import SeedScale, seed_hospital
+
+
+Sample = tuple[str, float, int]
+
+
+def _client(session_key: str) -> Client:
+    client = Client(raise_request_exception=False)
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    return client
+
+
+def _timed_post(client: Client, phase: str, path: str, data: dict) -> Sample:
+    started = time.perf_counter()
+    response = client.post(path, data)
+    return phase, time.perf_counter() - started, response.status_code
+
+
+def _book(session_key: str, schedule_id: int) -> Sample:
+    path = reverse("patients:appointment-book", args=[schedule_id])
+    return _timed_post(_client(session_key), "book", path, {"notes": ""})
+
+
+def _check_in(session_key: str, appointment_id: int) -> Sample:
+    path = reverse("registrations:staff-appointment-check-in", args=[appointment_id])
+    return _timed_post(_client(session_key), "check_in", path, {})
+
+
+def _drive_room(session_key: str, schedule_id: int, max_rounds: int) -> list[Sample]:
+    """模擬一個診間反覆叫號與完成看診，直到沒有已報到病患為止。"""
+
+    client = _client(session_key)
+    call_path = reverse("registrations:doctor-call-next")
+    complete_path = reverse("registrations:doctor-complete-appointment")
+    samples: list[Sample] = []
+    for _ in range(max_rounds):
+        samples.append(_timed_post(client, "call_next", call_path, {"schedule_id": schedule_id}))
+        current = list(
+            Appointment.objects.filter(schedule_id=schedule_id, status=Appointment.Status.IN_PROGRESS).values_list(
+                "pk", flat=True
+            )
+        )
+        for appointment_id in current:
+            samples.append(_timed_post(client, "complete", complete_path, {"appointment_id": appointment_id}))
+        if not current and not Appointment.objects.filter(
+            schedule_id=schedule_id, status=Appointment.Status.CHECKED_IN
+        ).exists():
+            break
+    connections.close_all()
+    return samples
+
+
+def _close_connections() -> None:
+    connections.close_all()
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    cut_points = statistics.quantiles(sorted_values, n=100, method="inclusive")
+    return cut_points[min(int(fraction * 100), 99) - 1]
+
+
+class Command(BaseCommand):
+    help = "建立模擬醫院並在程序內重播掛號、報到、叫號、完成的尖峰流量，回報延遲分佈與衝突。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patients", type=int, default=500, help="同時搶掛號的病患數")
+        parser.add_argument("--doctors", type=int, default=5, help="開放掛號的門診數")
+        parser.add_argument("--quota", type=int, default=30, help="每個門診的名額")
+        parser.add_argument("--concurrency", type=int, default=16, help="同時進行的 worker 數")
+        parser.add_argument(
+            "--mode",
+            choices=["threads", "processes"],
+            default="threads",
+            help="以執行緒或行程模擬多個 gunicorn worker",
+        )
+        parser.add_argument(
+            "--callers",
+            type=int,
+            default=2,
+            help="每個診間同時按「叫下一位」的裝置數，用來驗證重複叫號",
+        )
+
+    def handle(self, *args, **options):
+        if options["patients"] < 1 or options["doctors"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--patients、--doctors 與 --concurrency 必須大於 0。")
+
+        # 5xx 會計入錯誤數，不需要逐筆輸出 traceback。
+        request_logger = logging.getLogger("django.request")
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        workdir = Path(tempfile.mkdtemp(prefix="hospital-loadtest-"))
+        old_name = self._create_isolated_database(workdir)
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                SECURE_SSL_REDIRECT=False,
+            ):
+                self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
+            request_logger.setLevel(previous_level)
+
+    def _create_isolated_database(self, workdir: Path) -> str:
+        """在暫存資料庫執行，避免污染正式資料。SQLite 改用檔案以支援多執行緒與多行程寫入。"""
+
+        old_name = connection.settings_dict["NAME"]
+        if connection.vendor == "sqlite":
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = str(workdir / "loadtest.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        return old_name
+
+    def _executor(self, options) -> Executor:
+        if options["mode"] == "processes":
+            _close_connections()
+            return ProcessPoolExecutor(
+                max_workers=options["concurrency"],
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_close_connections,
+            )
+        return ThreadPoolExecutor(max_workers=options["concurrency"])
+
+    def _run(self, options) -> None:
+        seed = seed_hospital(
+            SeedScale(
+                departments=1,
+                doctors=options["doctors"],
+                days=1,
+                patients=options["patients"],
+                appointments=0,
+                quota=options["quota"],
+            ),
+            prefix="load",
+        )
+        User = get_user_model()
+        staff = User.objects.create_user(username="load-staff", role=User.Role.STAFF)
+        schedule_ids = list(
+            DoctorSchedule.objects.filter(doctor__in=seed.doctors).order_by("pk").values_list("pk", flat=True)
+        )
+        patient_sessions = [
+            self._session_for(patient.user)
+            for patient in Patient.objects.select_related("user").filter(pk__in=seed.patient_ids)
+        ]
+        doctor_sessions = {doctor.pk: self._session_for(doctor.user) for doctor in seed.doctors}
+        staff_session = self._session_for(staff)
+        _close_connections()
+
+        self.stdout.write(
+            f"模擬 {len(patient_sessions)} 位病患搶 {len(schedule_ids)} 個門診（每診 {options['quota']} 名），"
+            f"{options['concurrency']} 個 {options['mode']} worker。"
+        )
+
+        results: dict[str, list[Sample]] = {}
+        durations: dict[str, float] = {}
+
+        with self._executor(options) as executor:
+            started = time.perf_counter()
+            futures = [
+                executor.submit(_book, session_key, schedule_ids[index % len(schedule_ids)])
+                for index, session_key in enumerate(patient_sessions)
+            ]
+            results["book"] = [future.result() for future in futures]
+            durations["book"] = time.perf_counter() - started
+
+            booked = list(
+                Appointment.objects.filter(schedule_id__in=schedule_ids, status=Appointment.Status.RESERVED)
+                .order_by("schedule_id", "queue_number")
+                .values_list("pk", flat=True)
+            )
+            started = time.perf_counter()
+            futures = [executor.submit(_check_in, staff_session, appointment_id) for appointment_id in booked]
+            results["check_in"] = [future.result() for future in futures]
+            durations["check_in"] = time.perf_counter() - started
+
+            doctor_by_schedule = dict(
+                DoctorSchedule.objects.filter(pk__in=schedule_ids).values_list("pk", "doctor_id")
+            )
+            _close_connections()
+            started = time.perf_counter()
+            futures = [
+                executor.submit(
+                    _drive_room,
+                    doctor_sessions[doctor_by_schedule[schedule_id]],
+                    schedule_id,
+                    options["quota"] * 3,
+                )
+                for schedule_id in schedule_ids
+                for _ in range(max(options["callers"], 1))
+            ]
+            room_samples = [sample for future in futures for sample in future.result()]
+            durations["call"] = time.perf_counter() - started
+        results["call_next"] = [sample for sample in room_samples if sample[0] == "call_next"]
+        results["complete"] = [sample for sample in room_samples if sample[0] == "complete"]
+        durations["call_next"] = durations["complete"] = durations.pop("call")
+
+        self._report(results, durations)
+        self._report_invariants(schedule_ids, len(booked))
+
+    def _session_for(self, user) -> str:
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def _report(self, results: dict[str, list[Sample]], durations: dict[str, float]) -> None:
+        self.stdout.write("")
+        self.stdout.write(f"{'階段':<10}{'請求數':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'req/s':>9}{'錯誤':>6}")
+        for phase in ("book", "check_in", "call_next", "complete"):
+            samples = results.get(phase, [])
+            latencies = sorted(latency for _, latency, _ in samples)
+            errors = sum(1 for _, _, status in samples if status >= 500)
+            elapsed = durations.get(phase) or 0
+            throughput = len(samples) / elapsed if elapsed else 0.0
+            self.stdout.write(
+                f"{phase:<10}{len(samples):>8}"
+                f"{percentile(latencies, 0.50) * 1000:>10.1f}"
+                f"{percentile(latencies, 0.95) * 1000:>10.1f}"
+                f"{percentile(latencies, 0.99) * 1000:>10.1f}"
+                f"{throughput:>9.1f}{errors:>6}"
+            )
+        conflicts = sum(1 for _, _, status in results.get("book", []) if status == 200)
+        self.stdout.write("")
+        self.stdout.write(f"掛號衝突（額滿或重複，表單退回）：{conflicts}")
+
+    def _report_invariants(self, schedule_ids: list[int], booked: int) -> None:
+        overbooked = (
+            DoctorSchedule.objects.filter(pk__in=schedule_ids)
+            .annotate(active=Count("appointments", filter=~Q(appointments__status=Appointment.Status.CANCELLED)))
+            .filter(active__gt=F("quota"))
+            .count()
+        )
+        called_twice = (
+            AppointmentEventLog.objects.filter(
+                appointment__schedule_id__in=schedule_ids,
+                event=AppointmentEventLog.Event.CALLED,
+            )
+            .values("appointment_id")
+            .annotate(calls=Count("id"))
+            .filter(calls__gt=1)
+            .count()
+        )
+        status_counts = defaultdict(int)
+        for status, total in (
+            Appointment.objects.filter(schedule_id__in=schedule_ids)
+            .values_list("status")
+            .annotate(total=Count("id"))
+        ):
+            status_counts[status] = total
+        self.stdout.write(f"成功掛號：{booked}，完成看診：{status_counts[Appointment.Status.COMPLETED]}")
+        self.stdout.write(f"超額掛號門診數：{overbooked}")
+        self.stdout.write(f"重複叫號掛號數：{called_twice}")
+        if overbooked or called_twice:
+            self.stdout.write(self.style.ERROR("偵測到名額或叫號違規，請檢查鎖定邏輯。"))
+        else:
+            self.stdout.write(self.style.SUCCESS("未偵測到名額或叫號違規。"))
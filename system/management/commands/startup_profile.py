@@ -0,0 +1,115 @@
+"""量測全新行程啟動 Django 的各階段耗時：每個 app 的匯入、models 與 ready()，以及預熱各階段。"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# 在子行程中執行：目前行程已載入所有模組，無法重新量測匯入時間。
+PROFILE_SCRIPT = """
+import json
+import time
+from collections import defaultdict
+
+started = time.perf_counter()
+import django
+from django.apps.config import AppConfig
+from django.conf import settings
+
+settings.INSTALLED_APPS
+settings_seconds = time.perf_counter() - started
+apps = defaultdict(lambda: {"import": 0.0, "models": 0.0, "ready": 0.0})
+create = AppConfig.create.__func__
+import_models = AppConfig.import_models
+
+
+def timed_create(cls, entry):
+    began = time.perf_counter()
+    config = create(cls, entry)
+    apps[config.label]["import"] = time.perf_counter() - began
+    ready = config.ready
+
+    def timed_ready():
+        began = time.perf_counter()
+        ready()
+        apps[config.label]["ready"] = time.perf_counter() - began
+
+    config.ready = timed_ready
+    return config
+
+
+def timed_import_models(self):
+    began = time.perf_counter()
+    import_models(self)
+    apps[self.label]["models"] = time.perf_counter() - began
+
+
+AppConfig.create = classmethod(timed_create)
+AppConfig.import_models = timed_import_models
+began = time.perf_counter()
+django.setup()
+setup_seconds = time.perf_counter() - began
+
+began = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+
+get_wsgi_application()
+handler_seconds = time.perf_counter() - began
+
+from hospital import warmup
+
+stages = warmup.run()
+print(json.dumps({
+    "settings": settings_seconds,
+    "setup": setup_seconds,
+    "handler": handler_seconds,
+    "apps": apps,
+    "stages": stages,
+    "total": time.perf_counter() - started,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "在全新的子行程中量測設定載入、各 app 匯入／models／ready()、WSGI handler 與預熱各階段的耗時。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=0, help="只列出最慢的 N 個 app（0 表示全部）")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        completed = subprocess.run(
+            [sys.executable, "-c", PROFILE_SCRIPT],
+            capture_output=True,
+            cwd=settings.BASE_DIR,
+            env=env,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"量測失敗：\n{completed.stderr}")
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"{'app':<16}{'匯入(ms)':>10}{'models(ms)':>12}{'ready(ms)':>11}{'合計(ms)':>10}")
+        apps = sorted(report["apps"].items(), key=lambda item: -sum(item[1].values()))
+        if options["top"] > 0:
+            apps = apps[: options["top"]]
+        for label, timing in apps:
+            self.stdout.write(
+                f"{label:<16}{timing['import'] * 1000:>10.1f}{timing['models'] * 1000:>12.1f}"
+                f"{timing['ready'] * 1000:>11.1f}{sum(timing.values()) * 1000:>10.1f}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'階段':<16}{'數量':>8}{'耗時(ms)':>10}")
+        self.stdout.write(f"{'settings':<16}{'':>8}{report['settings'] * 1000:>10.1f}")
+        self.stdout.write(f"{'django.setup':<16}{len(report['apps']):>8}{report['setup'] * 1000:>10.1f}")
+        self.stdout.write(f"{'wsgi handler':<16}{'':>8}{report['handler'] * 1000:>10.1f}")
+        for name, (seconds, count) in report["stages"].items():
+            self.stdout.write(f"{name:<16}{count:>8}{seconds * 1000:>10.1f}")
+        self.stdout.write(self.style.SUCCESS(f"總計 {report['total'] * 1000:.1f} ms"))
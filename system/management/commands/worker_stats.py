@@ -0,0 +1,35 @@
+"""顯示 gunicorn 各 worker 的請求數、忙碌時間與記憶體。"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital import workerstats
+
+
+class Command(BaseCommand):
+    help = "讀取 gunicorn.conf.py 寫出的 worker 統計（GUNICORN_STATS_DIR），列出各 worker 的狀態。"
+
+    def handle(self, *args, **options):
+        workers = workerstats.read_all()
+        if not workers:
+            self.stdout.write(f"{workerstats.STATS_DIR} 沒有統計資料；請確認 gunicorn 以 gunicorn.conf.py 啟動。")
+            return
+
+        now = time.time()
+        self.stdout.write(
+            f"{'pid':>8}{'運行(分)':>10}{'請求數':>10}{'5xx':>6}{'平均(ms)':>10}{'最長(ms)':>10}"
+            f"{'忙碌率':>8}{'RSS(MB)':>10}{'更新(秒前)':>12}"
+        )
+        for stats in workers:
+            uptime = max(now - stats.booted_at, 1e-9)
+            average = stats.busy_seconds / stats.requests * 1000 if stats.requests else 0.0
+            self.stdout.write(
+                f"{stats.pid:>8}{uptime / 60:>10.1f}{stats.requests:>10}{stats.errors:>6}{average:>10.1f}"
+                f"{stats.max_request_seconds * 1000:>10.1f}{stats.busy_seconds / uptime:>8.1%}"
+                f"{stats.max_rss_mb:>10.1f}{now - stats.updated_at:>12.0f}"
+            )
+        total_rss = sum(stats.max_rss_mb for stats in workers)
+        self.stdout.write(f"共 {len(workers)} 個 worker，RSS 合計 {total_rss:.1f} MB（含共用頁面）。")
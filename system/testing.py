@@ -0,0 +1,73 @@
+"""效能回歸測試共用的 TestCase 基底類別。"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from administration import services as announcements
+from patients.models import Patient
+
+from .datagen import SeedScale, seed_hospital
+
+
+class QueryBudgetTestCase(TestCase):
+    """以接近正式環境的資料量檢查每個頁面的查詢數與回應時間上限。
+
+    預設資料量為 10 個科別、200 位醫師、30 天班表與 5 萬筆掛號。
+    查詢數上限一律檢查；回應時間受主機負載影響，只有設定 ``PERF_TIME_FACTOR`` 環境變數時才檢查，
+    數值為時間上限的倍數（例如在效能測試專用主機上設為 ``1``，較慢的主機設為 ``3``）。
+    """
+
+    scale = SeedScale()
+    time_factor: float | None = float(os.environ["PERF_TIME_FACTOR"]) if os.environ.get("PERF_TIME_FACTOR") else None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = seed_hospital(cls.scale)
+        cls.department = cls.seed.departments[0]
+        cls.doctor = cls.seed.doctors[0]
+        cls.patient = Patient.objects.select_related("user").get(pk=cls.seed.patient_ids[0])
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries: int, max_seconds: float = 1.0):
+        # 每頁都會讀取公告橫幅；正式環境中這份快取幾乎總是命中，預算只計算頁面本身的查詢。
+        announcements.snapshot()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            yield captured
+            elapsed = time.perf_counter() - started
+        executed = len(captured.captured_queries)
+        if executed > max_queries:
+            statements = "\n".join(query["sql"] for query in captured.captured_queries[:20])
+            self.fail(f"執行了 {executed} 次查詢，超過上限 {max_queries}：\n{statements}")
+        if self.time_factor is not None:
+            self.assertLessEqual(
+                elapsed,
+                max_seconds * self.time_factor,
+                f"耗時 {elapsed:.3f}s，超過上限 {max_seconds * self.time_factor:.3f}s",
+            )
+
+    def assertGetWithinBudget(self, url: str, max_queries: int, max_seconds: float = 1.0, status: int = 200):
+        with self.assertQueryBudget(max_queries, max_seconds):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def assertPostWithinBudget(
+        self,
+        url: str,
+        data: dict | None = None,
+        max_queries: int = 10,
+        max_seconds: float = 1.0,
+        status: int = 302,
+    ):
+        with self.assertQueryBudget(max_queries, max_seconds):
+            response = self.client.post(url, data or {})
+        self.assertEqual(response.status_code, status)
+        return response
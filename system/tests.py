@@ -1,3 +1,180 @@
+from __future__ import annotations
+
+import io
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from clinics.models import Department
+from hospital import warmup, workerstats
+from hospital.cache import flush_stats, read_stats, record, reset_stats
+from hospital.pagination import EstimatedCountPaginator, KeysetPaginator, estimate_row_count
+from patients.models import Patient
+from system.models import SystemJobLog
+
+
+class CacheStatsTests(TestCase):
+    def setUp(self):
+        reset_stats()
+
+    def test_counts_are_merged_into_shared_cache(self):
+        record("reference", hit=True)
+        record("reference", hit=True)
+        record("reference", hit=False)
+        flush_stats()
+        record("reference", hit=True)
+        flush_stats()
+        self.assertEqual(read_stats()["reference"], (3, 1))
+
+    def test_command_reports_hit_rate(self):
+        record("page", hit=True)
+        record("page", hit=False)
+        output = io.StringIO()
+        call_command("cache_stats", probes=5, reset=True, stdout=output)
+        self.assertIn("50.0%", output.getvalue())
+        self.assertEqual(read_stats(), {})
+
+
+class WorkerStatsTests(TestCase):
+    def test_stats_round_trip_and_command(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(workerstats, "STATS_DIR", Path(directory)):
+            stats = workerstats.WorkerStats(pid=4321, booted_at=0)
+            stats.record(0.05, 200)
+            stats.record(0.2, 502)
+            stats.write(force=True)
+            [loaded] = workerstats.read_all()
+            self.assertEqual((loaded.requests, loaded.errors), (2, 1))
+
+            output = io.StringIO()
+            call_command("worker_stats", stdout=output)
+            self.assertIn("4321", output.getvalue())
+
+            workerstats.remove(4321)
+            self.assertEqual(workerstats.read_all(), [])
+
+
+class GenerateHospitalDataTests(TestCase):
+    ARGS = ["--departments", "2", "--doctors", "2", "--days", "1", "--past-days", "0", "--patients", "3",
+            "--appointments", "4", "--family-members", "2", "--no-events"]
+
+    def test_prefixes_do_not_collide(self):
+        # 前綴開頭相同或互為重組字時，科別代碼與身分證號仍不重複。
+        for prefix in ("gen", "generated", "neg"):
+            with self.subTest(prefix=prefix):
+                call_command("generate_hospital_data", *self.ARGS, "--prefix", prefix, stdout=io.StringIO())
+        self.assertEqual(Patient.objects.count(), 9)
+        self.assertEqual(Department.objects.values("code").distinct().count(), 6)
+
+    def test_reused_prefix_is_reported(self):
+        call_command("generate_hospital_data", *self.ARGS, "--prefix", "gen", stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, "已存在前綴為「gen」的帳號"):
+            call_command("generate_hospital_data", *self.ARGS, "--prefix", "gen", stdout=io.StringIO())
+
+
+class WarmupTests(TestCase):
+    def test_stages_report_counts(self):
+        timings = warmup.run()
+        self.assertEqual(list(timings), ["urls", "templates", "locale", "databases"])
+        self.assertGreater(timings["urls"][1], 0)
+        self.assertGreater(timings["templates"][1], 0)
+        self.assertEqual(list(warmup.run(shared=False)), ["databases"])
+        self.assertEqual(list(warmup.run(shared=False, databases=False)), [])
+
+    def test_connections_open_in_every_pool_thread(self):
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            timings = warmup.run(shared=False, pool=pool, pool_size=3)
+            self.assertEqual(timings["databases"][1], 3)
+            barrier = threading.Barrier(3)
+
+            def is_open():
+                barrier.wait(timeout=5)
+                opened = connection.connection is not None
+                connection.close()
+                return opened
+
+            self.assertEqual([future.result() for future in [pool.submit(is_open) for _ in range(3)]], [True] * 3)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        SystemJobLog.objects.bulk_create(
+            SystemJobLog(job_name=SystemJobLog.JobName.REMINDER, status="success" if index % 2 else "failed")
+            for index in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_filtered_count_is_capped(self):
+        paginator = EstimatedCountPaginator(SystemJobLog.objects.filter(status="success").order_by("pk"), 5)
+        paginator.max_count = 12
+        self.assertEqual(paginator.count, 12)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_unfiltered_count_uses_statistics(self):
+        queryset = SystemJobLog.objects.order_by("pk")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(estimate_row_count(SystemJobLog), 30)
+        paginator = EstimatedCountPaginator(queryset, 10)
+        paginator.max_count = 20
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, 30)
+        # 估計值低於上限時資料量不大，直接精確計數。
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 30)
+
+    def test_large_filtered_count_is_cached(self):
+        queryset = SystemJobLog.objects.filter(status="success").order_by("pk")
+        paginator = EstimatedCountPaginator(queryset, 5, count_cache_timeout=60)
+        paginator.max_count = 10
+        self.assertEqual(paginator.count, 15)
+        self.assertFalse(paginator.is_estimated)
+        paginator = EstimatedCountPaginator(queryset, 5, count_cache_timeout=60)
+        paginator.max_count = 10
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 15)
+        self.assertTrue(paginator.is_estimated)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 同一批建立的紀錄 started_at 可能相同，需以 pk 決定順序。
+        SystemJobLog.objects.bulk_create(SystemJobLog(job_name=SystemJobLog.JobName.BACKUP) for _ in range(12))
+        cls.expected = list(SystemJobLog.objects.order_by("-started_at", "-pk").values_list("pk", flat=True))
+
+    def _paginator(self):
+        return KeysetPaginator(SystemJobLog.objects.all(), 5, ordering=("-started_at", "-pk"))
+
+    def test_walks_forward_and_back_without_counting(self):
+        paginator = self._paginator()
+        pages = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                page = paginator.page(cursor)
+            pages.append([job.pk for job in page])
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(items) for items in pages], [5, 5, 2])
+
+        previous = paginator.page(page.previous_cursor)
+        self.assertEqual([job.pk for job in previous], pages[1])
+        first = paginator.page(previous.previous_cursor)
+        self.assertEqual([job.pk for job in first], pages[0])
+        self.assertFalse(first.has_previous)
+        self.assertTrue(first.has_next)
+
+    def test_tampered_cursor_starts_over(self):
+        page = self._paginator().page("not-a-cursor")
+        self.assertEqual([job.pk for job in page], self.expected[:5])